@@ -1,34 +1,195 @@
 import mysql.connector
 import json
+from collections import OrderedDict
+from contextlib import contextmanager
+from db.batch import RowBatch
+from db.instrumentation import instrumentation
+
+# Default limits of the multi-row statements built by the bulk methods
+BULK_MAX_ROWS = 1000
+# Bulk statements are kept under max_allowed_packet divided by this, leaving room for
+# the escaping of strings and the driver's own encoding of the values
+BULK_PACKET_SHARE = 4
+# Statement size used when max_allowed_packet cannot be read, a quarter of the MySQL 5.7 default
+BULK_MAX_BYTES = 1024 * 1024
+
+# Default number of statements kept compiled (and prepared on the server) per instance
+STATEMENT_CACHE_SIZE = 256
 
 class MySQLCRUD:
-    def __init__(self, dbconfig):
-        """Initialize connection and load schema."""
-        self.conn = mysql.connector.connect(**dbconfig)
-        self.cursor = self.conn.cursor(dictionary=True)
+    def __init__(self, dbconfig=None, connection=None, statement_cache_size=STATEMENT_CACHE_SIZE, prepared=True):
+        """
+        Initialize connection and load schema.
+        :param dbconfig: mysql.connector connection parameters, used to open a new connection
+        :param connection: An already open connection to use instead, e.g. one checked out of a
+                           ConnectionPool (closing this object then returns it to the pool)
+        :param statement_cache_size: Maximum number of compiled CRUD statements kept, least
+                                     recently used first out
+        :param prepared: Run the cached statements as server-side prepared statements when
+                         the driver supports them (mysql.connector does, PyMySQL does not)
+        """
+        if statement_cache_size <= 0:
+            raise ValueError("Statement cache size must be a positive integer.")
+        if connection is None:
+            if dbconfig is None:
+                raise ValueError("Either a connection configuration or a connection is required.")
+            connection = mysql.connector.connect(**dbconfig)
+        self.conn = connection
+        self.cursor = self._dict_cursor()
+        self._transaction_depth = 0
+        self._statements = OrderedDict()
+        self._statement_cache_size = statement_cache_size
+        self._prepared = prepared
+        self._bulk_max_bytes = None
         # self.load_schema()
 
+    def _dict_cursor(self, unbuffered=False):
+        """
+        Open a cursor returning rows as dictionaries, with either mysql.connector or PyMySQL.
+        :param unbuffered: Stream rows from the server instead of fetching the whole result
+        """
+        try:
+            if unbuffered:
+                return self.conn.cursor(dictionary=True, buffered=False)
+            return self.conn.cursor(dictionary=True)
+        except TypeError:
+            import pymysql.cursors
+            return self.conn.cursor(pymysql.cursors.SSDictCursor if unbuffered else pymysql.cursors.DictCursor)
+
+    def _tuple_cursor(self, unbuffered=False):
+        """
+        Open a cursor returning rows as tuples, with either mysql.connector or PyMySQL.
+        :param unbuffered: Stream rows from the server instead of fetching the whole result
+        """
+        try:
+            return self.conn.cursor(buffered=not unbuffered)
+        except TypeError:
+            import pymysql.cursors
+            return self.conn.cursor(pymysql.cursors.SSCursor if unbuffered else pymysql.cursors.Cursor)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group operations into a single transaction, committed when the block exits
+        and rolled back if it raises. Operations inside the block do not commit on
+        their own; nested blocks join the outermost transaction.
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.conn.rollback()
+            raise
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0:
+            self.conn.commit()
+
+    def _commit(self):
+        """Commit the current statement, unless it is part of a transaction block."""
+        if self._transaction_depth == 0:
+            self.conn.commit()
+
     def load_schema(self, schema):
         """Load schema from JSON file."""
         with open(schema, "r", encoding="utf-8") as f:
             self.schema = json.load(f)
+        self._clear_statements()
 
-    def create(self, table, data):
+    def _column_names(self, table):
+        """Get the column names of a table from the loaded schema."""
+        columns = self.schema[table]
+        if isinstance(columns, dict):
+            columns = columns["columns"]
+        return {column["Field"] for column in columns}
+
+    @staticmethod
+    def _build_statement(operation, table, columns, filter_keys, count):
+        """Build the SQL of a CRUD operation."""
+        where_clause = " AND ".join(f"{key}=%s" for key in filter_keys)
+        if operation == "create":
+            placeholders = ", ".join(["%s"] * len(columns))
+            return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        if operation == "read":
+            query = f"SELECT * FROM {table}"
+            return f"{query} WHERE {where_clause}" if filter_keys else query
+        if operation == "update":
+            set_clause = ", ".join(f"{key}=%s" for key in columns)
+            return f"UPDATE {table} SET {set_clause} WHERE {where_clause}"
+        if operation == "delete":
+            return f"DELETE FROM {table} WHERE {where_clause}"
+        if operation == "delete_in":
+            placeholders = ", ".join(["%s"] * count)
+            return f"DELETE FROM {table} WHERE {columns[0]} IN ({placeholders})"
+        raise ValueError(f"Unknown operation '{operation}'.")
+
+    def _prepared_cursor(self):
+        """Open a cursor running its statement server-side prepared, or return None if unsupported."""
+        if not self._prepared:
+            return None
+        try:
+            return self.conn.cursor(prepared=True)
+        except TypeError:
+            self._prepared = False
+            return None
+
+    def _statement(self, operation, table, columns=(), filter_keys=(), count=0):
         """
-        Insert a new record into a table.
+        Get the compiled statement of an operation, from the cache or built on first use.
+        Table and column names are checked against the loaded schema only when the
+        statement is built; with a prepared cursor, the server parses it only once too.
+        :param operation: One of create, read, update, delete and delete_in
         :param table: Table name
-        :param data: Dictionary of column names and values
+        :param columns: Tuple of the columns written (or matched by delete_in)
+        :param filter_keys: Tuple of the columns filtered on
+        :param count: Number of values of delete_in
+        :return: Tuple (query, cursor), the cursor being None when statements are not prepared
         """
+        key = (operation, table, columns, filter_keys, count)
+        statement = self._statements.get(key)
+        if statement is not None:
+            self._statements.move_to_end(key)
+            return statement
+
         if table not in self.schema:
             raise ValueError(f"Table '{table}' does not exist.")
+        known = self._column_names(table)
+        unknown = [column for column in columns + filter_keys if column not in known]
+        if unknown:
+            raise ValueError(f"Unknown columns {', '.join(unknown)} in table '{table}'.")
+
+        statement = (self._build_statement(operation, table, columns, filter_keys, count), self._prepared_cursor())
+        self._statements[key] = statement
+        if len(self._statements) > self._statement_cache_size:
+            _, (_, cursor) = self._statements.popitem(last=False)
+            if cursor is not None:
+                cursor.close()
+        return statement
 
-        columns = ", ".join(data.keys())
-        placeholders = ", ".join(["%s"] * len(data))
-        values = tuple(data.values())
+    def _execute(self, statement, values):
+        """Execute a compiled statement, returning the cursor it ran on."""
+        query, cursor = statement
+        cursor = cursor or self.cursor
+        cursor.execute(query, values)
+        return cursor
 
-        query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
-        self.cursor.execute(query, values)
-        self.conn.commit()
+    def _clear_statements(self):
+        """Drop the cached statements, closing their prepared cursors."""
+        for _, cursor in self._statements.values():
+            if cursor is not None:
+                cursor.close()
+        self._statements.clear()
+
+    def create(self, table, data):
+        """
+        Insert a new record into a table.
+        :param table: Table name
+        :param data: Dictionary of column names and values
+        """
+        statement = self._statement("create", table, tuple(data))
+        self._execute(statement, tuple(data.values()))
+        self._commit()
 
     def read(self, table, filters=None):
         """
@@ -37,19 +198,362 @@ class MySQLCRUD:
         :param filters: Dictionary of column names and values for filtering (optional)
         :return: List of records
         """
+        filters = filters or {}
+        statement = self._statement("read", table, filter_keys=tuple(filters))
+        cursor = self._execute(statement, tuple(filters.values()))
+        rows = cursor.fetchall()
+        if cursor is self.cursor:
+            return rows
+        # Prepared cursors return tuples
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def primary_key(self, table):
+        """
+        Get the primary key columns of a table from the loaded schema.
+        :param table: Table name
+        :return: List of primary key column names, in schema order (empty if none)
+        """
         if table not in self.schema:
             raise ValueError(f"Table '{table}' does not exist.")
 
-        query = f"SELECT * FROM {table}"
+        columns = self.schema[table]
+        if isinstance(columns, dict):
+            columns = columns["columns"]
+        return [column["Field"] for column in columns if column["Key"] == "PRI"]
+
+    def key_bounds(self, table):
+        """
+        Get the smallest and largest primary key values of a table.
+        :param table: Table name
+        :return: Tuple (min, max), both None if the table is empty
+        """
+        keys = self.primary_key(table)
+        if len(keys) != 1:
+            raise ValueError(f"Table '{table}' must have a single-column primary key.")
+
+        key = keys[0]
+        self.cursor.execute(f"SELECT MIN({key}) AS min_key, MAX({key}) AS max_key FROM {table}")
+        row = self.cursor.fetchone()
+        return row["min_key"], row["max_key"]
+
+    def iter_chunks(self, table, chunk_size=1000, filters=None, after=None, until=None):
+        """
+        Stream records from a table in primary key order, one chunk at a time.
+        Each chunk is fetched with keyset pagination on the primary key, so memory
+        stays bounded by chunk_size whatever the size of the table. Tables without
+        a primary key are streamed through an unbuffered cursor instead.
+        :param table: Table name
+        :param chunk_size: Maximum number of records per chunk
+        :param filters: Dictionary of column names and values for filtering (optional)
+        :param after: Primary key value to resume after, a tuple for composite keys (optional)
+        :param until: Last primary key value to read, inclusive; single-column keys only (optional)
+        :return: Generator of lists of records
+        """
+        for _, rows in self._iter_keyset(table, chunk_size, filters, after, until, self.cursor):
+            yield rows
+
+    def iter_batches(self, table, chunk_size=1000, filters=None, after=None, until=None):
+        """
+        Stream records from a table like iter_chunks, but as RowBatch objects: tuple rows
+        sharing a single column header, without a dictionary per row.
+        :param table: Table name
+        :param chunk_size: Maximum number of records per batch
+        :param filters: Dictionary of column names and values for filtering (optional)
+        :param after: Primary key value to resume after, a tuple for composite keys (optional)
+        :param until: Last primary key value to read, inclusive; single-column keys only (optional)
+        :return: Generator of RowBatch
+        """
+        cursor = self._tuple_cursor()
+        try:
+            for columns, rows in self._iter_keyset(table, chunk_size, filters, after, until, cursor):
+                yield RowBatch(columns, rows)
+        finally:
+            cursor.close()
+
+    def _iter_keyset(self, table, chunk_size, filters, after, until, cursor):
+        """
+        Stream a table in primary key order through the given cursor, as (column names, rows)
+        pairs; rows are dictionaries or tuples depending on the cursor.
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be a positive integer.")
+
+        keys = self.primary_key(table)
+        conditions = [f"{key}=%s" for key in (filters or {})]
+        filter_values = list((filters or {}).values())
+
+        if until is not None:
+            if len(keys) != 1:
+                raise ValueError(f"Table '{table}' must have a single-column primary key to read up to a key.")
+            conditions.append(f"{keys[0]} <= %s")
+            filter_values.append(until)
+
+        if not keys:
+            if after is not None:
+                raise ValueError(f"Table '{table}' has no primary key to resume from.")
+            dictionaries = cursor is self.cursor
+            yield from self._iter_unbuffered(table, conditions, filter_values, chunk_size, dictionaries)
+            return
+
+        order_by = ", ".join(keys)
+        last_key = None
+        if after is not None:
+            last_key = after if isinstance(after, (tuple, list)) else (after,)
+
+        while True:
+            where = list(conditions)
+            values = list(filter_values)
+            if last_key is not None:
+                where.append(self._keyset_condition(keys))
+                values += self._keyset_values(last_key)
+
+            query = f"SELECT * FROM {table}"
+            if where:
+                query += " WHERE " + " AND ".join(where)
+            query += f" ORDER BY {order_by} LIMIT {int(chunk_size)}"
+
+            with instrumentation.stage("read", table) as span:
+                cursor.execute(query, values)
+                rows = cursor.fetchall()
+                span.count(rows)
+            if not rows:
+                return
+
+            columns = [description[0] for description in cursor.description]
+            yield columns, rows
+
+            if len(rows) < chunk_size:
+                return
+            last_row = rows[-1]
+            if isinstance(last_row, dict):
+                last_key = tuple(last_row[key] for key in keys)
+            else:
+                last_key = tuple(last_row[columns.index(key)] for key in keys)
+
+    def iter_since(self, table, column, mark=None, chunk_size=1000, inclusive=False):
+        """
+        Stream the records whose watermark column is beyond a mark, in watermark order.
+        Chunks are fetched with keyset pagination on (column, primary key), so rows
+        sharing a watermark value are never skipped between chunks. Without a mark,
+        the records whose watermark is NULL come first, paged by primary key.
+        :param table: Table name
+        :param column: Watermark column (e.g. updated_at or an auto-increment id)
+        :param mark: Previous high-water mark; all records are read when None (optional)
+        :param inclusive: Also read the records equal to the mark, for non-unique watermarks
+        :param chunk_size: Maximum number of records per chunk
+        :return: Generator of lists of records
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be a positive integer.")
+
+        keys = [key for key in self.primary_key(table) if key != column]
+        if mark is None:
+            # A keyset condition on a NULL watermark matches nothing, so the NULL rows are
+            # paged on their own, before the others
+            if keys:
+                yield from self._iter_ordered(table, [f"{column} IS NULL"], [], keys, chunk_size)
+            elif column not in self.primary_key(table):
+                for _, rows in self._iter_unbuffered(table, [f"{column} IS NULL"], [], chunk_size):
+                    yield rows
+            yield from self._iter_ordered(table, [f"{column} IS NOT NULL"], [], [column] + keys, chunk_size)
+        else:
+            yield from self._iter_ordered(table, [f"{column} {'>=' if inclusive else '>'} %s"], [mark],
+                                          [column] + keys, chunk_size)
+
+    def _iter_ordered(self, table, conditions, values, order, chunk_size):
+        """Stream the records matching conditions as lists of dictionaries, with keyset pagination on order."""
+        last_key = None
+        while True:
+            where = list(conditions)
+            query_values = list(values)
+            if last_key is not None:
+                where.append(self._keyset_condition(order))
+                query_values += self._keyset_values(last_key)
+
+            query = f"SELECT * FROM {table}"
+            if where:
+                query += " WHERE " + " AND ".join(where)
+            query += f" ORDER BY {', '.join(order)} LIMIT {int(chunk_size)}"
+
+            self.cursor.execute(query, query_values)
+            rows = self.cursor.fetchall()
+            if not rows:
+                return
+
+            yield rows
+
+            if len(rows) < chunk_size:
+                return
+            last_key = tuple(rows[-1][key] for key in order)
+
+    @staticmethod
+    def _keyset_condition(keys):
+        """
+        Build the condition selecting rows strictly after a key, e.g. for (a, b):
+        (a > %s OR (a = %s AND b > %s)). Spelled out rather than as a row
+        constructor so that MySQL can use the primary key index for the range.
+        """
+        terms = []
+        for i, key in enumerate(keys):
+            equal = [f"{prev} = %s" for prev in keys[:i]]
+            terms.append("(" + " AND ".join(equal + [f"{key} > %s"]) + ")")
+        return "(" + " OR ".join(terms) + ")"
+
+    @staticmethod
+    def _keyset_values(last_key):
+        """Parameters matching _keyset_condition for the given key tuple."""
         values = []
+        for i in range(len(last_key)):
+            values += list(last_key[:i + 1])
+        return values
+
+    def _iter_unbuffered(self, table, conditions, values, chunk_size, dictionaries=True):
+        """Stream a table without a primary key through an unbuffered cursor, as (column names, rows) pairs."""
+        query = f"SELECT * FROM {table}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
 
-        if filters:
-            conditions = " AND ".join(f"{key}=%s" for key in filters.keys())
-            query += f" WHERE {conditions}"
-            values = list(filters.values())
+        cursor = self._dict_cursor(unbuffered=True) if dictionaries else self._tuple_cursor(unbuffered=True)
+        try:
+            cursor.execute(query, values)
+            columns = [description[0] for description in cursor.description]
+            while True:
+                with instrumentation.stage("read", table) as span:
+                    rows = cursor.fetchmany(chunk_size)
+                    span.count(rows)
+                if not rows:
+                    return
+                yield columns, rows
+        finally:
+            cursor.close()
 
-        self.cursor.execute(query, values)
-        return self.cursor.fetchall()
+    @staticmethod
+    def _value_size(value):
+        """Rough size of a value once inlined in a statement, in bytes."""
+        if isinstance(value, str):
+            return len(value.encode("utf-8")) + 3
+        if isinstance(value, (bytes, bytearray)):
+            return 2 * len(value) + 3
+        return 24
+
+    def bulk_max_bytes(self):
+        """
+        Get the default size limit of the values of a bulk statement: a quarter of the
+        server's max_allowed_packet, read once, or BULK_MAX_BYTES if it cannot be read.
+        """
+        if self._bulk_max_bytes is None:
+            try:
+                self.cursor.execute("SELECT @@max_allowed_packet AS max_allowed_packet")
+                self._bulk_max_bytes = int(self.cursor.fetchone()["max_allowed_packet"]) // BULK_PACKET_SHARE
+            except Exception:
+                self._bulk_max_bytes = BULK_MAX_BYTES
+        return self._bulk_max_bytes
+
+    def _row_chunks(self, rows, max_rows, max_bytes):
+        """
+        Split rows into chunks of at most max_rows rows and about max_bytes bytes of values.
+        A single row larger than max_bytes gets a chunk of its own.
+        """
+        if max_rows <= 0 or max_bytes <= 0:
+            raise ValueError("Chunk limits must be positive integers.")
+
+        chunk, size = [], 0
+        for row in rows:
+            row_size = sum(self._value_size(value) for value in row)
+            if chunk and (len(chunk) >= max_rows or size + row_size > max_bytes):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(row)
+            size += row_size
+        if chunk:
+            yield chunk
+
+    def _insert_many(self, table, rows, max_rows, max_bytes, upsert):
+        """Insert or upsert rows with multi-row INSERT statements, in one transaction."""
+        if table not in self.schema:
+            raise ValueError(f"Table '{table}' does not exist.")
+        rows = list(rows)
+        if not rows:
+            return 0
+
+        columns = list(rows[0].keys())
+        row_placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        suffix = ""
+        if upsert:
+            keys = set(self.primary_key(table))
+            updates = [column for column in columns if column not in keys] or columns[:1]
+            suffix = " ON DUPLICATE KEY UPDATE " + ", ".join(f"{column}=VALUES({column})" for column in updates)
+
+        values = (tuple(row[column] for column in columns) for row in rows)
+        max_bytes = (max_bytes or self.bulk_max_bytes()) - len(prefix) - len(suffix)
+        with self.transaction():
+            for chunk in self._row_chunks(values, max_rows, max(max_bytes, 1)):
+                query = prefix + ", ".join([row_placeholders] * len(chunk)) + suffix
+                with instrumentation.stage("write", table) as span:
+                    self.cursor.execute(query, [value for row in chunk for value in row])
+                    span.count(chunk)
+        return len(rows)
+
+    def create_many(self, table, rows, max_rows=BULK_MAX_ROWS, max_bytes=None):
+        """
+        Insert many records with multi-row INSERT statements, committed once.
+        :param table: Table name
+        :param rows: List of dictionaries, all with the same column names
+        :param max_rows: Maximum number of records per statement
+        :param max_bytes: Approximate maximum size of a statement (defaults to bulk_max_bytes())
+        :return: Number of records inserted
+        """
+        return self._insert_many(table, rows, max_rows, max_bytes, upsert=False)
+
+    def upsert_many(self, table, rows, max_rows=BULK_MAX_ROWS, max_bytes=None):
+        """
+        Insert many records, updating the existing ones with the same primary or unique
+        key, with multi-row INSERT ... ON DUPLICATE KEY UPDATE statements, committed once.
+        :param table: Table name
+        :param rows: List of dictionaries, all with the same column names
+        :param max_rows: Maximum number of records per statement
+        :param max_bytes: Approximate maximum size of a statement (defaults to bulk_max_bytes())
+        :return: Number of records written
+        """
+        return self._insert_many(table, rows, max_rows, max_bytes, upsert=True)
+
+    def update_many(self, table, rows, max_rows=BULK_MAX_ROWS, max_bytes=None):
+        """
+        Update many records by primary key, committed once.
+        :param table: Table name
+        :param rows: List of dictionaries holding the primary key columns and the new
+                     values, all with the same column names
+        :param max_rows: Maximum number of records sent per round trip
+        :param max_bytes: Approximate maximum size of the values sent per round trip
+                          (defaults to bulk_max_bytes())
+        :return: Number of records processed
+        """
+        if table not in self.schema:
+            raise ValueError(f"Table '{table}' does not exist.")
+        rows = list(rows)
+        if not rows:
+            return 0
+
+        keys = self.primary_key(table)
+        if not keys:
+            raise ValueError(f"Table '{table}' has no primary key to update by.")
+        columns = [column for column in rows[0].keys() if column not in keys]
+        if not columns:
+            raise ValueError("No columns to update.")
+
+        set_clause = ", ".join(f"{column}=%s" for column in columns)
+        where_clause = " AND ".join(f"{key}=%s" for key in keys)
+        query = f"UPDATE {table} SET {set_clause} WHERE {where_clause}"
+
+        values = (tuple(row[column] for column in columns + keys) for row in rows)
+        with self.transaction():
+            for chunk in self._row_chunks(values, max_rows, max_bytes or self.bulk_max_bytes()):
+                with instrumentation.stage("write", table) as span:
+                    self.cursor.executemany(query, chunk)
+                    span.count(chunk)
+        return len(rows)
 
     def update(self, table, data, filters):
         """
@@ -58,20 +562,12 @@ class MySQLCRUD:
         :param data: Dictionary of column names and new values
         :param filters: Dictionary of column names and values for filtering
         """
-        if table not in self.schema:
-            raise ValueError(f"Table '{table}' does not exist.")
-
         if not filters:
             raise ValueError("Filters are required for update.")
 
-        set_clause = ", ".join(f"{key}=%s" for key in data.keys())
-        where_clause = " AND ".join(f"{key}=%s" for key in filters.keys())
-
-        values = list(data.values()) + list(filters.values())
-
-        query = f"UPDATE {table} SET {set_clause} WHERE {where_clause}"
-        self.cursor.execute(query, values)
-        self.conn.commit()
+        statement = self._statement("update", table, tuple(data), tuple(filters))
+        self._execute(statement, tuple(data.values()) + tuple(filters.values()))
+        self._commit()
 
     def delete(self, table, filters):
         """
@@ -79,18 +575,12 @@ class MySQLCRUD:
         :param table: Table name
         :param filters: Dictionary of column names and values for filtering
         """
-        if table not in self.schema:
-            raise ValueError(f"Table '{table}' does not exist.")
-
         if not filters:
             raise ValueError("Filters are required for deletion.")
 
-        where_clause = " AND ".join(f"{key}=%s" for key in filters.keys())
-        values = list(filters.values())
-
-        query = f"DELETE FROM {table} WHERE {where_clause}"
-        self.cursor.execute(query, values)
-        self.conn.commit()
+        statement = self._statement("delete", table, filter_keys=tuple(filters))
+        self._execute(statement, tuple(filters.values()))
+        self._commit()
 
     def delete_multiple(self, table, column, values):
         """
@@ -99,27 +589,48 @@ class MySQLCRUD:
         :param column: Column name
         :param values: List of values to match
         """
-        if table not in self.schema:
-            raise ValueError(f"Table '{table}' does not exist.")
+        values = list(values)
+        if not values:
+            return
+        # The number of placeholders is rounded up to a power of two, padded with a repeated
+        # value, so that a few cached statements serve every list length
+        count = 1 << (len(values) - 1).bit_length()
+        statement = self._statement("delete_in", table, (column,), count=count)
+        self._execute(statement, tuple(values + values[-1:] * (count - len(values))))
+        self._commit()
 
-        placeholders = ", ".join(["%s"] * len(values))
-        query = f"DELETE FROM {table} WHERE {column} IN ({placeholders})"
-        self.cursor.execute(query, values)
-        self.conn.commit()
-
-    def clear_table(self, table):
+    def clear_table(self, table, truncate=False):
         """
         Delete all records from a table.
         :param table: Table name
+        :param truncate: Use TRUNCATE TABLE, which drops and recreates the table instead of
+                         deleting row by row, when it is safe: outside a transaction block
+                         (TRUNCATE commits implicitly) and when no foreign key references the
+                         table. DELETE is used otherwise.
         """
         if table not in self.schema:
             raise ValueError(f"Table '{table}' does not exist.")
 
+        if truncate and self._transaction_depth == 0 and not self._is_referenced(table):
+            self.cursor.execute(f"TRUNCATE TABLE {table}")
+            return
+
         query = f"DELETE FROM {table}"
         self.cursor.execute(query)
-        self.conn.commit()
+        self._commit()
+
+    def _is_referenced(self, table):
+        """Check whether a foreign key of another table references a table."""
+        self.cursor.execute(
+            "SELECT COUNT(*) AS refs FROM information_schema.KEY_COLUMN_USAGE "
+            "WHERE REFERENCED_TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME = %s "
+            "AND TABLE_NAME <> REFERENCED_TABLE_NAME",
+            (table,)
+        )
+        return self.cursor.fetchone()["refs"] > 0
 
     def close(self):
         """Close database connection."""
+        self._clear_statements()
         self.cursor.close()
         self.conn.close()
@@ -0,0 +1,494 @@
+import argparse
+import json
+import platform
+import random
+import re
+import sqlite3
+import string
+import subprocess
+import time
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from MySQLCRUD import MySQLCRUD
+from db.batch import RowBatch
+from db.db_components import Column, Database, Schema, Table
+from db.mappers import type_family
+from migration.comparator import SchemaComparator
+from migration.data import DataMigrator
+from migration.scheduler import MigrationScheduler
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_WORDS = ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet",
+          "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo", "sierra", "tango")
+_EPOCH = datetime(2015, 1, 1)
+_SPAN_SECONDS = 10 * 365 * 86400
+
+class SyntheticData:
+    """
+    Generates reproducible rows for the tables of a schema, honoring column types,
+    lengths and nullability, unique indexes and foreign keys.
+
+    Integer primary keys are numbered 1..n, so a foreign key value is drawn among the
+    keys of the referenced table. Tables without foreign key definitions (such as those
+    of mysql_schema.json) reference the table <name> through a column <name>_id. Rows
+    are produced in batches, so any number of rows can be streamed in bounded memory.
+    """
+
+    def __init__(self, schema: Schema, seed: int = 42, null_ratio: float = 0.1):
+        """
+        :param schema: The schema whose tables are generated.
+        :param seed: Seed of the generators; the same seed gives the same rows.
+        :param null_ratio: Share of NULLs in nullable columns.
+        """
+        self.schema = schema
+        self.seed = seed
+        self.null_ratio = null_ratio
+
+    def references(self, table: Table) -> Dict[str, str]:
+        """Referenced table of each foreign key column of a table."""
+        references = {}
+        for fk in table.foreign_keys:
+            if len(fk.columns) == 1 and fk.ref_table in self.schema.tables:
+                references[fk.columns[0]] = fk.ref_table
+        if not table.foreign_keys:
+            for column in table.columns:
+                parent = column[:-3] if column.endswith("_id") else None
+                if parent in self.schema.tables and parent != table.name:
+                    references[column] = parent
+        return references
+
+    def table_order(self, tables: Optional[List[str]] = None) -> List[str]:
+        """The tables, referenced tables first."""
+        pending = {name: set(self.references(self.schema.tables[name]).values()) - {name}
+                   for name in (tables or list(self.schema.tables))}
+        order = []
+        while pending:
+            ready = sorted(name for name, parents in pending.items() if not parents & set(pending))
+            if not ready:
+                raise ValueError(f"Circular references between tables: {sorted(pending)}.")
+            order += ready
+            for name in ready:
+                del pending[name]
+        return order
+
+    def _generator(self, table: Table, column: Column, rng: random.Random,
+                   counts: Dict[str, int]) -> Callable[[int], Any]:
+        """Function giving the value of a column for row number n (from 1)."""
+        col_type = column.col_type.lower()
+        family = type_family(col_type)
+        size = re.search(r"\((\d+)(?:\s*,\s*(\d+))?\)", col_type)
+        unique = column.field in table.primary_key or any(
+            index.unique and index.columns == [column.field] for index in table.indexes.values())
+        parent = self.references(table).get(column.field)
+
+        if parent is not None:
+            parent_rows = max(counts.get(parent, 1), 1)
+            return lambda n: rng.randint(1, parent_rows)
+        if family == "int":
+            if unique:
+                return lambda n: n
+            if col_type.startswith(("tinyint(1)", "bool")):
+                return lambda n: rng.randint(0, 1)
+            if col_type.startswith("year"):
+                return lambda n: rng.randint(1970, 2037)
+            high = 127 if col_type.startswith("tinyint") else 2 ** 31 - 1
+            return lambda n: rng.randint(0, high)
+        if family == "float":
+            return lambda n: rng.uniform(0, 1_000_000)
+        if family == "decimal":
+            precision = int(size.group(1)) if size else 10
+            scale = int(size.group(2)) if size and size.group(2) else 0
+            quantum = Decimal(1).scaleb(-scale)
+            high = 10 ** (precision - scale) - 1
+            return lambda n: Decimal(str(rng.uniform(0, high))).quantize(quantum)
+        if col_type.startswith(("enum", "set")):
+            choices = re.findall(r"'((?:[^']|'')*)'", column.col_type) or [""]
+            return lambda n: rng.choice(choices)
+        if col_type.startswith(("datetime", "timestamp")):
+            return lambda n: _EPOCH + timedelta(seconds=rng.randrange(_SPAN_SECONDS))
+        if col_type.startswith("date"):
+            return lambda n: (_EPOCH + timedelta(days=rng.randrange(_SPAN_SECONDS // 86400))).date()
+        if col_type.startswith("time"):
+            return lambda n: str(timedelta(seconds=rng.randrange(86400)))
+        if col_type.startswith("json"):
+            return lambda n: json.dumps({"n": n, "tag": rng.choice(_WORDS)})
+        if "blob" in col_type or "binary" in col_type:
+            length = min(int(size.group(1)), 64) if size else 64
+            return lambda n: bytes(rng.getrandbits(8) for _ in range(length))
+        if family == "str":
+            length = int(size.group(1)) if size else 500
+            name = column.field.lower()
+            if "email" in name:
+                return lambda n: f"{rng.choice(_WORDS)}.{n}@example.com"[-length:]
+            if unique:
+                return lambda n: f"{column.field}-{n}"[-length:]
+            if "phone" in name:
+                return lambda n: "".join(rng.choice(string.digits) for _ in range(min(length, 10)))
+            words = max(1, min(length // 8, 60))
+            return lambda n: " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, words)))[:length]
+        return lambda n: str(n)
+
+    def batches(self, table_name: str, rows: int, counts: Dict[str, int],
+                batch_size: int = 1000) -> Iterator[RowBatch]:
+        """
+        Streams the rows of a table.
+
+        :param table_name: Table name.
+        :param rows: Number of rows to generate.
+        :param counts: Number of rows generated for each referenced table.
+        :param batch_size: Number of rows per batch.
+        :return: Generator of RowBatch holding every column of the table.
+        """
+        table = self.schema.tables[table_name]
+        rng = random.Random(self.seed * 1_000_003 + zlib.crc32(table_name.encode("utf-8")))
+        generators = []
+        for column in table.columns.values():
+            generate = self._generator(table, column, rng, counts)
+            if column.nullable and column.field not in table.primary_key and self.null_ratio > 0:
+                generate = self._nullable(generate, rng)
+            generators.append(generate)
+
+        columns = list(table.columns)
+        for start in range(1, rows + 1, batch_size):
+            stop = min(start + batch_size, rows + 1)
+            yield RowBatch(columns, [tuple(generate(n) for generate in generators) for n in range(start, stop)])
+
+    def _nullable(self, generate: Callable[[int], Any], rng: random.Random) -> Callable[[int], Any]:
+        ratio = self.null_ratio
+        return lambda n: None if rng.random() < ratio else generate(n)
+
+class SQLiteCursor:
+    """DB-API cursor of SQLiteConnection, accepting the MySQL statements of the tool."""
+
+    def __init__(self, connection: sqlite3.Connection, dictionary: bool = False):
+        self._cursor = connection.cursor()
+        self.dictionary = dictionary
+
+    @staticmethod
+    def translate(query: str) -> str:
+        """Rewrites %s placeholders and INSERT ... ON DUPLICATE KEY UPDATE for SQLite."""
+        query = query.replace("%s", "?")
+        position = query.find("ON DUPLICATE KEY UPDATE")
+        if position >= 0:
+            query = query[:position].replace("INSERT INTO", "INSERT OR REPLACE INTO", 1)
+        return query
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query: str, values=()):
+        self._cursor.execute(self.translate(query), tuple(values or ()))
+
+    def executemany(self, query: str, values):
+        self._cursor.executemany(self.translate(query), values)
+
+    def _rows(self, rows: List[tuple]) -> List[Any]:
+        if not self.dictionary:
+            return rows
+        names = [description[0] for description in self._cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def fetchall(self) -> List[Any]:
+        return self._rows(self._cursor.fetchall())
+
+    def fetchmany(self, size: int) -> List[Any]:
+        return self._rows(self._cursor.fetchmany(size))
+
+    def fetchone(self) -> Any:
+        rows = self._rows(self._cursor.fetchmany(1))
+        return rows[0] if rows else None
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self) -> "SQLiteCursor":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SQLiteConnection:
+    """
+    SQLite stand-in for a MySQL connection, so that the read, map and write paths can be
+    benchmarked without a server. It understands the statements of MySQLCRUD and
+    DataMigrator; server-side features (LOAD DATA, information_schema) are not available.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        sqlite3.register_adapter(Decimal, str)
+        sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+        sqlite3.register_adapter(date, lambda value: value.isoformat())
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+    def cursor(self, *args, dictionary: bool = False, **kwargs) -> SQLiteCursor:
+        return SQLiteCursor(self.connection, dictionary)
+
+    def create_table(self, table: Table):
+        """Creates a table with the SQLite affinities of its column types."""
+        affinities = {"int": "INTEGER", "float": "REAL", "decimal": "NUMERIC"}
+        columns = [f'"{column.field}" {affinities.get(type_family(column.col_type), "TEXT")}'
+                   for column in table.columns.values()]
+        if table.primary_key:
+            columns.append("PRIMARY KEY (" + ", ".join(f'"{key}"' for key in table.primary_key) + ")")
+        self.connection.execute(f'DROP TABLE IF EXISTS "{table.name}"')
+        self.connection.execute(f'CREATE TABLE "{table.name}" ({", ".join(columns)})')
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """p50, p90, p99 and max of batch latencies, in milliseconds."""
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"p50_ms": at(0.50), "p90_ms": at(0.90), "p99_ms": at(0.99), "max_ms": round(ordered[-1] * 1000, 3)}
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of the process, in bytes."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if platform.system() == "Darwin" else rss * 1024
+
+class StageTimer:
+    """Accumulates the rows and batch latencies of one benchmark stage."""
+
+    def __init__(self):
+        self.rows = 0
+        self.seconds = 0.0
+        self.latencies: List[float] = []
+
+    def add(self, rows: int, seconds: float):
+        self.rows += rows
+        self.seconds += seconds
+        self.latencies.append(seconds)
+
+    def report(self) -> Dict[str, Any]:
+        rate = self.rows / self.seconds if self.seconds else None
+        return {"rows": self.rows, "seconds": round(self.seconds, 6),
+                "rows_per_s": round(rate, 1) if rate else None, "batches": len(self.latencies),
+                **percentiles(self.latencies)}
+
+def copy_schema(schema: Schema) -> Schema:
+    """Copy of a schema whose tables can be modified independently."""
+    copy = Schema(schema.name)
+    for table in schema.tables.values():
+        copy.add_table(Table(
+            table.name,
+            columns=[Column(c.field, c.col_type, c.nullable, c.key, c.default, c.extra) for c in table.columns.values()],
+            foreign_keys=list(table.foreign_keys),
+            indexes=list(table.indexes.values()),
+            stats=dict(table.stats),
+        ))
+    return copy
+
+class Benchmark:
+    """
+    Runs the migration paths on synthetic data and measures them:
+
+    - load: generating the source rows and writing them (DataMigrator.write_mapped),
+    - read, map and write: copying every table from the source to the target, timed
+      separately per batch (MySQLCRUD.iter_batches, FieldMapper.map_batch,
+      DataMigrator.write_mapped),
+    - extract: SchemaExtractor on the source database (MySQL only),
+    - compare: SchemaComparator on the schema and a modified copy of it.
+    """
+
+    def __init__(self, schema: Schema, source, target, rows: int, batch_size: int = 1000, seed: int = 42,
+                 extract: Optional[Callable[[], Any]] = None, tables: Optional[List[str]] = None):
+        """
+        :param schema: Schema of the benchmarked tables.
+        :param source: Connection to the source database; its tables are recreated.
+        :param target: Connection to the target database; its tables are recreated.
+        :param rows: Number of rows generated per table.
+        :param batch_size: Number of rows per batch.
+        :param seed: Seed of the synthetic data.
+        :param extract: Callable extracting the source schema, benchmarked when given.
+        :param tables: Tables to benchmark (defaults to all).
+        """
+        self.schema = schema
+        self.source = source
+        self.target = target
+        self.rows = rows
+        self.batch_size = batch_size
+        self.seed = seed
+        self.extract = extract
+        self.data = SyntheticData(schema, seed=seed)
+        self.tables = self.data.table_order(tables)
+
+    @staticmethod
+    def _create_tables(connection, tables: List[Table]):
+        if isinstance(connection, SQLiteConnection):
+            for table in tables:
+                connection.create_table(table)
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table in tables:
+                cursor.execute(f"DROP TABLE IF EXISTS `{table.name}`")
+                cursor.execute(table.create_sql())
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Runs every stage.
+
+        :return: The measures per stage.
+        """
+        tables = [self.schema.tables[name] for name in self.tables]
+        self._create_tables(self.source, tables)
+        self._create_tables(self.target, tables)
+        stages = {name: StageTimer() for name in ("load", "read", "map", "write")}
+
+        loader = DataMigrator(self.source, batch_size=self.batch_size)
+        counts: Dict[str, int] = {}
+        for name in self.tables:
+            generated = self.data.batches(name, self.rows, counts, self.batch_size)
+            while True:
+                started = time.perf_counter()
+                batch = next(generated, None)
+                if batch is None:
+                    break
+                loader.write_mapped(name, batch.columns, batch.rows)
+                stages["load"].add(len(batch), time.perf_counter() - started)
+            counts[name] = self.rows
+
+        reader = MySQLCRUD(connection=self.source)
+        reader.schema = self.schema.to_dict()
+        writer = DataMigrator(self.target, batch_size=self.batch_size)
+        for name in self.tables:
+            table = self.schema.tables[name]
+            mapper = MigrationScheduler.default_mapper(table, table)
+            batches = reader.iter_batches(name, chunk_size=self.batch_size)
+            while True:
+                started = time.perf_counter()
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                read = time.perf_counter()
+                mapped = mapper.map_batch(batch)
+                mapped_at = time.perf_counter()
+                writer.write_mapped(name, mapped.columns, mapped.rows)
+                written = time.perf_counter()
+                stages["read"].add(len(batch), read - started)
+                stages["map"].add(len(batch), mapped_at - read)
+                stages["write"].add(len(batch), written - mapped_at)
+
+        results = {name: timer.report() for name, timer in stages.items()}
+        if self.extract is not None:
+            timer = StageTimer()
+            started = time.perf_counter()
+            self.extract()
+            timer.add(len(tables), time.perf_counter() - started)
+            results["extract"] = {"tables": len(tables), **timer.report()}
+        results["compare"] = self._compare()
+        return results
+
+    def _compare(self, repeat: int = 100) -> Dict[str, Any]:
+        """Times SchemaComparator on the schema against a copy with one column changed per table."""
+        modified = copy_schema(self.schema)
+        for table in modified.tables.values():
+            column = next(iter(table.columns.values()), None)
+            if column is not None:
+                table.add_column(Column(column.field + "_changed", column.col_type, True))
+        timer = StageTimer()
+        for _ in range(repeat):
+            started = time.perf_counter()
+            SchemaComparator(self.schema, modified).compare_schemas()
+            timer.add(len(self.schema.tables), time.perf_counter() - started)
+        report = timer.report()
+        report["tables_per_s"] = report.pop("rows_per_s")
+        report["tables"] = report.pop("rows")
+        return report
+
+def git_commit() -> Optional[str]:
+    """Commit of the benchmarked code, if it runs from a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_schema(path: str) -> Schema:
+    """Loads the schema of a JSON file written by get_schema.py."""
+    database = Database("benchmark")
+    database.load_from_json(path)
+    return database.get_schema("benchmark")
+
+def connections(args) -> Tuple[Any, Any, Optional[Callable[[], Any]]]:
+    """Opens the source and target connections of the chosen backend."""
+    if args.backend == "sqlite":
+        return SQLiteConnection(args.sqlite_source), SQLiteConnection(args.sqlite_target), None
+
+    import mysql.connector
+    from db.extractor import SchemaExtractor
+    config = {"host": args.host, "port": args.port, "user": args.user, "password": args.password}
+    source = mysql.connector.connect(database=args.source_db, **config)
+    target = mysql.connector.connect(database=args.target_db, **config)
+    return source, target, lambda: SchemaExtractor(source).extract(args.source_db)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the migration paths on synthetic data.")
+    parser.add_argument("--schema", default="mysql_schema.json", help="Schema JSON file written by get_schema.py")
+    parser.add_argument("--tables", nargs="+", help="Tables to benchmark (default: all)")
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows generated per table")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-source", default=":memory:", help="SQLite source database file")
+    parser.add_argument("--sqlite-target", default=":memory:", help="SQLite target database file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--source-db", default="bench_source", help="MySQL source database; its tables are dropped")
+    parser.add_argument("--target-db", default="bench_target", help="MySQL target database; its tables are dropped")
+    parser.add_argument("--output", default="benchmark_results.jsonl", help="JSON lines file the results are appended to")
+    args = parser.parse_args()
+
+    source, target, extract = connections(args)
+    benchmark = Benchmark(load_schema(args.schema), source, target, args.rows, batch_size=args.batch_size,
+                          seed=args.seed, extract=extract, tables=args.tables)
+    started_at = datetime.now().isoformat(timespec="seconds")
+    try:
+        stages = benchmark.run()
+    finally:
+        source.close()
+        target.close()
+
+    result = {
+        "started_at": started_at,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "backend": args.backend,
+        "tables": benchmark.tables,
+        "rows_per_table": args.rows,
+        "batch_size": args.batch_size,
+        "seed": args.seed,
+        "peak_rss_bytes": peak_rss(),
+        "stages": stages,
+    }
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+
+    for name, stage in stages.items():
+        rate = stage.get("rows_per_s") or stage.get("tables_per_s")
+        print(f"{name:8} {rate} per s, p50 {stage.get('p50_ms')} ms, p99 {stage.get('p99_ms')} ms")
+    print(f"Peak RSS: {result['peak_rss_bytes']} bytes. Results appended to {args.output}.")
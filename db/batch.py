@@ -0,0 +1,77 @@
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+class RowBatch:
+    """
+    A batch of rows sharing one column header, each row being a plain tuple.
+
+    Rows stay tuples from the reader through the mapper to the writer, which binds
+    them as they are, instead of carrying a dictionary per row. Dictionaries and
+    column arrays are only built on demand.
+
+    Attributes:
+        columns (Tuple[str, ...]): Column names, in the order of the row values.
+        rows (List[tuple]): The rows.
+    """
+    __slots__ = ("columns", "rows", "_positions")
+
+    def __init__(self, columns: Sequence[str], rows: List[tuple]) -> None:
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.rows: List[tuple] = rows
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_dicts(cls, rows: Iterable[Dict[str, Any]], columns: Optional[Sequence[str]] = None) -> "RowBatch":
+        """
+        Builds a batch from dictionary rows.
+
+        :param rows: The rows.
+        :param columns: Column names (defaults to the keys of all rows, in order of appearance);
+            missing values are None.
+        :return: The batch.
+        """
+        rows = list(rows)
+        if columns is None:
+            columns = list(dict.fromkeys(key for row in rows for key in row))
+        return cls(columns, [tuple(row.get(column) for column in columns) for row in rows])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[tuple]:
+        return iter(self.rows)
+
+    def position(self, column: str) -> int:
+        """Returns the position of a column in the rows."""
+        if self._positions is None:
+            self._positions = {name: i for i, name in enumerate(self.columns)}
+        try:
+            return self._positions[column]
+        except KeyError:
+            raise ValueError(f"Column '{column}' is not part of the batch.") from None
+
+    def key(self, row: tuple, columns: Sequence[str]) -> tuple:
+        """Returns the values of some columns of a row, e.g. its primary key."""
+        return tuple(row[self.position(column)] for column in columns)
+
+    def column(self, name: str, typecode: Optional[str] = None) -> Sequence[Any]:
+        """
+        Returns the values of a column.
+
+        :param name: Column name.
+        :param typecode: array typecode (e.g. "q" for integers, "d" for floats) to get a
+            compact numeric array instead of a list; the column must not hold NULLs.
+        :return: A list, or an array.array.
+        """
+        position = self.position(name)
+        values = [row[position] for row in self.rows]
+        return array(typecode, values) if typecode is not None else values
+
+    def dicts(self) -> Iterator[Dict[str, Any]]:
+        """Yields the rows as dictionaries, for code that needs them."""
+        columns = self.columns
+        for row in self.rows:
+            yield dict(zip(columns, row))
+
+    def __repr__(self) -> str:
+        return f"RowBatch(columns={self.columns!r}, rows={len(self.rows)})"
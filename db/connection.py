@@ -1,4 +1,7 @@
-from typing import Dict, List, Any, Optional, Union
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 import mysql.connector
 from mysql.connector.connection import MySQLConnection
 import pymongo
@@ -12,48 +15,293 @@ class DatabaseConnection:
         self.db_type = db_type
         self.connection = connection
 
-    def close(self):
-        """Closes the database connection."""
+    def is_alive(self) -> bool:
+        """Checks that the server still answers on this connection."""
+        try:
+            if self.db_type == "mysql":
+                self.connection.ping(reconnect=False)
+            elif self.db_type == "mongodb":
+                self.connection.command("ping")
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        """Ends any open transaction so that the connection can be handed to another user."""
         if self.db_type == "mysql":
+            self.connection.rollback()
+
+    def close(self):
+        """Closes the database connection, or returns it to its pool if it was checked out of one."""
+        if isinstance(self.connection, PooledConnection):
             self.connection.close()
-        elif self.db_type == "mongodb":
+        elif self.db_type == "mysql":
             self.connection.close()
+        elif self.db_type == "mongodb":
+            self.connection.client.close()
+
+class PooledConnection:
+    """
+    A connection checked out of a ConnectionPool.
+
+    It behaves like the underlying driver connection, except that closing it
+    returns the connection to its pool instead of closing it.
+    """
+
+    def __init__(self, pool: "ConnectionPool", connection: DatabaseConnection):
+        self._pool = pool
+        self._connection: Optional[DatabaseConnection] = connection
+
+    def close(self):
+        """Returns the connection to its pool. Closing twice has no effect."""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+    def __getattr__(self, name: str) -> Any:
+        if self.__dict__.get("_connection") is None:
+            raise RuntimeError("The connection was returned to its pool.")
+        return getattr(self._connection.connection, name)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class ConnectionPool:
+    """
+    Thread-safe pool of connections to one database.
+
+    Connections are checked out with acquire() (or the connection() context manager)
+    and go back to the pool when closed. Every connection is checked for liveness on
+    checkout and silently replaced if the server dropped it, and connections idle for
+    longer than max_idle seconds are closed as long as the pool keeps min_size of them.
+    """
+
+    def __init__(self, db_type: str, creator: Callable[[], Any], min_size: int = 1, max_size: int = 10,
+                 max_idle: float = 300.0, timeout: float = 30.0):
+        """
+        :param db_type: Either "mysql" or "mongodb".
+        :param creator: Callable opening a new driver connection.
+        :param min_size: Number of connections opened upfront and kept open when idle.
+        :param max_size: Maximum number of connections open at the same time.
+        :param max_idle: Seconds after which an idle connection above min_size is closed.
+        :param timeout: Default number of seconds acquire() waits for a free connection.
+        """
+        if min_size < 0 or max_size <= 0 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size > 0.")
+
+        self.db_type = db_type
+        self.creator = creator
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+
+        self._idle: List[Tuple[DatabaseConnection, float]] = []  # Oldest first
+        self._size = 0  # Open connections, idle or checked out
+        self._closed = False
+        self._cond = threading.Condition()
+
+        for _ in range(min_size):
+            self._idle.append((self._create(), time.monotonic()))
+            self._size += 1
+
+    @property
+    def size(self) -> int:
+        """Number of open connections, idle or checked out."""
+        with self._cond:
+            return self._size
+
+    def _create(self) -> DatabaseConnection:
+        """Opens a new connection."""
+        return DatabaseConnection(self.db_type, self.creator())
+
+    def _discard(self, connection: DatabaseConnection):
+        """Closes a connection that leaves the pool, ignoring errors from dead connections."""
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self):
+        """Closes the connections idle for too long. Must be called with the lock held."""
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            connection, _ = self._idle.pop(0)
+            self._size -= 1
+            self._discard(connection)
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """
+        Checks out a live connection, opening a new one if none is idle and the pool is not full.
+
+        :param timeout: Seconds to wait for a connection when the pool is full (defaults to the pool timeout).
+        :return: The connection. Close it to return it to the pool.
+        :raises TimeoutError: If no connection became available in time.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._cond:
+            self._evict_idle()
+            while True:
+                if self._closed:
+                    raise RuntimeError("The connection pool is closed.")
+                if self._idle:
+                    connection, _ = self._idle.pop()  # Most recently used first
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # Reserve the slot, then connect outside the lock
+                    connection = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No connection available after {self.timeout if timeout is None else timeout} seconds.")
+                self._cond.wait(remaining)
+
+        if connection is not None and connection.is_alive():
+            return PooledConnection(self, connection)
+
+        if connection is not None:
+            self._discard(connection)  # Dropped by the server: reconnect in its slot
+        try:
+            connection = self._create()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, connection)
+
+    def release(self, connection: DatabaseConnection):
+        """
+        Returns a checked out connection to the pool, ending its open transaction.
+        Connections that fail to reset are closed instead.
+        """
+        try:
+            connection.reset()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            if healthy and not self._closed:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._size -= 1
+                self._discard(connection)
+            self._evict_idle()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager checking out a connection and returning it to the pool on exit."""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def close(self):
+        """Closes the idle connections. Checked out connections are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for connection, _ in idle:
+            self._discard(connection)
 
 class DatabaseFactory:
-    """Factory class to manage multiple database connections."""
+    """
+    Factory class to manage pools of connections to multiple databases.
+
+    get_connection returns the connection stored under a name, shared by all its callers
+    and kept until close_connection; acquire checks out a connection of its own, which
+    the caller must close to give it back to the pool.
+    """
 
+    pools: Dict[str, ConnectionPool] = {}
     connections: Dict[str, DatabaseConnection] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def create_mysql_connection(cls, name: str, host: str, user: str, password: str, database: str, port: int = 3306,
+                                min_size: int = 1, max_size: int = 10, max_idle: float = 300.0, **options):
+        """
+        Creates a pool of MySQL connections and stores it.
+        Extra keyword options are passed to pymysql.connect, e.g. local_infile=True
+        to allow the LOAD DATA LOCAL INFILE write strategy.
+        """
+        cls.close_connection(name)
+
+        def creator():
+            return pymysql.connect(host=host, user=user, password=password, database=database, port=port, **options)
+        cls.pools[name] = ConnectionPool("mysql", creator, min_size=min_size, max_size=max_size, max_idle=max_idle)
 
     @classmethod
-    def create_mysql_connection(cls, name: str, host: str, user: str, password: str, database: str, port: int = 3306):
-        """Creates a MySQL connection and stores it."""
-        connection = pymysql.connect(host=host, user=user, password=password, database=database, port=port)
-        cls.connections[name] = DatabaseConnection("mysql", connection)
+    def create_mongodb_connection(cls, name: str, uri: str, database: str,
+                                  min_size: int = 1, max_size: int = 10, max_idle: float = 300.0):
+        """Creates a pool of MongoDB connections and stores it."""
+        cls.close_connection(name)
+
+        def creator():
+            return pymongo.MongoClient(uri)[database]
+        cls.pools[name] = ConnectionPool("mongodb", creator, min_size=min_size, max_size=max_size, max_idle=max_idle)
 
     @classmethod
-    def create_mongodb_connection(cls, name: str, uri: str, database: str):
-        """Creates a MongoDB connection and stores it."""
-        client = pymongo.MongoClient(uri)
-        cls.connections[name] = DatabaseConnection("mongodb", client[database])
+    def get_pool(cls, name: str) -> Optional[ConnectionPool]:
+        """Retrieves a stored connection pool."""
+        return cls.pools.get(name)
 
     @classmethod
     def get_connection(cls, name: str) -> Optional[DatabaseConnection]:
-        """Retrieves a stored database connection."""
-        return cls.connections.get(name)
+        """
+        Retrieves the stored database connection of a name, checked out of its pool on
+        first use and held until close_connection. Callers must not close it.
+        """
+        with cls._lock:
+            if name not in cls.connections:
+                pool = cls.pools.get(name)
+                if pool is None:
+                    return None
+                cls.connections[name] = DatabaseConnection(pool.db_type, pool.acquire())
+            return cls.connections[name]
+
+    @classmethod
+    def acquire(cls, name: str, timeout: Optional[float] = None) -> DatabaseConnection:
+        """
+        Checks out a connection of its own from a stored pool, e.g. for a worker thread.
+        Closing the returned connection gives it back to the pool.
+        """
+        if name not in cls.pools:
+            raise ValueError(f"No connection named '{name}'.")
+        pool = cls.pools[name]
+        return DatabaseConnection(pool.db_type, pool.acquire(timeout))
+
+    @classmethod
+    def connection(cls, name: str):
+        """Context manager checking out a connection from a stored pool."""
+        if name not in cls.pools:
+            raise ValueError(f"No connection named '{name}'.")
+        return cls.pools[name].connection()
 
     @classmethod
     def close_connection(cls, name: str):
-        """Closes a specific database connection."""
-        if name in cls.connections:
-            cls.connections[name].close()
-            del cls.connections[name]
+        """Closes a specific database connection and its pool."""
+        with cls._lock:
+            connection = cls.connections.pop(name, None)
+        if connection is not None:
+            connection.close()
+        if name in cls.pools:
+            cls.pools[name].close()
+            del cls.pools[name]
 
     @classmethod
     def close_all_connections(cls):
-        """Closes all active database connections."""
-        for name in list(cls.connections.keys()):
-            cls.connections[name].close()
-            del cls.connections[name]
+        """Closes all database connections and their pools."""
+        for name in list(cls.pools.keys()):
+            cls.close_connection(name)
  
 # --- Database Connection Factory ---
 '''
@@ -1,17 +1,87 @@
+import hashlib
 import json
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any, Tuple, Union
+
+def quote_identifier(name: str) -> str:
+    """Quotes a table, column or index name for MySQL."""
+    return "`" + name.replace("`", "``") + "`"
+
+def _quote_string(value: Any) -> str:
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
 
 class Column:
     """
     Represents a column in a table.
     """
-    def __init__(self, field: str, col_type: str, nullable: bool, key: str = "", default: Optional[Any] = None, extra: str = "") -> None:
+    __slots__ = ("field", "col_type", "nullable", "key", "default", "extra", "expression")
+
+    def __init__(self, field: str, col_type: str, nullable: bool, key: str = "", default: Optional[Any] = None, extra: str = "",
+                 expression: Optional[str] = None) -> None:
         self.field: str = field          # Column name
         self.col_type: str = col_type    # Data type (e.g., 'int(11)', 'varchar(255)')
         self.nullable: bool = nullable   # True if column allows NULL values
         self.key: str = key              # Key information (e.g., 'PRI' for primary key)
         self.default: Optional[Any] = default  # Default value if any
         self.extra: str = extra          # Extra attributes (e.g., 'auto_increment')
+        self.expression: Optional[str] = expression  # Expression of a generated column
+
+    @property
+    def generated(self) -> bool:
+        """True for generated (VIRTUAL or STORED) columns, whose values are computed by MySQL."""
+        extra = self.extra.upper()
+        return "VIRTUAL GENERATED" in extra or "STORED GENERATED" in extra
+
+    @property
+    def name(self) -> str:
+        """Alias of field."""
+        return self.field
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the JSON representation of the column, in the format of DESCRIBE, plus
+        the expression of generated columns.
+        """
+        result = {
+            "Field": self.field,
+            "Type": self.col_type,
+            "Null": "YES" if self.nullable else "NO",
+            "Key": self.key,
+            "Default": self.default,
+            "Extra": self.extra,
+        }
+        if self.expression is not None:
+            result["Expression"] = self.expression
+        return result
+
+    def definition(self) -> str:
+        """Returns the column definition used in CREATE TABLE and ALTER TABLE statements."""
+        parts = [quote_identifier(self.field), self.col_type]
+        if self.generated:
+            if self.expression is None:
+                raise ValueError(f"The expression of generated column '{self.field}' is unknown.")
+            storage = "STORED" if "STORED GENERATED" in self.extra.upper() else "VIRTUAL"
+            parts.append(f"GENERATED ALWAYS AS ({self.expression}) {storage}")
+            if not self.nullable:
+                parts.append("NOT NULL")
+            return " ".join(parts)
+        if not self.nullable:
+            parts.append("NOT NULL")
+        extra = self.extra.replace("DEFAULT_GENERATED", "").strip()
+        if self.default is not None:
+            default = str(self.default)
+            if default.upper().startswith(("CURRENT_TIMESTAMP", "NOW(")):
+                parts.append(f"DEFAULT {default}")
+            elif "DEFAULT_GENERATED" in self.extra:
+                # Expression defaults (MySQL 8.0.13+) must be parenthesized
+                parts.append(f"DEFAULT ({default})")
+            elif self.col_type.lower().startswith("bit") and default.lower().startswith("b'"):
+                # BIT defaults are bit-value literals, e.g. b'0'
+                parts.append(f"DEFAULT {default}")
+            else:
+                parts.append(f"DEFAULT {_quote_string(default)}")
+        if extra:
+            parts.append(extra.upper() if extra.lower() == "auto_increment" else extra)
+        return " ".join(parts)
 
     def __str__(self) -> str:
         return f"{self.field} ({self.col_type})"
@@ -19,19 +89,142 @@ class Column:
     def __repr__(self) -> str:
         return (f"Column(field={self.field!r}, col_type={self.col_type!r}, "
                 f"nullable={self.nullable!r}, key={self.key!r}, "
-                f"default={self.default!r}, extra={self.extra!r})")
+                f"default={self.default!r}, extra={self.extra!r}, expression={self.expression!r})")
+
+class ForeignKey:
+    """
+    Represents a foreign key constraint from columns of a table to columns of a parent table.
+    """
+    __slots__ = ("name", "columns", "ref_table", "ref_columns", "on_update", "on_delete")
+
+    def __init__(self, name: str, columns: List[str], ref_table: str, ref_columns: List[str],
+                 on_update: str = "RESTRICT", on_delete: str = "RESTRICT") -> None:
+        self.name: str = name                # Constraint name
+        self.columns: List[str] = columns    # Referencing columns, in constraint order
+        self.ref_table: str = ref_table      # Referenced (parent) table
+        self.ref_columns: List[str] = ref_columns  # Referenced columns, in constraint order
+        self.on_update: str = on_update      # Referential action (e.g. 'CASCADE')
+        self.on_delete: str = on_delete      # Referential action (e.g. 'SET NULL')
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the JSON representation of the foreign key."""
+        return {
+            "Name": self.name,
+            "Columns": self.columns,
+            "RefTable": self.ref_table,
+            "RefColumns": self.ref_columns,
+            "OnUpdate": self.on_update,
+            "OnDelete": self.on_delete,
+        }
+
+    def definition(self) -> str:
+        """Returns the constraint definition used in CREATE TABLE and ALTER TABLE ... ADD statements."""
+        columns = ", ".join(quote_identifier(column) for column in self.columns)
+        ref_columns = ", ".join(quote_identifier(column) for column in self.ref_columns)
+        return (f"CONSTRAINT {quote_identifier(self.name)} FOREIGN KEY ({columns}) "
+                f"REFERENCES {quote_identifier(self.ref_table)} ({ref_columns}) "
+                f"ON DELETE {self.on_delete} ON UPDATE {self.on_update}")
+
+    def __str__(self) -> str:
+        return f"{self.name}: ({', '.join(self.columns)}) -> {self.ref_table}({', '.join(self.ref_columns)})"
+
+    def __repr__(self) -> str:
+        return (f"ForeignKey(name={self.name!r}, columns={self.columns!r}, "
+                f"ref_table={self.ref_table!r}, ref_columns={self.ref_columns!r}, "
+                f"on_update={self.on_update!r}, on_delete={self.on_delete!r})")
+
+class Index:
+    """
+    Represents an index of a table, including the primary key (named 'PRIMARY').
+    """
+    __slots__ = ("name", "columns", "unique", "index_type", "sub_parts")
+
+    def __init__(self, name: str, columns: List[str], unique: bool = False, index_type: str = "BTREE",
+                 sub_parts: Optional[List[Optional[int]]] = None) -> None:
+        self.name: str = name                # Index name
+        self.columns: List[str] = columns    # Indexed columns, in index order
+        self.unique: bool = unique           # True for unique indexes and the primary key
+        self.index_type: str = index_type    # Index type (e.g. 'BTREE', 'FULLTEXT')
+        self.sub_parts: List[Optional[int]] = sub_parts if sub_parts is not None else [None] * len(columns)  # Prefix lengths
+
+    @property
+    def is_primary(self) -> bool:
+        """True if this index is the primary key."""
+        return self.name == "PRIMARY"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the JSON representation of the index."""
+        return {
+            "Name": self.name,
+            "Columns": self.columns,
+            "Unique": self.unique,
+            "Type": self.index_type,
+            "SubParts": self.sub_parts,
+        }
+
+    def definition(self) -> str:
+        """Returns the index definition used in CREATE TABLE and ALTER TABLE ... ADD statements."""
+        parts = []
+        for column, sub_part in zip(self.columns, self.sub_parts):
+            parts.append(quote_identifier(column) + (f"({sub_part})" if sub_part else ""))
+        columns = ", ".join(parts)
+        if self.is_primary:
+            return f"PRIMARY KEY ({columns})"
+        if self.index_type in ("FULLTEXT", "SPATIAL"):
+            return f"{self.index_type} KEY {quote_identifier(self.name)} ({columns})"
+        kind = "UNIQUE KEY" if self.unique else "KEY"
+        return f"{kind} {quote_identifier(self.name)} ({columns})"
+
+    def __str__(self) -> str:
+        return f"{self.name} ({', '.join(self.columns)})"
+
+    def __repr__(self) -> str:
+        return (f"Index(name={self.name!r}, columns={self.columns!r}, unique={self.unique!r}, "
+                f"index_type={self.index_type!r}, sub_parts={self.sub_parts!r})")
 
 class Table:
     """
     Represents a table in a database schema.
+
+    Columns and indexes are kept in insertion-ordered dictionaries keyed by name, so that
+    lookups stay O(1) on wide tables. Add them through add_column and add_index, which
+    keep the precomputed primary key up to date.
     """
-    def __init__(self, name: str, columns: Optional[List[Column]] = None) -> None:
+    __slots__ = ("name", "columns", "foreign_keys", "indexes", "stats", "_primary_key", "_fingerprint")
+
+    def __init__(self, name: str, columns: Optional[Union[Iterable[Column], Dict[str, Column]]] = None,
+                 foreign_keys: Optional[List[ForeignKey]] = None,
+                 indexes: Optional[Union[Iterable[Index], Dict[str, Index]]] = None,
+                 stats: Optional[Dict[str, Any]] = None) -> None:
         self.name: str = name
-        self.columns: List[Column] = columns if columns is not None else []
+        self.columns: Dict[str, Column] = {}  # Ordered dictionary: column name -> Column object
+        self.foreign_keys: List[ForeignKey] = foreign_keys if foreign_keys is not None else []
+        self.indexes: Dict[str, Index] = {}   # Ordered dictionary: index name -> Index object
+        self.stats: Dict[str, Any] = stats if stats is not None else {}  # e.g. rows, data_length, avg_row_length
+        self._primary_key: Optional[Tuple[str, ...]] = None
+        self._fingerprint: Optional[str] = None
+
+        for column in (columns.values() if isinstance(columns, dict) else columns or ()):
+            self.add_column(column)
+        for index in (indexes.values() if isinstance(indexes, dict) else indexes or ()):
+            self.add_index(index)
 
     def add_column(self, column: Column) -> None:
         """Adds a Column object to the table."""
-        self.columns.append(column)
+        self.columns[column.field] = column
+        self._primary_key = None
+        self._fingerprint = None
+
+    def add_foreign_key(self, foreign_key: ForeignKey) -> None:
+        """Adds a ForeignKey object to the table."""
+        self.foreign_keys.append(foreign_key)
+        self._fingerprint = None
+
+    def add_index(self, index: Index) -> None:
+        """Adds an Index object to the table."""
+        self.indexes[index.name] = index
+        self._primary_key = None
+        self._fingerprint = None
 
     def get_column(self, column_name: str) -> Optional[Column]:
         """
@@ -39,22 +232,99 @@ class Table:
         :param column_name: Name of the column.
         :return: Column object if found; otherwise, None.
         """
-        for col in self.columns:
-            if col.field == column_name:
-                return col
-        return None
+        return self.columns.get(column_name)
+
+    def get_index(self, index_name: str) -> Optional[Index]:
+        """
+        Retrieve an index by its name.
+        :param index_name: Name of the index ('PRIMARY' for the primary key).
+        :return: Index object if found; otherwise, None.
+        """
+        return self.indexes.get(index_name)
+
+    @property
+    def primary_key(self) -> Tuple[str, ...]:
+        """
+        Names of the primary key columns, in key order when the PRIMARY index is known
+        and in column order otherwise. Computed once until columns or indexes change.
+        """
+        if self._primary_key is None:
+            primary = self.indexes.get("PRIMARY")
+            if primary is not None:
+                self._primary_key = tuple(primary.columns)
+            else:
+                self._primary_key = tuple(col.field for col in self.columns.values() if col.key == "PRI")
+        return self._primary_key
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Stable hash of the table structure: its ordered column definitions, indexes and
+        foreign keys (but not its name or stats). Two tables with the same fingerprint
+        have the same structure. Computed once until columns, indexes or foreign keys
+        are added; call invalidate_fingerprint after modifying them in place.
+        """
+        if self._fingerprint is None:
+            structure = [
+                [[col.field, col.col_type, bool(col.nullable), col.key, col.default, col.extra, col.expression]
+                 for col in self.columns.values()],
+                [[index.name, index.columns, bool(index.unique), index.index_type, index.sub_parts]
+                 for index in sorted(self.indexes.values(), key=lambda index: index.name)],
+                [[fk.name, fk.columns, fk.ref_table, fk.ref_columns, fk.on_update, fk.on_delete]
+                 for fk in sorted(self.foreign_keys, key=lambda fk: fk.name)],
+            ]
+            encoded = json.dumps(structure, separators=(",", ":"), default=str)
+            self._fingerprint = hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+    def invalidate_fingerprint(self) -> None:
+        """Forgets the cached fingerprint, after columns, indexes or foreign keys were modified in place."""
+        self._fingerprint = None
+
+    @property
+    def secondary_indexes(self) -> List[Index]:
+        """The indexes other than the primary key."""
+        return [index for index in self.indexes.values() if not index.is_primary]
+
+    def create_sql(self) -> str:
+        """
+        Returns the CREATE TABLE statement of the table: its columns, primary key,
+        secondary indexes, foreign keys and, when known, storage engine.
+        """
+        definitions = [col.definition() for col in self.columns.values()]
+        if "PRIMARY" not in self.indexes and self.primary_key:
+            definitions.append(Index("PRIMARY", list(self.primary_key), unique=True).definition())
+        definitions += [index.definition() for index in self.indexes.values()]
+        definitions += [fk.definition() for fk in self.foreign_keys]
+        statement = f"CREATE TABLE {quote_identifier(self.name)} (\n  " + ",\n  ".join(definitions) + "\n)"
+        if self.stats.get("engine"):
+            statement += f" ENGINE={self.stats['engine']}"
+        return statement
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the JSON representation of the table, as read by Database.load_from_json."""
+        return {
+            "columns": [col.to_dict() for col in self.columns.values()],
+            "indexes": [index.to_dict() for index in self.indexes.values()],
+            "foreign_keys": [fk.to_dict() for fk in self.foreign_keys],
+            "stats": self.stats,
+            "fingerprint": self.fingerprint,
+        }
 
     def __str__(self) -> str:
-        cols = ", ".join(col.field for col in self.columns)
+        cols = ", ".join(self.columns)
         return f"Table '{self.name}' with columns: {cols}"
 
     def __repr__(self) -> str:
-        return f"Table(name={self.name!r}, columns={self.columns!r})"
+        return (f"Table(name={self.name!r}, columns={list(self.columns.values())!r}, "
+                f"foreign_keys={self.foreign_keys!r}, indexes={list(self.indexes.values())!r})")
 
 class Schema:
     """
     Represents a database schema that contains multiple tables.
     """
+    __slots__ = ("name", "tables")
+
     def __init__(self, name, tables=None):
         self.name = name                       # Schema name
         self.tables = tables or {}             # Dictionary: table name -> Table object
@@ -67,6 +337,14 @@ class Schema:
         """Retrieve a table by its name."""
         return self.tables.get(table_name)
 
+    def to_dict(self):
+        """Returns the JSON representation of the schema, as read by Database.load_from_json."""
+        return {name: table.to_dict() for name, table in self.tables.items()}
+
+    def fingerprints(self):
+        """Returns the fingerprint of every table, by table name."""
+        return {name: table.fingerprint for name, table in self.tables.items()}
+
     def __str__(self):
         tables_str = "\n  ".join(str(table) for table in self.tables.values())
         return f"Schema '{self.name}':\n  {tables_str}"
@@ -80,6 +358,8 @@ class Database:
     Represents a database that can contain one or more schemas.
     For MySQL, a database is equivalent to a schema.
     """
+    __slots__ = ("name", "schemas")
+
     def __init__(self, name, schemas=None):
         self.name = name                       # Database name
         self.schemas = schemas or {}           # Dictionary: schema name -> Schema object
@@ -111,6 +391,11 @@ class Database:
                 ],
                 ...
             }
+
+        Each table may also be an object holding its "columns" in the format above along
+        with its "indexes", "foreign_keys", "stats" and "fingerprint", as written by
+        save_to_json. The fingerprint is informative only: it is recomputed from the
+        definitions read, which may have been edited since it was saved.
         
         This method creates a default schema (named the same as the database) and populates it.
         """
@@ -118,22 +403,56 @@ class Database:
             data = json.load(f)
 
         default_schema = Schema(self.name)
-        for table_name, columns in data.items():
-            table = Table(table_name)
-            for col in columns:
+        for table_name, definition in data.items():
+            if isinstance(definition, list):
+                definition = {"columns": definition}
+
+            table = Table(table_name, stats=definition.get("stats"))
+            for col in definition["columns"]:
                 column = Column(
                     field=col["Field"],
                     col_type=col["Type"],
-                    nullable=col["Null"],
+                    nullable=col["Null"] == "YES",
                     key=col["Key"],
                     default=col["Default"],
-                    extra=col["Extra"]
+                    extra=col["Extra"],
+                    expression=col.get("Expression")
                 )
                 table.add_column(column)
+            for index in definition.get("indexes", []):
+                table.add_index(Index(
+                    name=index["Name"],
+                    columns=index["Columns"],
+                    unique=index["Unique"],
+                    index_type=index["Type"],
+                    sub_parts=index["SubParts"]
+                ))
+            for fk in definition.get("foreign_keys", []):
+                table.add_foreign_key(ForeignKey(
+                    name=fk["Name"],
+                    columns=fk["Columns"],
+                    ref_table=fk["RefTable"],
+                    ref_columns=fk["RefColumns"],
+                    on_update=fk["OnUpdate"],
+                    on_delete=fk["OnDelete"]
+                ))
             default_schema.add_table(table)
 
         self.add_schema(default_schema)
 
+    def save_to_json(self, json_file, schema_name=None):
+        """
+        Save a schema of the database to a JSON file readable by load_from_json.
+        :param json_file: Path of the file to write.
+        :param schema_name: Schema to save (defaults to the schema named the same as the database).
+        """
+        schema = self.get_schema(schema_name or self.name)
+        if schema is None:
+            raise ValueError(f"Schema '{schema_name or self.name}' does not exist.")
+
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(schema.to_dict(), f, indent=4, default=str)
+
     def __str__(self):
         schemas_str = "\n".join(str(schema) for schema in self.schemas.values())
         return f"Database '{self.name}':\n{schemas_str}"
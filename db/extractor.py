@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+from db.db_components import Column, Database, ForeignKey, Index, Schema, Table
+from db.instrumentation import instrumentation
+
+class SchemaExtractor:
+    """
+    Extracts database schemas from a MySQL server through information_schema.
+
+    All the databases requested together are read with one query per kind of
+    metadata (tables, columns, indexes and foreign keys), whatever the number of
+    tables, instead of one DESCRIBE round trip per table.
+    """
+
+    TABLES_QUERY = """
+        SELECT TABLE_SCHEMA, TABLE_NAME, TABLE_TYPE, ENGINE, TABLE_ROWS, AVG_ROW_LENGTH,
+               DATA_LENGTH, INDEX_LENGTH, AUTO_INCREMENT
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA IN ({databases})
+        """
+
+    COLUMNS_QUERY = """
+        SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE,
+               COLUMN_KEY, COLUMN_DEFAULT, EXTRA, GENERATION_EXPRESSION
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA IN ({databases})
+        ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION
+        """
+
+    INDEXES_QUERY = """
+        SELECT TABLE_SCHEMA, TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME, SUB_PART, INDEX_TYPE
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA IN ({databases})
+        ORDER BY TABLE_SCHEMA, TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+        """
+
+    FOREIGN_KEYS_QUERY = """
+        SELECT k.TABLE_SCHEMA, k.TABLE_NAME, k.CONSTRAINT_NAME, k.COLUMN_NAME,
+               k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME, r.UPDATE_RULE, r.DELETE_RULE
+        FROM information_schema.KEY_COLUMN_USAGE k
+        JOIN information_schema.REFERENTIAL_CONSTRAINTS r
+          ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+         AND r.TABLE_NAME = k.TABLE_NAME
+        WHERE k.TABLE_SCHEMA IN ({databases}) AND k.REFERENCED_TABLE_NAME IS NOT NULL
+        ORDER BY k.TABLE_SCHEMA, k.TABLE_NAME, k.CONSTRAINT_NAME, k.ORDINAL_POSITION
+        """
+
+    def __init__(self, connection):
+        """
+        :param connection: A MySQL connection (PyMySQL or mysql.connector) to the server.
+        """
+        self.conn = connection
+
+    @staticmethod
+    def _text(value: Any) -> Any:
+        """Decodes the byte strings some drivers return for information_schema columns."""
+        if isinstance(value, (bytes, bytearray)):
+            return value.decode("utf-8")
+        return value
+
+    def _query(self, query: str, databases: List[str]) -> List[Tuple]:
+        """Runs one of the information_schema queries for a list of databases."""
+        placeholders = ", ".join(["%s"] * len(databases))
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query.format(databases=placeholders), tuple(databases))
+            return [tuple(self._text(value) for value in row) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def foreign_keys(self, databases: List[str]) -> Dict[Tuple[str, str], List[ForeignKey]]:
+        """
+        Reads the foreign keys of the given databases.
+
+        :return: A dictionary mapping (database, table) to the table's foreign keys.
+        """
+        result: Dict[Tuple[str, str], List[ForeignKey]] = {}
+        current = None
+        for database, table, name, column, ref_table, ref_column, on_update, on_delete in \
+                self._query(self.FOREIGN_KEYS_QUERY, databases):
+            if current is None or (database, table, name) != current[0]:
+                foreign_key = ForeignKey(name, [], ref_table, [], on_update=on_update, on_delete=on_delete)
+                result.setdefault((database, table), []).append(foreign_key)
+                current = ((database, table, name), foreign_key)
+            current[1].columns.append(column)
+            current[1].ref_columns.append(ref_column)
+        return result
+
+    def _schemas(self, databases: List[str]) -> Dict[str, Schema]:
+        """
+        Reads the tables, columns, indexes and foreign keys of databases into one Schema each.
+        Views are left out: they hold no rows to migrate and cannot be created as tables.
+        """
+        schemas = {name: Schema(name) for name in databases}
+
+        views = set()
+        for database, table_name, table_type, engine, rows, avg_row_length, data_length, \
+                index_length, auto_increment in self._query(self.TABLES_QUERY, databases):
+            if table_type != "BASE TABLE":
+                views.add((database, table_name))
+                continue
+            schemas[database].add_table(Table(table_name, stats={
+                "type": table_type,
+                "engine": engine,
+                "rows": rows,
+                "avg_row_length": avg_row_length,
+                "data_length": data_length,
+                "index_length": index_length,
+                "auto_increment": auto_increment,
+            }))
+
+        for database, table_name, field, col_type, nullable, key, default, extra, expression in \
+                self._query(self.COLUMNS_QUERY, databases):
+            if (database, table_name) in views:
+                continue
+            table = schemas[database].get_table(table_name)
+            if table is None:
+                table = Table(table_name)
+                schemas[database].add_table(table)
+            table.add_column(Column(
+                field=field,
+                col_type=col_type,
+                nullable=nullable == "YES",
+                key=key,
+                default=default,
+                extra=extra,
+                # MySQL 8.0 backslash-escapes the quotes of string literals in the expression
+                expression=expression.replace("\\'", "'") if expression else None
+            ))
+
+        current = None
+        for database, table_name, name, non_unique, column, sub_part, index_type in \
+                self._query(self.INDEXES_QUERY, databases):
+            if current is None or (database, table_name, name) != current[0]:
+                index = Index(name, [], unique=not int(non_unique), index_type=index_type, sub_parts=[])
+                schemas[database].get_table(table_name).add_index(index)
+                current = ((database, table_name, name), index)
+            current[1].columns.append(column)
+            current[1].sub_parts.append(int(sub_part) if sub_part is not None else None)
+
+        for (database, table_name), foreign_keys in self.foreign_keys(databases).items():
+            table = schemas[database].get_table(table_name)
+            for foreign_key in foreign_keys:
+                table.add_foreign_key(foreign_key)
+        return schemas
+
+    def extract_many(self, databases: List[str]) -> Dict[str, Database]:
+        """
+        Extracts several databases of the server at once.
+
+        :param databases: Names of the databases to extract.
+        :return: A dictionary mapping each database name to a Database holding one
+            schema of the same name, with its tables, columns, indexes, foreign keys and stats.
+        """
+        if not databases:
+            return {}
+
+        with instrumentation.stage("extract") as span:
+            schemas = self._schemas(databases)
+            span.add(sum(len(schema.tables) for schema in schemas.values()))
+
+        result = {}
+        for name, schema in schemas.items():
+            database = Database(name)
+            database.add_schema(schema)
+            result[name] = database
+        return result
+
+    def extract(self, database: str) -> Database:
+        """
+        Extracts one database of the server.
+
+        :param database: Name of the database.
+        :return: A Database holding one schema of the same name.
+        """
+        return self.extract_many([database])[database]
+
+    @staticmethod
+    def extract_concurrently(servers: Dict[str, Tuple[Callable[[], Any], List[str]]],
+                             max_workers: int = 4) -> Dict[str, Dict[str, Database]]:
+        """
+        Extracts databases from several servers in parallel, one connection per server.
+
+        :param servers: A dictionary mapping a server label to a pair of a callable
+            opening a connection to the server and the names of its databases to extract.
+        :param max_workers: Maximum number of servers queried at the same time.
+        :return: A dictionary mapping each server label to the result of extract_many.
+        """
+        def extract_server(connect, databases):
+            connection = connect()
+            try:
+                return SchemaExtractor(connection).extract_many(databases)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                label: executor.submit(extract_server, connect, databases)
+                for label, (connect, databases) in servers.items()
+            }
+            return {label: future.result() for label, future in futures.items()}
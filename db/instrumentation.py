@@ -0,0 +1,410 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, IO, Iterable, List, Optional, Sequence, Tuple, Union
+
+# Upper bounds of the batch latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _value_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return 8
+
+def rows_bytes(rows: Iterable[Any]) -> int:
+    """
+    Approximate size of rows (tuples or dictionaries) in bytes: the length of the
+    strings and binary values, and 8 bytes for any other value.
+    """
+    size = 0
+    for row in rows:
+        for value in (row.values() if isinstance(row, dict) else row):
+            size += _value_size(value)
+    return size
+
+class Observer:
+    """
+    Receives the measures of an Instrumentation. Every hook does nothing by default;
+    subclasses override the ones they need. Hooks are called from the thread that did
+    the work, so observers shared between threads must be thread-safe.
+    """
+
+    def on_stage(self, stage: str, table: Optional[str], rows: int, nbytes: int, wall: float, cpu: float):
+        """
+        One unit of work (typically a batch) of a stage completed.
+
+        :param stage: Stage name: "read", "map", "write" or "extract".
+        :param table: Table concerned, if any.
+        :param rows: Number of rows processed.
+        :param nbytes: Approximate size of the rows processed.
+        :param wall: Elapsed time, in seconds.
+        :param cpu: CPU time of the calling thread, in seconds.
+        """
+
+    def on_retry(self, stage: str, table: Optional[str], error: BaseException):
+        """A unit of work of a stage failed and is retried (or falls back to another method)."""
+
+    def on_progress(self, table: str, done: int, total: Optional[int], eta: Optional[float]):
+        """
+        Rows of a table were migrated.
+
+        :param table: Target table name.
+        :param done: Rows migrated so far.
+        :param total: Expected number of rows, if known (usually an estimate).
+        :param eta: Estimated seconds left, if the total is known.
+        """
+
+class _Span:
+    """Measures one unit of work of a stage; see Instrumentation.stage."""
+    __slots__ = ("_instrumentation", "stage", "table", "rows", "_counted", "_started", "_cpu_started")
+
+    def __init__(self, instrumentation: "Instrumentation", stage: str, table: Optional[str]):
+        self._instrumentation = instrumentation
+        self.stage = stage
+        self.table = table
+        self.rows = 0
+        self._counted: List[Sequence[Any]] = []
+
+    def count(self, rows: Sequence[Any]):
+        """Adds rows to the work measured; their size is computed once the clock has stopped."""
+        self.rows += len(rows)
+        self._counted.append(rows)
+
+    def add(self, rows: int):
+        """Adds a number of rows (or other items) to the work measured, without a size."""
+        self.rows += rows
+
+    def __enter__(self) -> "_Span":
+        self._started = time.perf_counter()
+        self._cpu_started = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self._started
+        cpu = time.thread_time() - self._cpu_started
+        if exc_type is None:
+            nbytes = sum(rows_bytes(rows) for rows in self._counted)
+            self._instrumentation._notify("on_stage", self.stage, self.table, self.rows, nbytes, wall, cpu)
+        return False
+
+class _NoopSpan:
+    """Span returned while no observer is registered: nothing is measured."""
+    __slots__ = ()
+
+    def count(self, rows: Sequence[Any]):
+        pass
+
+    def add(self, rows: int):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class Instrumentation:
+    """
+    Measures the stages of a migration (source reads, mapping, target writes, schema
+    extraction), counts retries and tracks the progress of every table, and passes the
+    measures to the registered observers.
+
+    MySQLCRUD, FieldMapper, DataMigrator and SchemaExtractor report to the shared
+    `instrumentation` instance of this module. While no observer is registered, stage()
+    returns a shared span that measures nothing, so the cost of the instrumentation is
+    one attribute check per batch.
+
+    Usage:
+        metrics = MetricsCollector()
+        instrumentation.add_observer(metrics)
+        instrumentation.add_observer(ProgressPrinter())
+        scheduler.run()
+        metrics.write_prometheus("migration.prom")
+    """
+
+    def __init__(self):
+        self._observers: List[Observer] = []
+        # table -> [start time, rows done, expected rows, rows done before this run]
+        self._progress: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self.enabled = False
+
+    def add_observer(self, observer: Observer):
+        """Registers an observer, enabling the measures."""
+        with self._lock:
+            self._observers = self._observers + [observer]
+            self.enabled = True
+
+    def remove_observer(self, observer: Observer):
+        """Unregisters an observer; the measures stop with the last one."""
+        with self._lock:
+            self._observers = [registered for registered in self._observers if registered is not observer]
+            self.enabled = bool(self._observers)
+
+    def _notify(self, hook: str, *args):
+        for observer in self._observers:
+            getattr(observer, hook)(*args)
+
+    def stage(self, stage: str, table: Optional[str] = None) -> Union[_Span, _NoopSpan]:
+        """
+        Context manager measuring the wall and CPU time of one unit of work of a stage.
+        Call count(rows) on it with the rows processed. Failed units are not recorded.
+
+        :param stage: Stage name.
+        :param table: Table concerned, if any.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, stage, table)
+
+    def retry(self, stage: str, table: Optional[str], error: BaseException):
+        """Records that a unit of work failed with error and is retried."""
+        if self.enabled:
+            self._notify("on_retry", stage, table, error)
+
+    def start_table(self, table: str, total: Optional[int] = None, done: int = 0) -> bool:
+        """
+        Starts tracking the progress of a table, unless it is already tracked (e.g. by
+        migrate_table_parallel around the migration of its ranges).
+
+        :param table: Target table name.
+        :param total: Expected number of rows, e.g. the "rows" estimate of the table's stats.
+        :param done: Rows already migrated by a previous run.
+        :return: True if the caller started the tracking and must call finish_table.
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if table in self._progress:
+                return False
+            self._progress[table] = [time.monotonic(), done, total, done]
+            return True
+
+    def advance(self, table: str, rows: int):
+        """Records rows migrated for a tracked table and reports the progress and ETA."""
+        if not self.enabled:
+            return
+        with self._lock:
+            progress = self._progress.get(table)
+            if progress is None:
+                return
+            progress[1] += rows
+            started, done, total, initial = progress
+        eta = None
+        elapsed = time.monotonic() - started
+        if total is not None and done > initial and elapsed > 0:
+            rate = (done - initial) / elapsed
+            eta = max(total - done, 0) / rate
+        self._notify("on_progress", table, done, total, eta)
+
+    @contextmanager
+    def track(self, table: str, total: Optional[int] = None, done: int = 0):
+        """
+        Tracks the progress of a table within the block, with start_table and finish_table.
+
+        :param table: Target table name.
+        :param total: Expected number of rows.
+        :param done: Rows already migrated by a previous run.
+        """
+        started = self.start_table(table, total, done)
+        try:
+            yield
+        except BaseException:
+            if started:
+                self.finish_table(table, completed=False)
+            raise
+        if started:
+            self.finish_table(table)
+
+    def finish_table(self, table: str, completed: bool = True):
+        """Stops tracking a table, reporting its final progress if it completed."""
+        with self._lock:
+            progress = self._progress.pop(table, None)
+        if progress is not None and completed and self.enabled:
+            done, total = progress[1], progress[2]
+            self._notify("on_progress", table, done, total if total is not None else done, 0.0)
+
+# Shared instance the components of the tool report to
+instrumentation = Instrumentation()
+
+class MetricsCollector(Observer):
+    """
+    Aggregates the measures per stage and table: wall and CPU time, rows and bytes,
+    a histogram of the batch latencies and the number of retries, plus the last
+    progress of every table. Exports them as Prometheus text or as a dictionary.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.stages: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.retries: Dict[Tuple[str, str], int] = {}
+        self.progress: Dict[str, Tuple[int, Optional[int], Optional[float]]] = {}
+
+    def on_stage(self, stage, table, rows, nbytes, wall, cpu):
+        key = (stage, table or "")
+        with self._lock:
+            measures = self.stages.get(key)
+            if measures is None:
+                measures = self.stages[key] = {"batches": 0, "rows": 0, "bytes": 0, "wall": 0.0, "cpu": 0.0,
+                                               "buckets": [0] * (len(self.buckets) + 1)}
+            measures["batches"] += 1
+            measures["rows"] += rows
+            measures["bytes"] += nbytes
+            measures["wall"] += wall
+            measures["cpu"] += cpu
+            measures["buckets"][bisect_left(self.buckets, wall)] += 1
+
+    def on_retry(self, stage, table, error):
+        key = (stage, table or "")
+        with self._lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def on_progress(self, table, done, total, eta):
+        with self._lock:
+            self.progress[table] = (done, total, eta)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The measures as a JSON-serializable dictionary."""
+        with self._lock:
+            stages = []
+            for (stage, table), measures in self.stages.items():
+                entry = {"stage": stage, "table": table}
+                entry.update((name, value) for name, value in measures.items() if name != "buckets")
+                entry["rows_per_s"] = measures["rows"] / measures["wall"] if measures["wall"] else None
+                entry["histogram"] = dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], measures["buckets"]))
+                stages.append(entry)
+            retries = [{"stage": stage, "table": table, "count": count}
+                       for (stage, table), count in self.retries.items()]
+            progress = {table: {"done": done, "total": total, "eta": eta}
+                        for table, (done, total, eta) in self.progress.items()}
+        return {"stages": stages, "retries": retries, "progress": progress}
+
+    @staticmethod
+    def _labels(**labels: str) -> str:
+        escaped = (name + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+                   for name, value in labels.items())
+        return "{" + ",".join(escaped) + "}"
+
+    def prometheus(self) -> str:
+        """The measures in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def family(name: str, kind: str, description: str):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            stages = {key: dict(measures, buckets=list(measures["buckets"])) for key, measures in self.stages.items()}
+            retries = dict(self.retries)
+            progress = dict(self.progress)
+
+        for name, field, description in (
+                ("migration_stage_seconds_total", "wall", "Wall time spent per stage."),
+                ("migration_stage_cpu_seconds_total", "cpu", "CPU time spent per stage."),
+                ("migration_stage_rows_total", "rows", "Rows processed per stage."),
+                ("migration_stage_bytes_total", "bytes", "Approximate bytes processed per stage.")):
+            family(name, "counter", description)
+            for (stage, table), measures in stages.items():
+                lines.append(f"{name}{self._labels(stage=stage, table=table)} {measures[field]}")
+
+        family("migration_batch_duration_seconds", "histogram", "Latency of the batches of each stage.")
+        for (stage, table), measures in stages.items():
+            cumulative = 0
+            for bound, count in zip([str(bound) for bound in self.buckets] + ["+Inf"], measures["buckets"]):
+                cumulative += count
+                labels = self._labels(stage=stage, table=table, le=bound)
+                lines.append(f"migration_batch_duration_seconds_bucket{labels} {cumulative}")
+            labels = self._labels(stage=stage, table=table)
+            lines.append(f"migration_batch_duration_seconds_sum{labels} {measures['wall']}")
+            lines.append(f"migration_batch_duration_seconds_count{labels} {measures['batches']}")
+
+        family("migration_retries_total", "counter", "Failed units of work that were retried.")
+        for (stage, table), count in retries.items():
+            lines.append(f"migration_retries_total{self._labels(stage=stage, table=table)} {count}")
+
+        family("migration_table_rows_done", "gauge", "Rows migrated per table.")
+        for table, (done, _, _) in progress.items():
+            lines.append(f"migration_table_rows_done{self._labels(table=table)} {done}")
+        family("migration_table_rows_expected", "gauge", "Expected rows per table.")
+        for table, (_, total, _) in progress.items():
+            if total is not None:
+                lines.append(f"migration_table_rows_expected{self._labels(table=table)} {total}")
+        family("migration_table_eta_seconds", "gauge", "Estimated time left per table.")
+        for table, (_, _, eta) in progress.items():
+            if eta is not None:
+                lines.append(f"migration_table_eta_seconds{self._labels(table=table)} {eta}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """
+        Writes the Prometheus text to a file, e.g. for the textfile collector of the
+        node exporter. The file is replaced atomically, so it is never read half written.
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+class JsonLinesExporter(Observer):
+    """Writes every measure as one JSON object per line, as it happens."""
+
+    def __init__(self, output: Union[str, IO[str]]):
+        """
+        :param output: Path of the file the lines are appended to, or an open text stream.
+        """
+        self._owned = isinstance(output, str)
+        self.stream = open(output, "a", encoding="utf-8") if self._owned else output
+        self._lock = threading.Lock()
+
+    def _write(self, event: Dict[str, Any]):
+        line = json.dumps(dict(event, time=time.time()), default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def on_stage(self, stage, table, rows, nbytes, wall, cpu):
+        self._write({"event": "stage", "stage": stage, "table": table, "rows": rows, "bytes": nbytes,
+                     "wall": wall, "cpu": cpu})
+
+    def on_retry(self, stage, table, error):
+        self._write({"event": "retry", "stage": stage, "table": table, "error": str(error)})
+
+    def on_progress(self, table, done, total, eta):
+        self._write({"event": "progress", "table": table, "done": done, "total": total, "eta": eta})
+
+    def close(self):
+        """Closes the file, if the exporter opened it."""
+        if self._owned:
+            self.stream.close()
+
+class ProgressPrinter(Observer):
+    """Prints the progress and ETA of every table, at most once per interval."""
+
+    def __init__(self, interval: float = 5.0):
+        """
+        :param interval: Minimum number of seconds between two lines for the same table.
+        """
+        self.interval = interval
+        self._printed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def on_progress(self, table, done, total, eta):
+        now = time.monotonic()
+        with self._lock:
+            if eta != 0.0 and now - self._printed.get(table, float("-inf")) < self.interval:
+                return
+            self._printed[table] = now
+        line = f"Table '{table}': {done} rows"
+        if total:
+            line += f" of ~{total} ({min(done / total, 1.0):.1%})"
+        if eta is not None:
+            line += f", ETA {eta:.0f}s"
+        print(line + ".")
@@ -1,5 +1,141 @@
-from typing import Dict, List, Optional, Any
-from db_components import Table
+import re
+from collections import OrderedDict
+from decimal import ROUND_HALF_UP, Decimal
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from db.batch import RowBatch
+from db.db_components import Column, Table
+from db.instrumentation import instrumentation
+
+# Type families of MySQL column types, used to decide when values need converting.
+_TYPE_FAMILIES = {
+    "tinyint": "int", "smallint": "int", "mediumint": "int", "int": "int", "integer": "int",
+    "bigint": "int", "year": "int", "bool": "int", "boolean": "int",
+    "float": "float", "double": "float", "real": "float",
+    "decimal": "decimal", "numeric": "decimal", "dec": "decimal",
+    "char": "str", "varchar": "str", "tinytext": "str", "text": "str", "mediumtext": "str",
+    "longtext": "str", "enum": "str", "set": "str", "json": "str",
+}
+
+# Number of compiled projections kept per mapper, least recently used first out
+COMPILED_CACHE_SIZE = 8
+
+def _to_int(value: Any) -> Any:
+    if isinstance(value, float):
+        return round(value)  # Half to even, like MySQL for approximate values
+    if isinstance(value, (bytes, bytearray)):
+        return value  # BIT values, left to MySQL
+    if not isinstance(value, (int, Decimal)):
+        try:
+            return int(value)
+        except ValueError:
+            value = Decimal(str(value).strip())
+    # Half away from zero, like MySQL for exact values
+    return int(value.to_integral_value(rounding=ROUND_HALF_UP)) if isinstance(value, Decimal) else int(value)
+
+def _to_str(value: Any) -> str:
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8")
+    return str(value)
+
+def _or_unchanged(convert: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Wraps a converter so that values it cannot convert are passed through, for MySQL to coerce."""
+    def converter(value: Any) -> Any:
+        try:
+            return convert(value)
+        except (TypeError, ValueError, ArithmeticError):
+            return value
+    return converter
+
+_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "int": _or_unchanged(_to_int),
+    "float": _or_unchanged(float),
+    "decimal": _or_unchanged(lambda value: Decimal(str(value))),
+    "str": _or_unchanged(_to_str),
+}
+
+def type_family(col_type: str) -> Optional[str]:
+    """
+    Returns the family of a MySQL column type ("int", "float", "decimal" or "str"),
+    or None for types whose values are passed through unchanged (dates, blobs, ...).
+    """
+    match = re.match(r"\s*([a-z]+)", col_type.lower())
+    return _TYPE_FAMILIES.get(match.group(1)) if match else None
+
+def converter_for(source_column: Column, target_column: Column) -> Optional[Callable[[Any], Any]]:
+    """
+    Returns the function converting values of a source column to the type of a target
+    column, or None when both columns belong to the same type family. Numbers are
+    rounded to integers the way MySQL rounds them, and values that cannot be
+    converted (dates, BIT values, malformed strings, ...) are passed through unchanged.
+    """
+    source_family = type_family(source_column.col_type)
+    target_family = type_family(target_column.col_type)
+    if source_family == target_family:
+        return None
+    return _CONVERTERS.get(target_family)
+
+class CompiledMapping:
+    """
+    A FieldMapper compiled into a fixed projection from source rows to target tuples.
+
+    Rows can be sequences whose columns are in a known order (source_indices) or
+    dictionaries keyed by source field. Applying the mapping to a batch produces
+    tuples in target_fields order, ready to bind, without building per-row dicts.
+
+    Attributes:
+        source_fields (Tuple[str, ...]): Mapped source fields, in target order.
+        target_fields (Tuple[str, ...]): Target fields, in the order of the produced tuples.
+        source_indices (Optional[Tuple[int, ...]]): Positions of source_fields in the rows, if positional.
+        conversions (Tuple[Tuple[int, Callable], ...]): Converters by target position, for the
+            columns whose type family differs between source and target.
+    """
+    def __init__(self, source_fields: Sequence[str], target_fields: Sequence[str],
+                 source_indices: Optional[Sequence[int]] = None,
+                 conversions: Optional[Sequence[Tuple[int, Callable[[Any], Any]]]] = None) -> None:
+        if not source_fields:
+            raise ValueError("Cannot compile an empty field mapping.")
+        self.source_fields: Tuple[str, ...] = tuple(source_fields)
+        self.target_fields: Tuple[str, ...] = tuple(target_fields)
+        self.source_indices: Optional[Tuple[int, ...]] = tuple(source_indices) if source_indices is not None else None
+        self.conversions: Tuple[Tuple[int, Callable[[Any], Any]], ...] = tuple(conversions or ())
+
+        keys = self.source_indices if self.source_indices is not None else self.source_fields
+        getter = itemgetter(*keys)
+        if len(keys) == 1:
+            self._project: Callable[[Any], tuple] = lambda row: (getter(row),)
+        else:
+            self._project = getter
+
+    def _convert(self, values: tuple) -> tuple:
+        """Applies the converters to one projected tuple, leaving NULLs untouched."""
+        converted = list(values)
+        for position, convert in self.conversions:
+            value = converted[position]
+            if value is not None:
+                converted[position] = convert(value)
+        return tuple(converted)
+
+    def project(self, row: Any) -> tuple:
+        """Maps a single source row to a target tuple."""
+        values = self._project(row)
+        return self._convert(values) if self.conversions else values
+
+    def apply(self, rows: Iterable[Any]) -> List[tuple]:
+        """
+        Maps a batch of source rows to target tuples.
+
+        :param rows: Source rows, positional or dictionaries depending on how the mapping was compiled.
+        :return: A list of tuples in target_fields order.
+        """
+        values = list(map(self._project, rows))
+        if self.conversions:
+            values = list(map(self._convert, values))
+        return values
+
+    def __repr__(self) -> str:
+        return (f"CompiledMapping(source_fields={self.source_fields!r}, target_fields={self.target_fields!r}, "
+                f"source_indices={self.source_indices!r}, conversions={len(self.conversions)})")
 
 class FieldMapper:
     """
@@ -14,6 +150,7 @@ class FieldMapper:
         self.source_table: Table = source_table
         self.target_table: Table = target_table
         self.mapping: Dict[str, str] = mapping if mapping is not None else {}
+        self._compiled: "OrderedDict[Tuple[Optional[Tuple[str, ...]], bool], CompiledMapping]" = OrderedDict()
 
     def add_mapping(self, source_field: str, target_field: str) -> None:
         """
@@ -29,6 +166,7 @@ class FieldMapper:
         if not self.target_table.get_column(target_field):
             raise ValueError(f"Target field '{target_field}' does not exist in table '{self.target_table.name}'.")
         self.mapping[source_field] = target_field
+        self._compiled.clear()
 
     def get_target_field(self, source_field: str) -> Optional[str]:
         """
@@ -54,6 +192,67 @@ class FieldMapper:
                 mapped_record[tgt_field] = value
         return mapped_record
 
+    def compile(self, source_columns: Optional[Sequence[str]] = None, convert_types: bool = True) -> CompiledMapping:
+        """
+        Compile the mapping into a fixed projection, cached until the mapping changes.
+        Only the COMPILED_CACHE_SIZE most recently used column orders are kept.
+
+        :param source_columns: Order of the columns in positional source rows (e.g. a cursor
+            description). When omitted, the compiled mapping reads dictionaries by field name.
+        :param convert_types: Add converters for the columns whose source and target types
+            belong to different families (e.g. varchar to int).
+        :return: The compiled mapping.
+        :raises ValueError: If a mapped source field is missing from source_columns.
+        """
+        cache_key = (tuple(source_columns) if source_columns is not None else None, convert_types)
+        compiled = self._compiled.get(cache_key)
+        if compiled is not None:
+            self._compiled.move_to_end(cache_key)
+            return compiled
+
+        source_fields = list(self.mapping.keys())
+        target_fields = list(self.mapping.values())
+
+        source_indices = None
+        if source_columns is not None:
+            positions = {name: i for i, name in enumerate(source_columns)}
+            missing = [field for field in source_fields if field not in positions]
+            if missing:
+                raise ValueError(f"Source fields {missing} are missing from the source columns.")
+            source_indices = [positions[field] for field in source_fields]
+
+        conversions = []
+        if convert_types:
+            for position, (source_field, target_field) in enumerate(zip(source_fields, target_fields)):
+                source_column = self.source_table.get_column(source_field)
+                target_column = self.target_table.get_column(target_field)
+                if source_column is None or target_column is None:
+                    continue
+                convert = converter_for(source_column, target_column)
+                if convert is not None:
+                    conversions.append((position, convert))
+
+        compiled = CompiledMapping(source_fields, target_fields, source_indices, conversions)
+        self._compiled[cache_key] = compiled
+        if len(self._compiled) > COMPILED_CACHE_SIZE:
+            self._compiled.popitem(last=False)
+        return compiled
+
+    def map_batch(self, batch: RowBatch, convert_types: bool = True) -> RowBatch:
+        """
+        Map a batch of source rows to a batch of target rows, tuple to tuple,
+        with the mapping compiled for the batch's column order.
+
+        :param batch: Source rows.
+        :param convert_types: Convert the values of columns whose type family differs.
+        :return: The target rows, with target_fields as columns.
+        """
+        compiled = self.compile(source_columns=batch.columns, convert_types=convert_types)
+        with instrumentation.stage("map", self.target_table.name) as span:
+            rows = compiled.apply(batch.rows)
+            span.count(rows)
+        return RowBatch(compiled.target_fields, rows)
+
     def __str__(self) -> str:
         return (f"Field mapping from table '{self.source_table.name}' to table '{self.target_table.name}': "
                 f"{self.mapping}")
@@ -1,6 +1,6 @@
 import mysql.connector
-import json
 from MySQLCRUD import MySQLCRUD
+from db.extractor import SchemaExtractor
 
 # Database connection settings
 DB_CONFIG = {
@@ -17,36 +17,15 @@ def get_schema():
     try:
         # Connect to the database
         conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
 
-        # Get list of tables
-        cursor.execute("SHOW TABLES;")
-        tables = [row[f"Tables_in_{DB_CONFIG['database']}"] for row in cursor.fetchall()]
-
-        schema = {}
-
-        for table in tables:
-            cursor.execute(f"DESCRIBE `{table}`;")
-            columns = cursor.fetchall()
-
-            schema[table] = []
-            for column in columns:
-                schema[table].append({
-                    "Field": column["Field"],
-                    "Type": column["Type"],
-                    "Null": column["Null"],
-                    "Key": column["Key"],
-                    "Default": column["Default"],
-                    "Extra": column["Extra"],
-                })
+        # Read tables, columns, indexes and foreign keys in a few information_schema queries
+        database = SchemaExtractor(conn).extract(DB_CONFIG["database"])
 
         # Write schema to JSON file
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(schema, f, indent=4)
+        database.save_to_json(OUTPUT_FILE)
 
         print(f"Schema exported to {OUTPUT_FILE}")
 
-        cursor.close()
         conn.close()
     except mysql.connector.Error as err:
         print(f"Error: {err}")
@@ -0,0 +1,86 @@
+import random
+import threading
+from typing import Optional
+from migration.bulk import error_code
+
+# Error codes after which a batch is rolled back and retried.
+RETRYABLE_ERRORS = {
+    1205,  # ER_LOCK_WAIT_TIMEOUT
+    1213,  # ER_LOCK_DEADLOCK
+}
+
+def is_retryable(error: Exception) -> bool:
+    """Checks whether an error is a deadlock or lock wait timeout, after which a batch can be retried."""
+    return error_code(error) in RETRYABLE_ERRORS
+
+def backoff_delay(attempt: int, base: float = 0.1, maximum: float = 5.0) -> float:
+    """
+    Seconds to wait before retrying a batch: exponential in the number of failed
+    attempts, with full jitter so that conflicting writers do not retry in step.
+
+    :param attempt: Number of attempts that failed so far, from 0.
+    :param base: Delay of the first retry, at most.
+    :param maximum: Upper bound of the delay.
+    """
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+class AdaptiveBatchSizer:
+    """
+    Adapts the number of rows written per transaction to the observed latency.
+
+    Batches much faster than the target latency grow the size by a quarter; slower ones
+    shrink it in proportion to how late they were; a deadlock or lock wait timeout halves
+    it, since smaller transactions hold fewer locks for less time. The size always stays
+    between minimum and maximum.
+    """
+
+    def __init__(self, initial: int = 1000, minimum: int = 100, maximum: Optional[int] = None,
+                 target_latency: float = 1.0):
+        """
+        :param initial: Initial number of rows per batch, e.g. the batch size of a MigrationPlanner plan.
+        :param minimum: Smallest batch size.
+        :param maximum: Largest batch size (defaults to 10 times the initial size).
+        :param target_latency: Wanted duration of a batch, in seconds.
+        """
+        maximum = maximum if maximum is not None else 10 * initial
+        if not 0 < minimum <= initial <= maximum:
+            raise ValueError("Batch sizes must satisfy 0 < minimum <= initial <= maximum.")
+        if target_latency <= 0:
+            raise ValueError("Target latency must be positive.")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self._size = initial
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """The current number of rows per batch."""
+        return self._size
+
+    def _resize(self, size: float):
+        self._size = int(max(self.minimum, min(self.maximum, size)))
+
+    def observe(self, rows: int, seconds: float):
+        """
+        Records the duration of a written batch and adjusts the size.
+
+        :param rows: Number of rows of the batch.
+        :param seconds: Time taken to write and commit it.
+        """
+        if rows <= 0:
+            return
+        with self._lock:
+            if seconds > 1.5 * self.target_latency:
+                self._resize(rows * self.target_latency / seconds)
+            elif seconds < 0.5 * self.target_latency and rows >= self._size:
+                self._resize(self._size * 1.25)
+
+    def back_off(self):
+        """Halves the size after a deadlock or lock wait timeout."""
+        with self._lock:
+            self._resize(self._size // 2)
+
+    def __repr__(self) -> str:
+        return (f"AdaptiveBatchSizer(size={self._size}, minimum={self.minimum}, maximum={self.maximum}, "
+                f"target_latency={self.target_latency})")
@@ -0,0 +1,157 @@
+import os
+import tempfile
+from datetime import date, datetime, time, timedelta
+from typing import Any, Iterable, List, Optional, Sequence
+
+# Error codes meaning that LOAD DATA LOCAL INFILE is not allowed by the server or the client.
+LOCAL_INFILE_DISABLED_ERRORS = {
+    1148,  # ER_NOT_ALLOWED_COMMAND
+    2068,  # CR_LOAD_DATA_LOCAL_INFILE_REJECTED
+    3948,  # ER_CLIENT_LOCAL_FILES_DISABLED
+    3950,  # ER_LOCAL_INFILE_WRONG_DIRECTORY
+}
+
+_BYTE_ESCAPES = {
+    ord("\\"): b"\\\\",
+    ord("\t"): b"\\t",
+    ord("\n"): b"\\n",
+    ord("\r"): b"\\r",
+    0: b"\\0",
+}
+
+def error_code(error: Exception) -> Optional[int]:
+    """Returns the MySQL error code of a PyMySQL or mysql.connector exception, if any."""
+    code = getattr(error, "errno", None)
+    if isinstance(code, int) and code > 0:
+        return code
+    if error.args and isinstance(error.args[0], int):
+        return error.args[0]
+    return None
+
+def is_local_infile_disabled(error: Exception) -> bool:
+    """Checks whether an error means that LOAD DATA LOCAL INFILE is not allowed."""
+    return error_code(error) in LOCAL_INFILE_DISABLED_ERRORS
+
+def _format_timedelta(value: timedelta) -> str:
+    """Formats a timedelta as a MySQL TIME literal, e.g. -26:03:04.000005."""
+    microseconds = abs(value.days * 86400_000_000 + value.seconds * 1_000_000 + value.microseconds)
+    seconds, microseconds = divmod(microseconds, 1_000_000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    sign = "-" if value < timedelta(0) else ""
+    return f"{sign}{hours:02d}:{minutes:02d}:{seconds:02d}.{microseconds:06d}"
+
+def escape_field(value: Any) -> bytes:
+    """
+    Encodes a value as a field of a LOAD DATA file using the default escaping:
+    NULL becomes \\N, and backslashes, tabs, newlines, carriage returns and NUL
+    characters are backslash-escaped.
+    """
+    if value is None:
+        return b"\\N"
+    if isinstance(value, bool):
+        return b"1" if value else b"0"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value)
+    elif isinstance(value, float):
+        raw = repr(value).encode("ascii")
+    elif isinstance(value, timedelta):
+        raw = _format_timedelta(value).encode("ascii")
+    elif isinstance(value, (datetime, date, time)):
+        raw = str(value).encode("ascii")
+    else:
+        raw = str(value).encode("utf-8")
+
+    if not any(byte in _BYTE_ESCAPES for byte in raw):
+        return raw
+    return b"".join(_BYTE_ESCAPES.get(byte, bytes((byte,))) for byte in raw)
+
+def write_tsv(rows: Iterable[Sequence[Any]], f) -> int:
+    """
+    Writes rows to a binary file in the tab-separated format read by LOAD DATA.
+
+    :param rows: Tuples of values, in column order.
+    :param f: A file object opened in binary mode.
+    :return: The number of rows written.
+    """
+    count = 0
+    for row in rows:
+        f.write(b"\t".join(escape_field(value) for value in row))
+        f.write(b"\n")
+        count += 1
+    return count
+
+class BulkLoader:
+    """
+    Loads rows into a MySQL table with LOAD DATA LOCAL INFILE.
+
+    Rows are streamed into a temporary tab-separated file, which the client then sends
+    to the server. The connection must allow local infile (e.g. PyMySQL's
+    local_infile=True) and so must the server (local_infile=ON).
+
+    With staging (the default) the rows are loaded into a temporary copy of the table
+    and merged with INSERT ... SELECT ... ON DUPLICATE KEY UPDATE, giving the same
+    result as the INSERT path. Without staging they are loaded straight into the
+    table, which is faster but skips rows whose key already exists; use it for
+    initial loads into empty tables.
+    """
+
+    def __init__(self, connection, staging: bool = True, temp_dir: Optional[str] = None):
+        """
+        :param connection: The MySQL connection object.
+        :param staging: Load through a temporary staging table to upsert existing rows.
+        :param temp_dir: Directory of the temporary data files (defaults to the system one).
+        """
+        self.conn = connection
+        self.staging = staging
+        self.temp_dir = temp_dir
+
+    @staticmethod
+    def _load_statement(table: str, columns: List[str]) -> str:
+        return (
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+            "CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+            "LINES TERMINATED BY '\\n' "
+            f"({', '.join(columns)})"
+        )
+
+    def load(self, table: str, columns: List[str], rows: Iterable[Sequence[Any]]) -> int:
+        """
+        Loads rows into a table. The caller commits or rolls back.
+
+        :param table: Target table name.
+        :param columns: Target column names, in the order of the row values.
+        :param rows: Tuples of values.
+        :return: The number of rows sent.
+        :raises Exception: Any database error, such as local infile being disabled.
+        """
+        fd, path = tempfile.mkstemp(prefix=f"{table}_", suffix=".tsv", dir=self.temp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                count = write_tsv(rows, f)
+            if not count:
+                return 0
+
+            with self.conn.cursor() as cursor:
+                if not self.staging:
+                    cursor.execute(self._load_statement(table, columns), (path,))
+                    return count
+
+                stage = f"_stage_{table}"
+                column_list = ", ".join(columns)
+                update_clause = ", ".join(f"{column} = VALUES({column})" for column in columns)
+                cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {stage} LIKE {table}")
+                try:
+                    cursor.execute(f"DELETE FROM {stage}")
+                    cursor.execute(self._load_statement(stage, columns), (path,))
+                    cursor.execute(
+                        f"INSERT INTO {table} ({column_list}) "
+                        f"SELECT {column_list} FROM {stage} "
+                        f"ON DUPLICATE KEY UPDATE {update_clause}"
+                    )
+                finally:
+                    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage}")
+            return count
+        finally:
+            os.remove(path)
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+class CheckpointStore:
+    """
+    Persists migration progress to a local JSON state file so that an interrupted
+    migration can resume where it stopped.
+
+    Each entry is keyed by a name (usually the target table) and records the last
+    committed primary key, the number of rows committed so far and whether the
+    migration of that entry has completed.
+    """
+
+    def __init__(self, path: str = "migration_state.json"):
+        """
+        :param path: Path of the JSON state file. It is created on the first save.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Reads the state file, if any."""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _flush(self):
+        """Writes the state file atomically, so a crash never leaves it half written."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, indent=4, default=str)
+        os.replace(tmp_path, self.path)
+
+    def get(self, name: str) -> Optional[Any]:
+        """
+        Returns the last committed primary key for an entry.
+
+        :param name: Entry name.
+        :return: The key (a tuple for composite keys), or None if nothing was committed yet.
+        """
+        with self._lock:
+            last_key = self._state.get(name, {}).get("last_key")
+        if isinstance(last_key, list):
+            return tuple(last_key)
+        return last_key
+
+    def get_rows(self, name: str) -> int:
+        """Returns the number of rows committed so far for an entry."""
+        with self._lock:
+            return self._state.get(name, {}).get("rows", 0)
+
+    def is_complete(self, name: str) -> bool:
+        """Returns True if the entry was marked as completed."""
+        with self._lock:
+            return self._state.get(name, {}).get("complete", False)
+
+    def save(self, name: str, last_key: Any, rows: int = 0):
+        """
+        Records a committed batch.
+
+        :param name: Entry name.
+        :param last_key: Primary key of the last committed row (a tuple for composite keys).
+        :param rows: Number of rows committed in the batch.
+        """
+        with self._lock:
+            entry = self._state.setdefault(name, {"last_key": None, "rows": 0, "complete": False})
+            entry["last_key"] = list(last_key) if isinstance(last_key, tuple) else last_key
+            entry["rows"] += rows
+            self._flush()
+
+    def complete(self, name: str):
+        """Marks an entry as completed."""
+        with self._lock:
+            entry = self._state.setdefault(name, {"last_key": None, "rows": 0, "complete": False})
+            entry["complete"] = True
+            self._flush()
+
+    def get_ranges(self, name: str) -> Optional[List[Tuple[Any, Any]]]:
+        """Returns the key ranges a table was split into, if they were saved."""
+        with self._lock:
+            ranges = self._state.get(name, {}).get("ranges")
+        if ranges is None:
+            return None
+        return [tuple(key_range) for key_range in ranges]
+
+    def save_ranges(self, name: str, ranges: List[Tuple[Any, Any]]):
+        """
+        Records the key ranges a table was split into, so that a resumed parallel
+        copy uses the same ranges and their individual checkpoints stay valid.
+        """
+        with self._lock:
+            entry = self._state.setdefault(name, {"last_key": None, "rows": 0, "complete": False})
+            entry["ranges"] = [list(key_range) for key_range in ranges]
+            self._flush()
+
+    def get_watermark(self, name: str) -> Optional[Any]:
+        """Returns the high-water mark of an incremental sync entry, if any."""
+        with self._lock:
+            return self._state.get(name, {}).get("watermark")
+
+    def save_watermark(self, name: str, watermark: Any, rows: int = 0):
+        """
+        Records the high-water mark reached by an incremental sync.
+
+        :param name: Entry name.
+        :param watermark: Largest watermark value committed so far.
+        :param rows: Number of rows committed since the last save.
+        """
+        with self._lock:
+            entry = self._state.setdefault(name, {"last_key": None, "rows": 0, "complete": False})
+            entry["watermark"] = watermark
+            entry["rows"] += rows
+            self._flush()
+
+    def reset(self, name: str):
+        """Forgets the progress of an entry so that it is migrated again from the start."""
+        with self._lock:
+            if self._state.pop(name, None) is not None:
+                self._flush()
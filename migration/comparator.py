@@ -1,5 +1,46 @@
-from typing import Dict, List, Optional, Any
-from db.db_components import Schema
+import re
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+from db.db_components import Column, Index, Schema, Table, quote_identifier
+
+# ALTER TABLE algorithms, from the cheapest to the most expensive
+INSTANT = "INSTANT"
+INPLACE = "INPLACE"
+COPY = "COPY"
+_ALGORITHMS = (INSTANT, INPLACE, COPY)
+
+# Longest VARCHAR (in characters, assuming utf8mb4) whose length fits in one byte
+_VARCHAR_ONE_BYTE_LENGTH = 63
+
+def _varchar_length(col_type: str) -> Optional[int]:
+    match = re.fullmatch(r"\s*varchar\((\d+)\)\s*", col_type.lower())
+    return int(match.group(1)) if match else None
+
+def _members(col_type: str) -> Optional[Tuple[str, List[str]]]:
+    match = re.fullmatch(r"\s*(enum|set)\((.*)\)\s*", col_type, re.IGNORECASE | re.DOTALL)
+    if match is None:
+        return None
+    return match.group(1).lower(), re.findall(r"'((?:[^']|'')*)'", match.group(2))
+
+_NUMERIC_TYPES = {"tinyint", "smallint", "mediumint", "int", "integer", "bigint", "bool", "boolean",
+                  "decimal", "numeric", "dec", "float", "double", "real", "bit", "year"}
+_STRING_TYPES = {"char", "varchar", "binary", "varbinary", "tinytext", "text", "mediumtext", "longtext",
+                 "tinyblob", "blob", "mediumblob", "longblob", "set"}
+
+def _implicit_default(column: Column) -> Optional[str]:
+    """
+    Literal of the implicit default of a column (the value MySQL stores when a row omits
+    a NOT NULL column without a default, outside strict mode), or None when no such
+    value is accepted in strict mode: temporal, JSON and spatial types.
+    """
+    base = re.match(r"\s*(\w+)", column.col_type).group(1).lower()
+    if base in _NUMERIC_TYPES:
+        return "0"
+    if base in _STRING_TYPES:
+        return "''"
+    members = _members(column.col_type)
+    if members and members[0] == "enum" and members[1]:
+        return f"'{members[1][0]}'"
+    return None
 
 class SchemaComparator:
     """Compares two database schemas and generates transformation operations."""
@@ -8,6 +49,18 @@ class SchemaComparator:
         self.source_schema = source_schema
         self.target_schema = target_schema
 
+    def changed_tables(self) -> List[str]:
+        """
+        Returns the tables present in both schemas whose structure differs, found by
+        comparing table fingerprints without looking at their columns.
+        """
+        return [
+            table_name
+            for table_name, source_table in self.source_schema.tables.items()
+            if table_name in self.target_schema.tables
+            and source_table.fingerprint != self.target_schema.tables[table_name].fingerprint
+        ]
+
     def compare_schemas(self) -> Dict[str, List[str]]:
         """Compares schemas and returns necessary operations."""
         operations = {
@@ -28,47 +81,285 @@ class SchemaComparator:
             if table_name not in self.source_schema.tables:
                 operations["drop_tables"].append(table_name)
 
-        # Compare existing tables
-        for table_name, source_table in self.source_schema.tables.items():
-            if table_name in self.target_schema.tables:
-                target_table = self.target_schema.tables[table_name]
-
-                # Compare columns
-                for column_name, source_column in source_table.columns.items():
-                    if column_name not in target_table.columns:
-                        operations["add_columns"].append(
-                            f"ALTER TABLE {table_name} ADD COLUMN {column_name} {source_column.col_type};"
-                        )
-                    elif target_table.columns[column_name].col_type != source_column.col_type:
-                        operations["modify_columns"].append(
-                            f"ALTER TABLE {table_name} MODIFY COLUMN {column_name} {source_column.col_type};"
-                        )
-
-                # Find extra columns in target
-                for column_name in target_table.columns.keys():
-                    if column_name not in source_table.columns:
-                        operations["drop_columns"].append(
-                            f"ALTER TABLE {table_name} DROP COLUMN {column_name};"
-                        )
+        # Compare existing tables, skipping those with identical fingerprints
+        for table_name in self.changed_tables():
+            source_table = self.source_schema.tables[table_name]
+            target_table = self.target_schema.tables[table_name]
+
+            # Compare columns
+            for column_name, source_column in source_table.columns.items():
+                if column_name not in target_table.columns:
+                    operations["add_columns"].append(
+                        f"ALTER TABLE {table_name} ADD COLUMN {column_name} {source_column.col_type};"
+                    )
+                elif target_table.columns[column_name].col_type != source_column.col_type:
+                    operations["modify_columns"].append(
+                        f"ALTER TABLE {table_name} MODIFY COLUMN {column_name} {source_column.col_type};"
+                    )
+
+            # Find extra columns in target
+            for column_name in target_table.columns.keys():
+                if column_name not in source_table.columns:
+                    operations["drop_columns"].append(
+                        f"ALTER TABLE {table_name} DROP COLUMN {column_name};"
+                    )
 
         return operations
 
-    def generate_sql_migration(self) -> List[str]:
-        """Generates SQL statements to transform the target schema into the source schema."""
+    @staticmethod
+    def _modify_algorithm(old: Column, new: Column) -> str:
+        """Cheapest algorithm MySQL 8.0 can apply a column modification with."""
+        if old.col_type.lower() == new.col_type.lower():
+            if old.nullable == new.nullable and old.extra == new.extra:
+                return INSTANT  # Only the default changes
+            if old.extra == new.extra:
+                return INPLACE  # NULL <-> NOT NULL rebuilds the table in place
+            return COPY
+        if old.nullable != new.nullable or old.extra != new.extra:
+            return COPY
+
+        old_members, new_members = _members(old.col_type), _members(new.col_type)
+        if old_members and new_members and old_members[0] == new_members[0]:
+            # Members appended at the end only change the metadata
+            if new_members[1][:len(old_members[1])] == old_members[1]:
+                return INSTANT
+            return COPY
+
+        old_length, new_length = _varchar_length(old.col_type), _varchar_length(new.col_type)
+        if old_length is not None and new_length is not None and old_length <= new_length:
+            # Extended in place, unless the length prefix grows from one byte to two
+            if (old_length <= _VARCHAR_ONE_BYTE_LENGTH) == (new_length <= _VARCHAR_ONE_BYTE_LENGTH):
+                return INPLACE
+        return COPY
+
+    @staticmethod
+    def _add_index_algorithm(index: Index) -> str:
+        if index.index_type in ("FULLTEXT", "SPATIAL"):
+            return COPY  # Built in place, but never with LOCK=NONE
+        return INPLACE
+
+    def alter_clauses(self, table_name: str) -> List[Tuple[str, str]]:
+        """
+        Lists the changes turning a target table into the source table of the same name.
+
+        Columns are compared on their whole definition (type, nullability, default and
+        extra attributes), indexes and foreign keys on theirs; added columns keep their
+        position in the source table.
+
+        :param table_name: Name of a table present in both schemas.
+        :return: A list of (clause, algorithm) pairs, where the clause is an ALTER TABLE
+            clause and the algorithm the cheapest one MySQL 8.0 can apply it with.
+        """
+        source_table = self.source_schema.tables[table_name]
+        target_table = self.target_schema.tables[table_name]
+        indexed = {column for index in target_table.indexes.values() for column in index.columns}
+        indexed.update(column for fk in target_table.foreign_keys for column in fk.columns)
+
+        drop_indexes, add_indexes = [], []
+        for name, index in target_table.indexes.items():
+            new_index = source_table.indexes.get(name)
+            if new_index is None or new_index.definition() != index.definition():
+                if index.is_primary:
+                    drop_indexes.append(("DROP PRIMARY KEY", COPY if new_index is None else INPLACE))
+                else:
+                    drop_indexes.append((f"DROP INDEX {quote_identifier(name)}", INPLACE))
+        for name, index in source_table.indexes.items():
+            old_index = target_table.indexes.get(name)
+            if old_index is None or old_index.definition() != index.definition():
+                add_indexes.append((f"ADD {index.definition()}", self._add_index_algorithm(index)))
+
+        new_fks = {fk.name: fk for fk in source_table.foreign_keys}
+        old_fks = {fk.name: fk for fk in target_table.foreign_keys}
+        clauses = [(f"DROP FOREIGN KEY {quote_identifier(name)}", INPLACE)
+                   for name, fk in old_fks.items()
+                   if name not in new_fks or new_fks[name].definition() != fk.definition()]
+        clauses += drop_indexes
+        for name in target_table.columns:
+            if name not in source_table.columns:
+                clauses.append((f"DROP COLUMN {quote_identifier(name)}", INPLACE if name in indexed else INSTANT))
+
+        previous = None
+        for name, column in source_table.columns.items():
+            old_column = target_table.columns.get(name)
+            if old_column is None:
+                position = f"AFTER {quote_identifier(previous)}" if previous is not None else "FIRST"
+                if "auto_increment" in column.extra.lower() or "STORED GENERATED" in column.extra.upper():
+                    algorithm = COPY
+                else:
+                    algorithm = INSTANT
+                clauses.append((f"ADD COLUMN {column.definition()} {position}", algorithm))
+            elif old_column.definition() != column.definition():
+                clauses.append((f"MODIFY COLUMN {column.definition()}", self._modify_algorithm(old_column, column)))
+            previous = name
+
+        # Checking the existing rows of a new foreign key needs a table copy
+        clauses += add_indexes
+        clauses += [(f"ADD {fk.definition()}", COPY)
+                    for name, fk in new_fks.items()
+                    if name not in old_fks or old_fks[name].definition() != fk.definition()]
+        return clauses
+
+    @staticmethod
+    def algorithm(clauses: Iterable[Tuple[str, str]]) -> str:
+        """The algorithm of an ALTER TABLE made of several clauses: that of its most expensive clause."""
+        return max((algorithm for _, algorithm in clauses), key=_ALGORITHMS.index, default=INSTANT)
+
+    def alter_table(self, table_name: str) -> Optional[str]:
+        """
+        Builds a single ALTER TABLE applying every change of a table, so that the table is
+        rebuilt at most once, annotated with the cheapest algorithm all its clauses allow:
+        ALGORITHM=INSTANT (metadata only), ALGORITHM=INPLACE, LOCK=NONE (rebuilt without
+        blocking writes) or ALGORITHM=COPY. The server refuses a statement it cannot apply
+        with the requested algorithm instead of silently falling back to a table copy.
+
+        :param table_name: Name of a table present in both schemas.
+        :return: The statement, or None if the table is unchanged.
+        """
+        clauses = self.alter_clauses(table_name)
+        if not clauses:
+            return None
+        algorithm = self.algorithm(clauses)
+        options = f"ALGORITHM={algorithm}" + (", LOCK=NONE" if algorithm == INPLACE else "")
+        body = ",\n  ".join(clause for clause, _ in clauses)
+        return f"ALTER TABLE {quote_identifier(table_name)}\n  {body},\n  {options};"
+
+    def _referenced(self, table_name: str) -> bool:
+        """True if foreign keys of other target tables reference the table."""
+        return any(fk.ref_table == table_name
+                   for table in self.target_schema.tables.values() if table.name != table_name
+                   for fk in table.foreign_keys)
+
+    @staticmethod
+    def _copy_statements(target_table: Table, new_name: str, columns: List[str], chunk_size: int,
+                         defaults: Optional[Dict[str, str]] = None) -> List[str]:
+        """
+        INSERT ... SELECT statements copying a table, in primary key ranges of chunk_size when possible.
+        The new columns of defaults are filled with their literal.
+        """
+        defaults = defaults or {}
+        column_list = ", ".join(map(quote_identifier, list(columns) + list(defaults)))
+        select_list = ", ".join(list(map(quote_identifier, columns)) + list(defaults.values()))
+        copy = (f"INSERT INTO {quote_identifier(new_name)} ({column_list}) "
+                f"SELECT {select_list} FROM {quote_identifier(target_table.name)}")
+        keys = target_table.primary_key
+        upper = target_table.stats.get("auto_increment")
+        if len(keys) != 1 or keys[0] not in columns or not upper:
+            return [copy + ";"]
+
+        key = quote_identifier(keys[0])
+        statements = []
+        bounds = list(range(chunk_size, int(upper), chunk_size))
+        after = None
+        for until in bounds:
+            condition = f"{key} <= {until}" if after is None else f"{key} > {after} AND {key} <= {until}"
+            statements.append(f"{copy} WHERE {condition};")
+            after = until
+        # Open-ended last range, for the rows inserted since the stats were read
+        statements.append(copy + (f" WHERE {key} > {after};" if after is not None else ";"))
+        return statements
+
+    def shadow_table(self, table_name: str, chunk_size: int = 10000) -> List[str]:
+        """
+        Builds the statements applying the changes of a table through a shadow table:
+        the new table is created empty and altered (which is immediate), filled with
+        INSERT ... SELECT in primary key ranges of chunk_size rows (when the target table
+        has an integer primary key and a known AUTO_INCREMENT), and swapped with the old
+        one by an atomic RENAME TABLE, after which the old table is dropped.
+
+        Each chunk is a short transaction, so the copy does not hold long locks, but rows
+        written to the old table after their chunk was copied are not carried over: writes
+        must be stopped during the copy, or resynchronized (e.g. with IncrementalSync)
+        before the rename.
+
+        Added NOT NULL columns without a default are filled with their implicit default
+        (0, '' or the first ENUM member), which strict mode does not supply to INSERT ...
+        SELECT; when a column has none (temporal, JSON and spatial types), the table is
+        altered in place instead.
+
+        :param table_name: Name of a table present in both schemas.
+        :param chunk_size: Number of primary key values per copy statement.
+        :return: The statements, or an empty list if the table is unchanged.
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be a positive integer.")
+        clauses = self.alter_clauses(table_name)
+        if not clauses:
+            return []
+
+        source_table = self.source_schema.tables[table_name]
+        target_table = self.target_schema.tables[table_name]
+        new_name, old_name = f"_{table_name}_new", f"_{table_name}_old"
+        columns = [name for name, column in source_table.columns.items()
+                   if name in target_table.columns and not column.generated]
+        defaults = {}
+        for name, column in source_table.columns.items():
+            if (name in target_table.columns or column.nullable or column.default is not None
+                    or column.generated or "auto_increment" in column.extra.lower()):
+                continue
+            default = _implicit_default(column)
+            if default is None:
+                print(f"Column '{name}' of table '{table_name}' has no default a copy can fill it with; "
+                      f"altering the table in place instead of through a shadow table.")
+                return [self.alter_table(table_name)]
+            defaults[name] = default
+        # CREATE TABLE ... LIKE does not copy foreign keys: they are added once the old table is gone
+        clauses = [clause for clause, _ in clauses if not clause.startswith(("DROP FOREIGN KEY", "ADD CONSTRAINT"))]
+
+        statements = [f"CREATE TABLE {quote_identifier(new_name)} LIKE {quote_identifier(table_name)};"]
+        if clauses:
+            statements.append(f"ALTER TABLE {quote_identifier(new_name)}\n  " + ",\n  ".join(clauses) + ";")
+        statements += self._copy_statements(target_table, new_name, columns, chunk_size, defaults)
+        statements.append(f"RENAME TABLE {quote_identifier(table_name)} TO {quote_identifier(old_name)}, "
+                          f"{quote_identifier(new_name)} TO {quote_identifier(table_name)};")
+        statements.append(f"DROP TABLE {quote_identifier(old_name)};")
+        if source_table.foreign_keys:
+            # The copied rows satisfied the constraints of the old table; do not check them again
+            statements.append("SET FOREIGN_KEY_CHECKS = 0;")
+            statements.append(f"ALTER TABLE {quote_identifier(table_name)}\n  "
+                              + ",\n  ".join(f"ADD {fk.definition()}" for fk in source_table.foreign_keys)
+                              + ",\n  ALGORITHM=INPLACE, LOCK=NONE;")
+            statements.append("SET FOREIGN_KEY_CHECKS = 1;")
+        return statements
+
+    def generate_sql_migration(self, shadow_tables: Optional[List[str]] = None,
+                               shadow_min_rows: Optional[int] = None, chunk_size: int = 10000) -> List[str]:
+        """
+        Generates SQL statements to transform the target schema into the source schema.
+
+        Every changed table gets a single ALTER TABLE (see alter_table), so applying the
+        migration rebuilds each table at most once. Tables chosen for the shadow-table
+        mode are rebuilt through a copy instead (see shadow_table), unless their changes
+        are instant anyway, or other tables reference them: RENAME TABLE would move those
+        foreign keys to the old table.
+
+        :param shadow_tables: Names of the tables to change through a shadow table.
+        :param shadow_min_rows: Also use a shadow table for the tables with at least this
+            many rows, according to the stats of the target schema.
+        :param chunk_size: Number of primary key values copied per statement in shadow-table mode.
+        :return: The statements, in order.
+        """
         operations = self.compare_schemas()
         sql_statements = []
 
         for table in operations["add_tables"]:
-            columns = ", ".join(
-                f"{col.name} {col.col_type}" for col in self.source_schema.tables[table].columns.values()
-            )
-            sql_statements.append(f"CREATE TABLE {table} ({columns});")
+            sql_statements.append(self.source_schema.tables[table].create_sql() + ";")
 
         for table in operations["drop_tables"]:
-            sql_statements.append(f"DROP TABLE {table};")
+            sql_statements.append(f"DROP TABLE {quote_identifier(table)};")
 
-        sql_statements.extend(operations["add_columns"])
-        sql_statements.extend(operations["drop_columns"])
-        sql_statements.extend(operations["modify_columns"])
+        shadow = set(shadow_tables or [])
+        for table_name in self.changed_tables():
+            clauses = self.alter_clauses(table_name)
+            if not clauses:
+                continue
+            rows = self.target_schema.tables[table_name].stats.get("rows") or 0
+            use_shadow = table_name in shadow or (shadow_min_rows is not None and rows >= shadow_min_rows)
+            if use_shadow and self.algorithm(clauses) != INSTANT:
+                if not self._referenced(table_name):
+                    sql_statements.extend(self.shadow_table(table_name, chunk_size))
+                    continue
+                print(f"Table '{table_name}' is referenced by foreign keys; altering it in place instead of "
+                      f"through a shadow table.")
+            sql_statements.append(self.alter_table(table_name))
 
-        return sql_statements
\ No newline at end of file
+        return sql_statements
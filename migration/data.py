@@ -1,49 +1,421 @@
-from typing import List, Dict, Any
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
+from db.batch import RowBatch
+from db.instrumentation import instrumentation
 from db.mappers import FieldMapper
+from migration.batching import AdaptiveBatchSizer, backoff_delay, is_retryable
+from migration.bulk import BulkLoader, is_local_infile_disabled
+from migration.checkpoint import CheckpointStore
+
+# Write strategies of DataMigrator
+INSERT = "insert"
+LOAD_DATA = "load_data"
 
 class DataMigrator:
     """Handles migrating data from a source table to a target table using field mapping."""
-    
-    def __init__(self, connection):
+
+    def __init__(self, connection, batch_size: int = 1000, checkpoint: Optional[CheckpointStore] = None,
+                 strategies: Optional[Dict[str, str]] = None, default_strategy: str = INSERT,
+                 loader: Optional[BulkLoader] = None, sizer: Optional[AdaptiveBatchSizer] = None,
+                 retries: int = 3):
         """
         :param connection: The MySQL connection object.
+        :param batch_size: Number of rows written and committed per transaction.
+        :param checkpoint: Optional store used to record progress and resume interrupted migrations.
+        :param strategies: Write strategy per target table, either "insert" (batched
+            INSERT ... ON DUPLICATE KEY UPDATE) or "load_data" (LOAD DATA LOCAL INFILE).
+        :param default_strategy: Write strategy of the tables missing from strategies.
+        :param loader: BulkLoader used by the "load_data" strategy (defaults to a staging loader
+            on the same connection, which needs local_infile enabled).
+        :param sizer: Optional AdaptiveBatchSizer: rows are then written in transactions of its
+            current size, adapted to the observed latency. migrate_data and migrate_batches
+            regroup the source rows to that size, so it can grow beyond the reader's chunks.
+        :param retries: Number of times a transaction failing on a deadlock or lock wait
+            timeout is rolled back and retried, after a randomized exponential delay.
         """
+        if batch_size <= 0:
+            raise ValueError("Batch size must be a positive integer.")
+        if retries < 0:
+            raise ValueError("The number of retries cannot be negative.")
+        for strategy in list((strategies or {}).values()) + [default_strategy]:
+            if strategy not in (INSERT, LOAD_DATA):
+                raise ValueError(f"Unknown write strategy '{strategy}'.")
         self.conn = connection
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.strategies = strategies or {}
+        self.default_strategy = default_strategy
+        self.loader = loader or BulkLoader(connection)
+        self.sizer = sizer
+        self.retries = retries
+        self._local_infile_disabled = False
 
-    def migrate_data(self, mapper: FieldMapper, data: List[Dict[str, Any]]):
-        """
-        Migrates data from the source table to the target table.
-        If a row with the same ID exists, it updates the row instead.
-        
-        :param mapper: A FieldMapper object defining the source-target mapping.
-        :param data: A list of dictionaries representing the source table's rows.
-        """
-        if not data:
-            print("No data to migrate.")
-            return
-
-        target_fields = list(mapper.field_map.values())
-        source_fields = list(mapper.field_map.keys())
+    def strategy_for(self, table: str) -> str:
+        """Returns the write strategy used for a target table."""
+        if self._local_infile_disabled:
+            return INSERT
+        return self.strategies.get(table, self.default_strategy)
 
+    def _upsert_query(self, table: str, target_fields: Sequence[str]) -> str:
+        """Builds the INSERT ... ON DUPLICATE KEY UPDATE statement for a set of target fields."""
         placeholders = ", ".join(["%s"] * len(target_fields))
         update_clause = ", ".join([f"{field} = VALUES({field})" for field in target_fields])
 
-        query = f"""
-        INSERT INTO {mapper.target_table} ({", ".join(target_fields)})
+        return f"""
+        INSERT INTO {table} ({", ".join(target_fields)})
         VALUES ({placeholders})
         ON DUPLICATE KEY UPDATE {update_clause};
         """
 
-        values = [
-            tuple(row[source_field] for source_field in source_fields)
-            for row in data
-        ]
+    def _progress(self, mapper: FieldMapper, checkpoint_name: str):
+        """Tracks the progress of a target table, expecting the row estimate of the source table."""
+        done = self.checkpoint.get_rows(checkpoint_name) if self.checkpoint is not None else 0
+        return instrumentation.track(mapper.target_table.name, mapper.source_table.stats.get("rows"), done)
+
+    def write_batch(self, mapper: FieldMapper, rows: List[Dict[str, Any]]):
+        """
+        Writes one batch of source rows to the target table in its own transaction.
+
+        :param mapper: A FieldMapper object defining the source-target mapping.
+        :param rows: The source rows of the batch.
+        :raises Exception: Any database error, after the transaction was rolled back.
+        """
+        if not mapper.mapping:
+            raise ValueError(f"No field mapping defined for table '{mapper.target_table.name}'.")
+
+        compiled = mapper.compile()
+        with instrumentation.stage("map", mapper.target_table.name) as span:
+            values = compiled.apply(rows)
+            span.count(values)
+        self.write_mapped(mapper.target_table.name, compiled.target_fields, values)
+
+    def write_mapped(self, table: str, target_fields: Sequence[str], values: List[tuple]):
+        """
+        Writes one batch of already mapped rows to a target table in its own transaction,
+        or in transactions of the sizer's current size if the migrator has one.
+
+        :param table: Target table name.
+        :param target_fields: Target column names, in the order of the row values.
+        :param values: Tuples of values, as produced by a CompiledMapping.
+        :raises Exception: Any database error, after the transaction was rolled back.
+        """
+        with instrumentation.stage("write", table) as span:
+            span.count(values)
+            if self.sizer is None:
+                self._write_with_retries(table, target_fields, values)
+                return
+
+            start = 0
+            while start < len(values):
+                chunk = values[start:start + self.sizer.size]
+                started = time.perf_counter()
+                self._write_with_retries(table, target_fields, chunk)
+                self.sizer.observe(len(chunk), time.perf_counter() - started)
+                start += len(chunk)
+
+    def _write_with_retries(self, table: str, target_fields: Sequence[str], values: List[tuple]):
+        """Writes rows in one transaction, retrying it on deadlocks and lock wait timeouts."""
+        for attempt in range(self.retries + 1):
+            try:
+                self._write(table, target_fields, values)
+                return
+            except Exception as e:
+                if attempt == self.retries or not is_retryable(e):
+                    raise
+                instrumentation.retry("write", table, e)
+                if self.sizer is not None:
+                    self.sizer.back_off()
+                time.sleep(backoff_delay(attempt))
 
+    def _write(self, table: str, target_fields: Sequence[str], values: List[tuple]):
+        """Writes rows in one transaction, with the strategy of the table."""
+        if self.strategy_for(table) == LOAD_DATA:
+            try:
+                self.loader.load(table, list(target_fields), values)
+                self.conn.commit()
+                return
+            except Exception as e:
+                self.conn.rollback()
+                if not is_local_infile_disabled(e):
+                    raise
+                print(f"LOAD DATA LOCAL INFILE is not allowed ({e}); falling back to INSERT.")
+                instrumentation.retry("write", table, e)
+                self._local_infile_disabled = True
+
+        query = self._upsert_query(table, target_fields)
         try:
             with self.conn.cursor() as cursor:
                 cursor.executemany(query, values)
             self.conn.commit()
-            print(f"Successfully migrated {len(values)} records.")
-        except Exception as e:
+        except Exception:
             self.conn.rollback()
-            print(f"Error migrating data: {e}")
\ No newline at end of file
+            raise
+
+    def migrate_data(self, mapper: FieldMapper, data: Iterable[Dict[str, Any]], checkpoint_name: Optional[str] = None) -> int:
+        """
+        Migrates data from the source table to the target table.
+        If a row with the same ID exists, it updates the row instead.
+
+        Rows are written in batches of batch_size, each committed in its own transaction.
+        When a checkpoint store is configured, the primary key of the last row of every
+        committed batch is saved. Like migrate_batches, this method does not skip rows
+        already committed: when resuming, the data must start after the checkpointed key,
+        e.g. chain.from_iterable(reader.iter_chunks(table, after=checkpoint.get(name))),
+        so that the server compares the keys with its own types and collation. Rows that
+        come again are upserted again.
+
+        :param mapper: A FieldMapper object defining the source-target mapping.
+        :param data: An iterable of dictionaries representing the source table's rows.
+        :param checkpoint_name: Name of the checkpoint entry (defaults to the target table name).
+        :return: The number of rows migrated by this call.
+        :raises Exception: The error of the failing batch. Batches committed before it are kept.
+        """
+        name = checkpoint_name or mapper.target_table.name
+        key_fields = mapper.source_table.primary_key
+        rows = iter(data)
+
+        if self.checkpoint is not None:
+            if self.checkpoint.is_complete(name):
+                print(f"Migration of '{name}' already completed; reset its checkpoint to run it again.")
+                return 0
+            if not key_fields:
+                raise ValueError(f"Table '{mapper.source_table.name}' has no primary key to checkpoint on.")
+
+        migrated = 0
+        table = mapper.target_table.name
+        with self._progress(mapper, name):
+            while True:
+                batch = list(islice(rows, self.sizer.size if self.sizer is not None else self.batch_size))
+                if not batch:
+                    break
+
+                try:
+                    self.write_batch(mapper, batch)
+                except Exception as e:
+                    print(f"Error migrating data after {migrated} records: {e}")
+                    raise
+
+                migrated += len(batch)
+                instrumentation.advance(table, len(batch))
+                if self.checkpoint is not None:
+                    last_row = batch[-1]
+                    last_key = tuple(last_row[field] for field in key_fields)
+                    self.checkpoint.save(name, last_key if len(last_key) > 1 else last_key[0], len(batch))
+
+        if self.checkpoint is not None:
+            self.checkpoint.complete(name)
+
+        if migrated:
+            print(f"Successfully migrated {migrated} records.")
+        else:
+            print("No data to migrate.")
+        return migrated
+
+    def migrate_batches(self, mapper: FieldMapper, batches: Iterable[RowBatch], checkpoint_name: Optional[str] = None) -> int:
+        """
+        Migrates batches of tuple rows from the source table to the target table, mapping
+        them tuple to tuple and writing each batch in its own transaction.
+
+        Unlike migrate_data, rows already committed are not skipped here: when resuming
+        from a checkpoint, the batches must start after the checkpointed primary key, as
+        produced by MySQLCRUD.iter_batches(after=...).
+
+        :param mapper: A FieldMapper object defining the source-target mapping.
+        :param batches: An iterable of RowBatch holding the source table's rows, in primary key order.
+        :param checkpoint_name: Name of the checkpoint entry (defaults to the target table name).
+        :return: The number of rows migrated by this call.
+        :raises Exception: The error of the failing batch. Batches committed before it are kept.
+        """
+        if not mapper.mapping:
+            raise ValueError(f"No field mapping defined for table '{mapper.target_table.name}'.")
+
+        name = checkpoint_name or mapper.target_table.name
+        key_fields = mapper.source_table.primary_key
+        if self.checkpoint is not None:
+            if self.checkpoint.is_complete(name):
+                print(f"Migration of '{name}' already completed; reset its checkpoint to run it again.")
+                return 0
+            if not key_fields:
+                raise ValueError(f"Table '{mapper.source_table.name}' has no primary key to checkpoint on.")
+
+        if self.sizer is not None:
+            batches = self._resized(batches)
+
+        migrated = 0
+        table = mapper.target_table.name
+        with self._progress(mapper, name):
+            for batch in batches:
+                if not batch:
+                    continue
+                try:
+                    mapped = mapper.map_batch(batch)
+                    self.write_mapped(table, mapped.columns, mapped.rows)
+                except Exception as e:
+                    print(f"Error migrating data after {migrated} records: {e}")
+                    raise
+
+                migrated += len(batch)
+                instrumentation.advance(table, len(batch))
+                if self.checkpoint is not None:
+                    last_key = batch.key(batch.rows[-1], key_fields)
+                    self.checkpoint.save(name, last_key if len(last_key) > 1 else last_key[0], len(batch))
+
+        if self.checkpoint is not None:
+            self.checkpoint.complete(name)
+
+        if migrated:
+            print(f"Successfully migrated {migrated} records.")
+        else:
+            print("No data to migrate.")
+        return migrated
+
+    def _resized(self, batches: Iterable[RowBatch]) -> Iterator[RowBatch]:
+        """
+        Regroups batches into batches of the sizer's current size, read again before each
+        one. Rows of batches with different columns are never grouped together.
+        """
+        columns, rows = None, []
+        for batch in batches:
+            if rows and batch.columns != columns:
+                yield RowBatch(columns, rows)
+                rows = []
+            columns = batch.columns
+            rows.extend(batch.rows)
+            while len(rows) >= self.sizer.size:
+                size = self.sizer.size
+                yield RowBatch(columns, rows[:size])
+                rows = rows[size:]
+        if rows:
+            yield RowBatch(columns, rows)
+
+    def migrate_table(self, mapper: FieldMapper, reader, checkpoint_name: Optional[str] = None) -> int:
+        """
+        Streams the source table through a reader and migrates it batch by batch,
+        resuming after the last checkpointed primary key if there is one.
+
+        :param mapper: A FieldMapper object defining the source-target mapping.
+        :param reader: A MySQLCRUD instance connected to the source database, with its schema loaded.
+        :param checkpoint_name: Name of the checkpoint entry (defaults to the target table name).
+        :return: The number of rows migrated by this call.
+        """
+        name = checkpoint_name or mapper.target_table.name
+        after = self.checkpoint.get(name) if self.checkpoint is not None else None
+        batches = reader.iter_batches(mapper.source_table.name, chunk_size=self.batch_size, after=after)
+        return self.migrate_batches(mapper, batches, checkpoint_name=name)
+
+    @staticmethod
+    def split_ranges(min_key: int, max_key: int, parts: int) -> List[Tuple[Optional[int], int]]:
+        """
+        Splits an integer key interval into contiguous ranges of roughly equal width.
+
+        :param min_key: Smallest key of the table.
+        :param max_key: Largest key of the table.
+        :param parts: Maximum number of ranges.
+        :return: A list of (after, until) pairs selecting after < key <= until,
+            where after is None for the first range.
+        """
+        if parts <= 0:
+            raise ValueError("The number of ranges must be a positive integer.")
+
+        span = max_key - min_key + 1
+        parts = min(parts, span)
+        ranges = []
+        after = None
+        for i in range(1, parts + 1):
+            until = min_key - 1 + (span * i) // parts
+            ranges.append((after, until))
+            after = until
+        return ranges
+
+    def migrate_table_parallel(self, mapper: FieldMapper, reader_factory: Callable[[], Any],
+                               connection_factory: Callable[[], Any], workers: int = 4,
+                               parts: Optional[int] = None, retries: int = 1) -> int:
+        """
+        Copies a table with parallel workers, each one copying a contiguous range of
+        the (single-column, integer) primary key over its own source and target connections.
+
+        Every range has its own checkpoint entry, named "<table>(<after>:<until>]", and
+        the ranges themselves are saved under the table name, so a failed range is
+        retried or resumed on the next run without redoing the ranges that completed.
+
+        :param mapper: A FieldMapper object defining the source-target mapping.
+        :param reader_factory: Callable returning a new MySQLCRUD reader on the source, with its schema loaded,
+            typically over a connection checked out of a ConnectionPool.
+        :param connection_factory: Callable returning a new MySQL connection to the target, typically
+            ConnectionPool.acquire so that closing it returns it to the pool.
+        :param workers: Number of ranges copied concurrently.
+        :param parts: Number of ranges to split the table into (defaults to workers).
+        :param retries: Number of times a failed range is retried within this call.
+        :return: The number of rows migrated by this call.
+        :raises RuntimeError: If some ranges still failed after their retries.
+        """
+        if workers <= 0:
+            raise ValueError("The number of workers must be a positive integer.")
+
+        table = mapper.source_table.name
+        name = mapper.target_table.name
+        ranges = self.checkpoint.get_ranges(name) if self.checkpoint is not None else None
+        if ranges is None:
+            reader = reader_factory()
+            try:
+                min_key, max_key = reader.key_bounds(table)
+            finally:
+                reader.close()
+            if min_key is None:
+                print("No data to migrate.")
+                return 0
+            ranges = self.split_ranges(min_key, max_key, parts or workers)
+            if self.checkpoint is not None:
+                self.checkpoint.save_ranges(name, ranges)
+
+        def range_name(key_range):
+            return f"{name}({key_range[0]}:{key_range[1]}]"
+
+        def copy_range(key_range):
+            after, until = key_range
+            reader = reader_factory()
+            connection = connection_factory()
+            try:
+                loader = BulkLoader(connection, staging=self.loader.staging, temp_dir=self.loader.temp_dir)
+                migrator = DataMigrator(connection, batch_size=self.batch_size, checkpoint=self.checkpoint,
+                                        strategies=self.strategies, default_strategy=self.default_strategy,
+                                        loader=loader, sizer=self.sizer, retries=self.retries)
+                if self.checkpoint is not None and self.checkpoint.get(range_name(key_range)) is not None:
+                    after = self.checkpoint.get(range_name(key_range))
+                batches = reader.iter_batches(table, chunk_size=self.batch_size, after=after, until=until)
+                return migrator.migrate_batches(mapper, batches, checkpoint_name=range_name(key_range))
+            finally:
+                reader.close()
+                connection.close()
+
+        migrated = 0
+        remaining = [
+            key_range for key_range in ranges
+            if self.checkpoint is None or not self.checkpoint.is_complete(range_name(key_range))
+        ]
+        failed = []
+        with instrumentation.track(name, mapper.source_table.stats.get("rows")):
+            for attempt in range(retries + 1):
+                failed = []
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {executor.submit(copy_range, key_range): key_range for key_range in remaining}
+                    for future in as_completed(futures):
+                        try:
+                            migrated += future.result()
+                        except Exception as e:
+                            print(f"Error migrating range {futures[future]} of '{name}': {e}")
+                            failed.append(futures[future])
+                            if attempt < retries:
+                                instrumentation.retry("range", name, e)
+                if not failed:
+                    break
+                remaining = failed
+
+            print(f"Migrated {migrated} records of '{name}' in {len(ranges)} ranges.")
+            if failed:
+                raise RuntimeError(f"Migration of '{name}' incomplete. Failed ranges: {sorted(failed, key=str)}.")
+        if self.checkpoint is not None:
+            self.checkpoint.complete(name)
+        return migrated
@@ -0,0 +1,222 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional
+from db.db_components import Schema, Table, quote_identifier
+from migration.bulk import _format_timedelta
+
+# Default size of the INSERT statements of the dump files: well under the 4 MiB default
+# max_allowed_packet of MySQL 5.7, since the files are restored on other servers
+DEFAULT_MAX_STATEMENT = 1024 * 1024
+
+_ESCAPES = str.maketrans({
+    "\\": "\\\\", "'": "\\'", "\0": "\\0", "\n": "\\n", "\r": "\\r", "\x1a": "\\Z",
+})
+
+def sql_literal(value: Any) -> str:
+    """
+    Renders a value as a MySQL literal. Strings never contain a raw line break once
+    escaped, so every line break of a dump file separates rows or statements.
+
+    :param value: A value as returned by the driver.
+    :return: The literal.
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return "X'" + bytes(value).hex() + "'" if value else "''"
+    if isinstance(value, timedelta):
+        return f"'{_format_timedelta(value)}'"
+    if isinstance(value, (datetime, date, time)):
+        return f"'{value}'"
+    if isinstance(value, (set, frozenset)):
+        # SET values, as returned by some drivers
+        value = ",".join(sorted(value))
+    return "'" + str(value).translate(_ESCAPES) + "'"
+
+def _open(path: str, mode: str, compress: bool) -> IO[str]:
+    if compress:
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+    return open(path, mode, encoding="utf-8")
+
+class SQLDump:
+    """
+    Dumps tables to SQL files and restores them, for offline migrations between
+    databases that cannot reach each other.
+
+    Every table goes to a file of its own, <table>.sql (or .sql.gz), holding its
+    CREATE TABLE statement and its rows as extended INSERT statements of at most
+    max_statement bytes, which must fit the max_allowed_packet of the server the
+    files are restored on. Tables are dumped and restored in
+    parallel, each on connections of its own; foreign key checks are disabled in
+    the files, so tables can be restored in any order.
+    """
+
+    def __init__(self, directory: str, workers: int = 4, compress: bool = False, chunk_size: int = 10000,
+                 max_statement: int = DEFAULT_MAX_STATEMENT):
+        """
+        :param directory: Directory of the dump files. It is created on dump if needed.
+        :param workers: Number of tables dumped or restored concurrently.
+        :param compress: Gzip the dump files while writing them.
+        :param chunk_size: Number of rows read from the source per query.
+        :param max_statement: Largest size of an INSERT statement, in bytes; rows larger
+            than that get a statement of their own.
+        """
+        if workers <= 0 or chunk_size <= 0 or max_statement <= 0:
+            raise ValueError("Number of workers, chunk size and statement size must be positive integers.")
+        self.directory = directory
+        self.workers = workers
+        self.compress = compress
+        self.chunk_size = chunk_size
+        self.max_statement = max_statement
+
+    def path(self, table: str) -> str:
+        """Returns the path of the dump file of a table."""
+        return os.path.join(self.directory, f"{table}.sql" + (".gz" if self.compress else ""))
+
+    @staticmethod
+    def _insert_statements(table: str, columns: List[str], rows: Iterator[tuple],
+                           max_statement: int) -> Iterator[str]:
+        """Groups rows into extended INSERT statements of at most max_statement bytes."""
+        prefix = f"INSERT INTO {quote_identifier(table)} ({', '.join(map(quote_identifier, columns))}) VALUES\n"
+        values: List[str] = []
+        size = len(prefix)
+        for row in rows:
+            value = "(" + ",".join(map(sql_literal, row)) + ")"
+            value_size = len(value.encode("utf-8")) + 2
+            if values and size + value_size > max_statement:
+                yield prefix + ",\n".join(values) + ";\n"
+                values, size = [], len(prefix)
+            values.append(value)
+            size += value_size
+        if values:
+            yield prefix + ",\n".join(values) + ";\n"
+
+    def dump_table(self, table: Table, reader) -> int:
+        """
+        Dumps one table to its file.
+
+        :param table: The table definition.
+        :param reader: A MySQLCRUD instance connected to the source database, with its schema loaded.
+        :return: The number of rows dumped.
+        """
+        # Generated columns are computed again on restore; MySQL rejects values for them
+        generated = {name for name, column in table.columns.items() if column.generated}
+        dumped = 0
+        tmp_path = self.path(table.name) + ".tmp"
+        with _open(tmp_path, "w", self.compress) as f:
+            f.write("SET NAMES utf8mb4;\nSET FOREIGN_KEY_CHECKS=0;\nSET UNIQUE_CHECKS=0;\n")
+            f.write(f"DROP TABLE IF EXISTS {quote_identifier(table.name)};\n")
+            f.write(table.create_sql() + ";\n")
+            for batch in reader.iter_batches(table.name, chunk_size=self.chunk_size):
+                columns, rows = list(batch.columns), iter(batch.rows)
+                if generated:
+                    kept = [position for position, column in enumerate(columns) if column not in generated]
+                    columns = [columns[position] for position in kept]
+                    rows = (tuple(row[position] for position in kept) for row in batch.rows)
+                for statement in self._insert_statements(table.name, columns, rows, self.max_statement):
+                    f.write(statement)
+                dumped += len(batch)
+            f.write("SET UNIQUE_CHECKS=1;\nSET FOREIGN_KEY_CHECKS=1;\n")
+        # Only complete files get the final name, so a failed dump is never restored
+        os.replace(tmp_path, self.path(table.name))
+        return dumped
+
+    def dump(self, schema: Schema, reader_factory: Callable[[], Any],
+             tables: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Dumps the tables of a schema in parallel.
+
+        :param schema: Schema of the source database.
+        :param reader_factory: Callable returning a new MySQLCRUD reader on the source, with its schema loaded,
+            typically over a connection checked out of a ConnectionPool.
+        :param tables: Names of the tables to dump (defaults to all).
+        :return: The number of rows dumped per table.
+        :raises RuntimeError: If some tables could not be dumped.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        names = tables if tables is not None else list(schema.tables)
+
+        def dump_one(name: str) -> int:
+            reader = reader_factory()
+            try:
+                return self.dump_table(schema.tables[name], reader)
+            finally:
+                reader.close()
+
+        return self._run(dump_one, names, "dump")
+
+    def restore_table(self, table: str, connection) -> int:
+        """
+        Replays the dump file of one table, committing after every statement.
+
+        :param table: Table name.
+        :param connection: A MySQL connection to the target database.
+        :return: The number of statements executed.
+        """
+        executed = 0
+        cursor = connection.cursor()
+        try:
+            with _open(self.path(table), "r", self.compress) as f:
+                statement: List[str] = []
+                for line in f:
+                    statement.append(line)
+                    if line.rstrip("\n").endswith(";"):
+                        cursor.execute("".join(statement))
+                        connection.commit()
+                        statement = []
+                        executed += 1
+        except Exception:
+            connection.rollback()
+            # The file disables the checks for the session; do not leave them off on a pooled connection
+            cursor.execute("SET UNIQUE_CHECKS=1, FOREIGN_KEY_CHECKS=1")
+            raise
+        finally:
+            cursor.close()
+        return executed
+
+    def restore(self, connection_factory: Callable[[], Any], tables: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Restores dumped tables in parallel.
+
+        :param connection_factory: Callable returning a MySQL connection to the target, typically
+            ConnectionPool.acquire so that closing it returns it to the pool.
+        :param tables: Names of the tables to restore (defaults to every dump file of the directory).
+        :return: The number of statements executed per table.
+        :raises RuntimeError: If some tables could not be restored.
+        """
+        if tables is None:
+            suffix = ".sql.gz" if self.compress else ".sql"
+            tables = sorted(name[:-len(suffix)] for name in os.listdir(self.directory) if name.endswith(suffix))
+
+        def restore_one(name: str) -> int:
+            connection = connection_factory()
+            try:
+                return self.restore_table(name, connection)
+            finally:
+                connection.close()
+
+        return self._run(restore_one, tables, "restore")
+
+    def _run(self, work: Callable[[str], int], tables: List[str], action: str) -> Dict[str, int]:
+        """Runs work on every table on the worker pool, collecting the failures."""
+        results: Dict[str, int] = {}
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(work, name): name for name in tables}
+            for future, name in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"Error during {action} of table '{name}': {e}")
+                    failed.append(name)
+        if failed:
+            raise RuntimeError(f"The {action} is incomplete. Failed tables: {sorted(failed)}.")
+        print(f"Completed {action} of {len(results)} tables in '{self.directory}'.")
+        return results
@@ -0,0 +1,188 @@
+from typing import List, Optional, Set, Tuple
+from db.db_components import Table, quote_identifier
+
+# Modes of DeferredIndexes
+DROP_INDEXES = "drop_indexes"
+DISABLE_CHECKS = "disable_checks"
+
+class DeferredIndexes:
+    """
+    Defers the maintenance of a target table's secondary indexes and foreign keys
+    until a bulk load is over, so that rows are not checked and indexed one by one.
+
+    Two modes are available:
+
+    - "drop_indexes" drops the non-unique secondary indexes and foreign keys of the
+      table in one ALTER TABLE before the load and adds them back in one ALTER TABLE
+      afterwards, building each index in a single sorted pass. Unique indexes stay in
+      place: upserts match existing rows on them, and without them reloaded rows would
+      be duplicated instead of updated. The foreign keys are added with
+      FOREIGN_KEY_CHECKS disabled, so that they do not force a table copy, and are
+      verified afterwards with one anti-join per constraint.
+    - "disable_checks" keeps the indexes and only sets FOREIGN_KEY_CHECKS and
+      UNIQUE_CHECKS to 0 for the session of the connection doing the load; the
+      foreign keys and unique indexes are verified afterwards.
+
+    The definitions come from the Table, as read by SchemaExtractor. Only the indexes
+    and constraints actually present on the server are dropped, and only the missing
+    ones are added back, so an interrupted load can be resumed and rebuilt later.
+
+    Usage:
+        with DeferredIndexes(connection, target_table):
+            migrator.migrate_table(mapper, reader)
+    """
+
+    def __init__(self, connection, table: Table, mode: str = DROP_INDEXES, verify: bool = True):
+        """
+        :param connection: The MySQL connection of the load; the table is altered over it.
+        :param table: Definition of the target table, with its indexes and foreign keys.
+        :param mode: Either "drop_indexes" or "disable_checks".
+        :param verify: Check the foreign keys (and unique indexes) once the load is over.
+        """
+        if mode not in (DROP_INDEXES, DISABLE_CHECKS):
+            raise ValueError(f"Unknown mode '{mode}'.")
+        self.conn = connection
+        self.table = table
+        self.mode = mode
+        self.verify_after = verify
+        self._saved_checks: Optional[Tuple[int, int]] = None
+
+    def _fetch(self, query: str, values: Tuple = ()) -> List[tuple]:
+        with self.conn.cursor() as cursor:
+            cursor.execute(query, values)
+            return list(cursor.fetchall())
+
+    def _execute(self, statement: str):
+        with self.conn.cursor() as cursor:
+            cursor.execute(statement)
+
+    def _session_checks(self) -> Tuple[int, int]:
+        """Current FOREIGN_KEY_CHECKS and UNIQUE_CHECKS of the session."""
+        row = self._fetch("SELECT @@SESSION.FOREIGN_KEY_CHECKS, @@SESSION.UNIQUE_CHECKS")[0]
+        return int(row[0]), int(row[1])
+
+    def _set_session_checks(self, foreign_key_checks: int, unique_checks: int):
+        self._execute(f"SET SESSION FOREIGN_KEY_CHECKS = {int(foreign_key_checks)}, "
+                      f"UNIQUE_CHECKS = {int(unique_checks)}")
+
+    def _existing(self) -> Tuple[Set[str], Set[str]]:
+        """Names of the indexes and foreign keys the table has on the server."""
+        indexes = self._fetch(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (self.table.name,))
+        foreign_keys = self._fetch(
+            "SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_TYPE = 'FOREIGN KEY'",
+            (self.table.name,))
+        return {row[0] for row in indexes}, {row[0] for row in foreign_keys}
+
+    def drop_statement(self) -> Optional[str]:
+        """The ALTER TABLE dropping the non-unique secondary indexes and the foreign keys present, if any."""
+        indexes, foreign_keys = self._existing()
+        clauses = [f"DROP FOREIGN KEY {quote_identifier(fk.name)}"
+                   for fk in self.table.foreign_keys if fk.name in foreign_keys]
+        clauses += [f"DROP INDEX {quote_identifier(index.name)}"
+                    for index in self.table.secondary_indexes if index.name in indexes and not index.unique]
+        if not clauses:
+            return None
+        return f"ALTER TABLE {quote_identifier(self.table.name)} " + ", ".join(clauses)
+
+    def rebuild_statement(self) -> Optional[str]:
+        """The ALTER TABLE adding back the missing secondary indexes and foreign keys, if any."""
+        indexes, foreign_keys = self._existing()
+        clauses = [f"ADD {index.definition()}"
+                   for index in self.table.secondary_indexes if index.name not in indexes]
+        clauses += [f"ADD {fk.definition()}"
+                    for fk in self.table.foreign_keys if fk.name not in foreign_keys]
+        if not clauses:
+            return None
+        return f"ALTER TABLE {quote_identifier(self.table.name)} " + ", ".join(clauses)
+
+    def defer(self):
+        """Drops the indexes, or disables the checks, before the load."""
+        if self.mode == DISABLE_CHECKS:
+            self._saved_checks = self._session_checks()
+            self._set_session_checks(0, 0)
+            return
+
+        statement = self.drop_statement()
+        if statement is not None:
+            print(f"Dropping the secondary indexes and foreign keys of '{self.table.name}' until the load is over.")
+            self._execute(statement)
+
+    def rebuild(self):
+        """Adds the indexes back, or restores the checks, after the load."""
+        if self.mode == DISABLE_CHECKS:
+            if self._saved_checks is not None:
+                self._set_session_checks(*self._saved_checks)
+                self._saved_checks = None
+            return
+
+        statement = self.rebuild_statement()
+        if statement is None:
+            return
+        print(f"Rebuilding the secondary indexes and foreign keys of '{self.table.name}'.")
+        # Adding foreign keys with the checks on forces a table copy; they are verified separately
+        saved = self._session_checks()
+        self._set_session_checks(0, saved[1])
+        try:
+            self._execute(statement)
+        finally:
+            self._set_session_checks(*saved)
+
+    def verify(self):
+        """
+        Checks that the indexes and foreign keys are in place and hold for the loaded rows.
+
+        :raises RuntimeError: Listing the missing definitions, the foreign keys with
+            orphan rows and the unique indexes with duplicate values.
+        """
+        problems = []
+        name = quote_identifier(self.table.name)
+        indexes, foreign_keys = self._existing()
+        problems += [f"index '{index.name}' is missing"
+                     for index in self.table.secondary_indexes if index.name not in indexes]
+        problems += [f"foreign key '{fk.name}' is missing"
+                     for fk in self.table.foreign_keys if fk.name not in foreign_keys]
+
+        for fk in self.table.foreign_keys:
+            join = " AND ".join(f"c.{quote_identifier(column)} = p.{quote_identifier(ref)}"
+                                for column, ref in zip(fk.columns, fk.ref_columns))
+            not_null = " AND ".join(f"c.{quote_identifier(column)} IS NOT NULL" for column in fk.columns)
+            orphans = self._fetch(
+                f"SELECT COUNT(*) FROM {name} c LEFT JOIN {quote_identifier(fk.ref_table)} p ON {join} "
+                f"WHERE {not_null} AND p.{quote_identifier(fk.ref_columns[0])} IS NULL")[0][0]
+            if orphans:
+                problems.append(f"foreign key '{fk.name}' has {orphans} orphan rows")
+
+        if self.mode == DISABLE_CHECKS:
+            for index in self.table.secondary_indexes:
+                if not index.unique:
+                    continue
+                columns = ", ".join(map(quote_identifier, index.columns))
+                not_null = " AND ".join(f"{quote_identifier(column)} IS NOT NULL" for column in index.columns)
+                duplicates = self._fetch(
+                    f"SELECT 1 FROM {name} WHERE {not_null} GROUP BY {columns} HAVING COUNT(*) > 1 LIMIT 1")
+                if duplicates:
+                    problems.append(f"unique index '{index.name}' has duplicate values")
+
+        if problems:
+            raise RuntimeError(f"Verification of '{self.table.name}' failed: {'; '.join(problems)}.")
+        print(f"Indexes and foreign keys of '{self.table.name}' verified.")
+
+    def __enter__(self) -> "DeferredIndexes":
+        self.defer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            if self.mode == DISABLE_CHECKS:
+                self.rebuild()
+            else:
+                print(f"Load of '{self.table.name}' failed; its indexes stay dropped until it is resumed "
+                      f"or DeferredIndexes.rebuild() is called.")
+            return False
+        self.rebuild()
+        if self.verify_after:
+            self.verify()
+        return False
@@ -0,0 +1,133 @@
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+from db.mappers import FieldMapper
+from migration.data import DataMigrator
+from migration.verify import row_hash_expression
+
+class MergeSync:
+    """
+    Synchronizes a target table with its source by writing only the rows that changed.
+
+    Both sides are streamed as (primary key, MD5 of the mapped columns) pairs in key
+    order, computed by the servers, and merge-joined: keys only in the source are
+    inserted, keys whose hashes differ are updated, and keys only in the target are
+    deleted in batches. Unchanged rows are neither transferred nor written.
+
+    The merge relies on both servers ordering the keys the way Python does, which holds
+    for integer keys and binary strings but not for case-insensitive collations.
+    """
+
+    def __init__(self, migrator: DataMigrator, reader, chunk_size: int = 10000):
+        """
+        :param migrator: DataMigrator connected to the target; its batch_size sizes the writes.
+        :param reader: A MySQLCRUD instance connected to the source database, with its schema loaded.
+        :param chunk_size: Number of key hashes fetched per query on each side.
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be a positive integer.")
+        self.migrator = migrator
+        self.reader = reader
+        self.chunk_size = chunk_size
+
+    def _stream_hashes(self, connection, table: str, key: str, columns: Sequence[str]) -> Iterator[Tuple[Any, str]]:
+        """Streams (key, row hash) pairs of a table in key order, with keyset pagination."""
+        row_hash = row_hash_expression(columns, "MD5")
+        last_key = None
+        while True:
+            query = f"SELECT {key}, {row_hash} FROM {table}"
+            values = []
+            if last_key is not None:
+                query += f" WHERE {key} > %s"
+                values.append(last_key)
+            query += f" ORDER BY {key} LIMIT {int(self.chunk_size)}"
+
+            cursor = connection.cursor()
+            try:
+                cursor.execute(query, values)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+
+            yield from rows
+            if len(rows) < self.chunk_size:
+                return
+            last_key = rows[-1][0]
+
+    def _upsert(self, mapper: FieldMapper, key: str, keys: List[Any]):
+        """Copies the source rows of the given keys to the target."""
+        placeholders = ", ".join(["%s"] * len(keys))
+        self.reader.cursor.execute(f"SELECT * FROM {mapper.source_table.name} WHERE {key} IN ({placeholders})", keys)
+        self.migrator.write_batch(mapper, self.reader.cursor.fetchall())
+
+    def _delete(self, table: str, key: str, keys: List[Any]):
+        """Deletes the target rows of the given keys in one statement and transaction."""
+        conn = self.migrator.conn
+        placeholders = ", ".join(["%s"] * len(keys))
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {table} WHERE {key} IN ({placeholders})", keys)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def sync(self, mapper: FieldMapper, delete: bool = True) -> Dict[str, int]:
+        """
+        Brings the target table in line with the source table.
+
+        :param mapper: A FieldMapper object defining the source-target mapping; the
+            primary key must be a single mapped column.
+        :param delete: Delete the target rows whose key is gone from the source.
+        :return: The number of rows inserted, updated, deleted and left unchanged.
+        """
+        key_fields = mapper.source_table.primary_key
+        if len(key_fields) != 1 or key_fields[0] not in mapper.mapping:
+            raise ValueError(f"Table '{mapper.source_table.name}' needs a single-column, mapped primary key.")
+
+        compiled = mapper.compile(convert_types=False)
+        source_key = key_fields[0]
+        target_key = mapper.mapping[source_key]
+        source_table = mapper.source_table.name
+        target_table = mapper.target_table.name
+
+        source = self._stream_hashes(self.reader.conn, source_table, source_key, compiled.source_fields)
+        target = self._stream_hashes(self.migrator.conn, target_table, target_key, compiled.target_fields)
+
+        counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        upserts: List[Any] = []
+        deletes: List[Any] = []
+        batch_size = self.migrator.batch_size
+
+        def flush(final=False):
+            if upserts and (final or len(upserts) >= batch_size):
+                self._upsert(mapper, source_key, upserts)
+                upserts.clear()
+            if deletes and (final or len(deletes) >= batch_size):
+                self._delete(target_table, target_key, deletes)
+                deletes.clear()
+
+        source_row = next(source, None)
+        target_row = next(target, None)
+        while source_row is not None or target_row is not None:
+            if target_row is None or (source_row is not None and source_row[0] < target_row[0]):
+                upserts.append(source_row[0])
+                counts["inserted"] += 1
+                source_row = next(source, None)
+            elif source_row is None or target_row[0] < source_row[0]:
+                if delete:
+                    deletes.append(target_row[0])
+                    counts["deleted"] += 1
+                target_row = next(target, None)
+            else:
+                if source_row[1] != target_row[1]:
+                    upserts.append(source_row[0])
+                    counts["updated"] += 1
+                else:
+                    counts["unchanged"] += 1
+                source_row = next(source, None)
+                target_row = next(target, None)
+            flush()
+        flush(final=True)
+
+        print(f"Synchronized '{target_table}': {counts['inserted']} inserted, {counts['updated']} updated, "
+              f"{counts['deleted']} deleted, {counts['unchanged']} unchanged.")
+        return counts
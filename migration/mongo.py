@@ -0,0 +1,268 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+from db.batch import RowBatch
+from db.db_components import Column, Table
+from migration.checkpoint import CheckpointStore
+from migration.data import DataMigrator
+
+# Values stored as they are in a flattened row; anything else (ObjectId, ...) becomes a string.
+_SCALAR_TYPES = (str, int, float, bool, Decimal, datetime, date, bytes)
+
+def flatten_document(document: Dict[str, Any], separator: str = ".", prefix: str = "",
+                     encode_arrays: bool = True) -> Dict[str, Any]:
+    """
+    Flattens a MongoDB document into a row: nested documents become dotted keys
+    (e.g. {"address": {"city": ...}} gives "address.city") and arrays become JSON strings.
+
+    :param document: The document.
+    :param separator: Separator between the keys of nested documents.
+    :param prefix: Key prefix of the document's fields, used for the recursion.
+    :param encode_arrays: Encode arrays as JSON strings, or keep them as lists.
+    :return: A flat dictionary.
+    """
+    row: Dict[str, Any] = {}
+    for key, value in document.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            row.update(flatten_document(value, separator, name + separator, encode_arrays))
+        elif isinstance(value, (list, tuple)):
+            row[name] = json.dumps(value, default=str) if encode_arrays else list(value)
+        elif value is None or isinstance(value, _SCALAR_TYPES):
+            row[name] = value
+        else:
+            row[name] = str(value)
+    return row
+
+def unflatten_row(row: Dict[str, Any], separator: str = ".") -> Dict[str, Any]:
+    """
+    Rebuilds a nested document from a row whose keys may be dotted paths.
+
+    :param row: The flat row.
+    :param separator: Separator between the keys of nested documents.
+    :return: The document.
+    """
+    document: Dict[str, Any] = {}
+    for key, value in row.items():
+        parts = key.split(separator)
+        node = document
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return document
+
+def _column_type(values: List[Any]) -> str:
+    """MySQL column type able to hold the given sample values."""
+    types = {type(value) for value in values if value is not None}
+    if not types:
+        return "text"
+    if types == {bool}:
+        return "tinyint(1)"
+    if types <= {bool, int}:
+        return "bigint"
+    if types <= {bool, int, float}:
+        return "double"
+    if types <= {bool, int, Decimal}:
+        return "decimal(65,30)"
+    if types == {datetime}:
+        return "datetime"
+    if types == {date}:
+        return "date"
+    if types == {bytes}:
+        return "longblob"
+    if types == {list}:
+        return "json"
+    if types == {str}:
+        longest = max(len(value) for value in values if value is not None)
+        return "varchar(255)" if longest <= 255 else "text"
+    return "text"
+
+def infer_table(name: str, documents: Iterable[Dict[str, Any]], separator: str = ".") -> Table:
+    """
+    Infers a table definition from sample documents of a collection, so that a
+    FieldMapper can map the collection to or from a MySQL table.
+
+    Columns are the flattened fields, in order of first appearance, typed from the
+    sampled values (arrays as json); a field missing from some documents is nullable.
+    _id is the primary key.
+
+    :param name: Collection name, used as table name.
+    :param documents: Sample documents, e.g. collection.find().limit(1000).
+    :param separator: Separator between the keys of nested documents.
+    :return: The Table.
+    """
+    samples: Dict[str, List[Any]] = {}
+    count = 0
+    for document in documents:
+        count += 1
+        for field, value in flatten_document(document, separator, encode_arrays=False).items():
+            samples.setdefault(field, []).append(value)
+
+    table = Table(name)
+    for field, values in samples.items():
+        if field == "_id":
+            table.add_column(Column(field, _column_type(values), False, "PRI"))
+        else:
+            nullable = len(values) < count or any(value is None for value in values)
+            table.add_column(Column(field, _column_type(values), nullable))
+    return table
+
+class MongoReader:
+    """
+    Streams MongoDB collections as flattened rows, in _id order.
+
+    It offers the iter_chunks and iter_batches interface of MySQLCRUD, so that
+    DataMigrator.migrate_table and MigrationPipeline.run can read from MongoDB. Each collection is read with a
+    single cursor fetching batch_size documents per round trip, and only the projected
+    fields are transferred.
+    """
+
+    def __init__(self, database, batch_size: int = 1000, projections: Optional[Dict[str, Sequence[str]]] = None,
+                 separator: str = "."):
+        """
+        :param database: A MongoDB database (e.g. MongoClient(uri)[name], or a connection checked
+            out of a "mongodb" ConnectionPool), or any object giving collections by name.
+        :param batch_size: Number of documents fetched per round trip.
+        :param projections: Flattened fields read per collection (default: whole documents).
+            Mapped collections should be projected on their mapped fields, so that every
+            row has all of them, missing ones being None.
+        :param separator: Separator between the keys of nested documents.
+        """
+        if batch_size <= 0:
+            raise ValueError("Batch size must be a positive integer.")
+        self.database = database
+        self.batch_size = batch_size
+        self.projections = projections or {}
+        self.separator = separator
+
+    def iter_chunks(self, table: str, chunk_size: int = 1000, filters: Optional[Dict[str, Any]] = None,
+                    after: Any = None, fields: Optional[Sequence[str]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Streams the documents of a collection as flattened rows, one chunk at a time.
+
+        :param table: Collection name.
+        :param chunk_size: Maximum number of rows per chunk.
+        :param filters: MongoDB query filter (optional).
+        :param after: _id to resume after, as found in the rows (optional).
+        :param fields: Flattened fields to read (defaults to the collection's projection).
+        :return: Generator of lists of rows.
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be a positive integer.")
+
+        fields = fields if fields is not None else self.projections.get(table)
+        collection = self.database[table]
+        query = dict(filters or {})
+        if after is not None:
+            after = self._resume_key(collection, after)
+            query = {"$and": [query, {"_id": {"$gt": after}}]} if query else {"_id": {"$gt": after}}
+        projection = None
+        if fields is not None:
+            # _id is returned unless excluded; keep it only when asked for
+            projection = {field: 1 for field in fields}
+            projection.setdefault("_id", 0)
+
+        cursor = collection.find(query, projection, batch_size=self.batch_size).sort("_id", 1)
+        try:
+            chunk = []
+            for document in cursor:
+                row = flatten_document(document, self.separator)
+                if fields is not None:
+                    row = {field: row.get(field) for field in fields}
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _resume_key(collection, after: Any) -> Any:
+        """
+        Rebuilds the _id to resume after. Rows, and so checkpoints, hold ObjectIds (and
+        the other _id types that are not plain values) as strings, but MongoDB only
+        compares values of the same type: {"_id": {"$gt": "<hex>"}} matches no ObjectId.
+        Unless a document has that very string as _id, the key is converted back to the
+        type of the collection's largest _id.
+        """
+        if not isinstance(after, str) or collection.find_one({"_id": after}, {"_id": 1}) is not None:
+            return after
+        last = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        if last is None or isinstance(last["_id"], str):
+            return after
+        try:
+            return type(last["_id"])(after)
+        except Exception:
+            return after
+
+    def iter_batches(self, table: str, chunk_size: int = 1000, filters: Optional[Dict[str, Any]] = None,
+                     after: Any = None, fields: Optional[Sequence[str]] = None) -> Iterator[RowBatch]:
+        """
+        Streams the documents of a collection like iter_chunks, as RowBatch objects.
+        Without a projection, the columns of each batch are the fields of its documents.
+        """
+        fields = fields if fields is not None else self.projections.get(table)
+        for chunk in self.iter_chunks(table, chunk_size, filters, after, fields):
+            yield RowBatch.from_dicts(chunk, fields)
+
+class MongoWriter(DataMigrator):
+    """
+    Migrates mapped rows into MongoDB collections.
+
+    Target fields with dotted names are nested into sub-documents. Batches are written
+    with unordered bulk operations, so the server applies them without waiting for
+    each document in turn: insert_many in insert mode, and in upsert mode one
+    UpdateOne(upsert=True) per document, matched on the key field, in a single
+    bulk_write. Everything else (batching, checkpoints, migrate_table) is inherited
+    from DataMigrator; resuming from a checkpoint needs _id values JSON can hold.
+    """
+
+    def __init__(self, database, batch_size: int = 1000, checkpoint: Optional[CheckpointStore] = None,
+                 upsert: bool = True, key: str = "_id", separator: str = "."):
+        """
+        :param database: A MongoDB database (e.g. MongoClient(uri)[name], or a connection checked
+            out of a "mongodb" ConnectionPool), or any object giving collections by name.
+        :param batch_size: Number of documents written per bulk operation.
+        :param checkpoint: Optional store used to record progress and resume interrupted migrations.
+        :param upsert: Replace the fields of existing documents with the same key instead of inserting.
+        :param key: Target field identifying a document in upsert mode.
+        :param separator: Separator between the keys of nested documents.
+        """
+        super().__init__(database, batch_size=batch_size, checkpoint=checkpoint)
+        self.upsert = upsert
+        self.key = key
+        self.separator = separator
+
+    def write_mapped(self, table: str, target_fields: Sequence[str], values: List[tuple]):
+        """
+        Writes one batch of mapped rows to a collection.
+
+        :param table: Collection name.
+        :param target_fields: Target field names, in the order of the row values.
+        :param values: Tuples of values, as produced by a CompiledMapping.
+        :raises Exception: Any database error; with unordered writes, the other documents
+            of the batch may have been written.
+        """
+        if not values:
+            return
+        collection = self.conn[table]
+        rows = [dict(zip(target_fields, row)) for row in values]
+
+        if not self.upsert:
+            collection.insert_many([unflatten_row(row, self.separator) for row in rows], ordered=False)
+            return
+
+        if self.key not in target_fields:
+            raise ValueError(f"The key field '{self.key}' of collection '{table}' is not mapped.")
+        from pymongo import UpdateOne
+        operations = []
+        for row in rows:
+            # _id is immutable, so it is only matched on, never set
+            key_value = row.pop(self.key) if self.key == "_id" else row[self.key]
+            # MongoDB rejects an empty $set, left when only the key is mapped
+            update = {"$set": unflatten_row(row, self.separator)} if row else {"$setOnInsert": {self.key: key_value}}
+            operations.append(UpdateOne({self.key: key_value}, update, upsert=True))
+        collection.bulk_write(operations, ordered=False)
@@ -0,0 +1,228 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from db.instrumentation import instrumentation
+from db.mappers import FieldMapper
+from migration.checkpoint import CheckpointStore
+from migration.data import DataMigrator, INSERT
+
+# Marks the end of the stream on a queue
+_DONE = object()
+
+class _CommitTracker:
+    """
+    Tracks the batches committed by the writers, which may finish out of order, and
+    saves the checkpoint up to the last batch of the contiguous committed prefix, so
+    a resumed run never skips a batch that was not written.
+    """
+
+    def __init__(self, checkpoint: Optional[CheckpointStore], name: str):
+        self.checkpoint = checkpoint
+        self.name = name
+        self._lock = threading.Lock()
+        self._pending: Dict[int, tuple] = {}
+        self._next = 0
+
+    def committed(self, seq: int, last_key: Any, rows: int):
+        with self._lock:
+            self._pending[seq] = (last_key, rows)
+            while self._next in self._pending:
+                last_key, rows = self._pending.pop(self._next)
+                self._next += 1
+                if self.checkpoint is not None:
+                    self.checkpoint.save(self.name, last_key, rows)
+
+class MigrationPipeline:
+    """
+    Migrates a table through three concurrent stages, so that reading the source,
+    mapping the rows and writing the target overlap instead of taking turns:
+
+        reader -> mappers -> writers
+
+    The stages run on threads connected by bounded queues: a stage blocks when the
+    next one falls behind, so at most queue_size batches wait between two stages
+    whatever the size of the table. Batches travel as RowBatch objects, tuple rows
+    under a shared header. The first error in any stage cancels the others and is
+    raised by run(); batches committed before it are kept.
+
+    Each writer writes on its own connection. With several mappers or writers the
+    batches may be committed out of order, so the checkpoint only advances over
+    the batches committed without gaps.
+    """
+
+    def __init__(self, connection_factory: Callable[[], Any], batch_size: int = 1000,
+                 mappers: int = 1, writers: int = 2, queue_size: int = 4,
+                 checkpoint: Optional[CheckpointStore] = None,
+                 strategies: Optional[Dict[str, str]] = None, default_strategy: str = INSERT):
+        """
+        :param connection_factory: Callable returning a MySQL connection to the target, typically
+            ConnectionPool.acquire so that closing it returns it to the pool.
+        :param batch_size: Number of rows read, mapped and committed at once.
+        :param mappers: Number of mapping threads.
+        :param writers: Number of writing threads, each with its own connection.
+        :param queue_size: Maximum number of batches waiting between two stages.
+        :param checkpoint: Optional store used to resume interrupted migrations.
+        :param strategies: Write strategy per target table, as for DataMigrator.
+        :param default_strategy: Write strategy of the other tables.
+        """
+        if batch_size <= 0 or mappers <= 0 or writers <= 0 or queue_size <= 0:
+            raise ValueError("Batch size, queue size and numbers of threads must be positive integers.")
+        self.connection_factory = connection_factory
+        self.batch_size = batch_size
+        self.mappers = mappers
+        self.writers = writers
+        self.queue_size = queue_size
+        self.checkpoint = checkpoint
+        self.strategies = strategies
+        self.default_strategy = default_strategy
+
+    @staticmethod
+    def _put(q: queue.Queue, item, cancel: threading.Event) -> bool:
+        """Puts an item on a queue, waiting for room unless the pipeline is cancelled."""
+        while not cancel.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(q: queue.Queue, cancel: threading.Event):
+        """Takes an item from a queue, or _DONE if the pipeline is cancelled."""
+        while not cancel.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def run(self, mapper: FieldMapper, reader, checkpoint_name: Optional[str] = None) -> int:
+        """
+        Streams the source table through the pipeline.
+
+        :param mapper: A FieldMapper object defining the source-target mapping.
+        :param reader: A MySQLCRUD instance connected to the source database, with its schema loaded.
+        :param checkpoint_name: Name of the checkpoint entry (defaults to the target table name).
+        :return: The number of rows migrated by this call.
+        :raises Exception: The first error raised by any stage.
+        """
+        if not mapper.mapping:
+            raise ValueError(f"No field mapping defined for table '{mapper.target_table.name}'.")
+
+        name = checkpoint_name or mapper.target_table.name
+        key_fields = mapper.source_table.primary_key
+        after = None
+        if self.checkpoint is not None:
+            if self.checkpoint.is_complete(name):
+                print(f"Migration of '{name}' already completed; reset its checkpoint to run it again.")
+                return 0
+            if not key_fields:
+                raise ValueError(f"Table '{mapper.source_table.name}' has no primary key to checkpoint on.")
+            after = self.checkpoint.get(name)
+
+        table = mapper.target_table.name
+        tracker = _CommitTracker(self.checkpoint, name)
+        cancel = threading.Event()
+        errors: List[BaseException] = []
+        lock = threading.Lock()
+        mapped_queue: queue.Queue = queue.Queue(self.queue_size)
+        write_queue: queue.Queue = queue.Queue(self.queue_size)
+        state = {"mappers": self.mappers, "migrated": 0}
+
+        def fail(e: BaseException):
+            with lock:
+                errors.append(e)
+            cancel.set()
+
+        def read():
+            try:
+                batches = reader.iter_batches(mapper.source_table.name, chunk_size=self.batch_size, after=after)
+                for seq, batch in enumerate(batches):
+                    last_key = None
+                    if key_fields:
+                        last_key = batch.key(batch.rows[-1], key_fields)
+                        last_key = last_key if len(last_key) > 1 else last_key[0]
+                    if not self._put(mapped_queue, (seq, batch, last_key), cancel):
+                        batches.close()
+                        return
+            except Exception as e:
+                fail(e)
+            finally:
+                for _ in range(self.mappers):
+                    self._put(mapped_queue, _DONE, cancel)
+
+        def transform():
+            try:
+                while True:
+                    item = self._get(mapped_queue, cancel)
+                    if item is _DONE:
+                        return
+                    seq, batch, last_key = item
+                    if not self._put(write_queue, (seq, mapper.map_batch(batch), last_key), cancel):
+                        return
+            except Exception as e:
+                fail(e)
+            finally:
+                # The last mapper to finish tells the writers that no batch will follow
+                with lock:
+                    state["mappers"] -= 1
+                    last = state["mappers"] == 0
+                if last:
+                    for _ in range(self.writers):
+                        self._put(write_queue, _DONE, cancel)
+
+        def write():
+            try:
+                connection = self.connection_factory()
+            except Exception as e:
+                fail(e)
+                return
+            try:
+                migrator = DataMigrator(connection, batch_size=self.batch_size, strategies=self.strategies,
+                                        default_strategy=self.default_strategy)
+                while True:
+                    item = self._get(write_queue, cancel)
+                    if item is _DONE:
+                        return
+                    seq, batch, last_key = item
+                    migrator.write_mapped(table, batch.columns, batch.rows)
+                    tracker.committed(seq, last_key, len(batch))
+                    instrumentation.advance(table, len(batch))
+                    with lock:
+                        state["migrated"] += len(batch)
+            except Exception as e:
+                fail(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=read, name=f"{table}-reader")]
+        threads += [threading.Thread(target=transform, name=f"{table}-mapper-{i}") for i in range(self.mappers)]
+        threads += [threading.Thread(target=write, name=f"{table}-writer-{i}") for i in range(self.writers)]
+        done = self.checkpoint.get_rows(name) if self.checkpoint is not None else 0
+        with instrumentation.track(table, mapper.source_table.stats.get("rows"), done):
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    thread.join()
+            except BaseException:
+                # Interrupted (e.g. KeyboardInterrupt): stop the stages before giving up
+                cancel.set()
+                for thread in threads:
+                    thread.join()
+                raise
+
+            migrated = state["migrated"]
+            if errors:
+                print(f"Error migrating data after {migrated} records: {errors[0]}")
+                raise errors[0]
+
+        if self.checkpoint is not None:
+            self.checkpoint.complete(name)
+
+        if migrated:
+            print(f"Successfully migrated {migrated} records.")
+        else:
+            print("No data to migrate.")
+        return migrated
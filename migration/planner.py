@@ -0,0 +1,238 @@
+import math
+import re
+from typing import Any, Dict, List, Optional
+from db.db_components import Schema, Table
+from db.mappers import type_family
+from migration.data import INSERT, LOAD_DATA
+
+# Strategy of the tables copied by key ranges on parallel workers (DataMigrator.migrate_table_parallel)
+RANGE_PARALLEL = "range_parallel"
+
+# Rows per second of one worker for each write strategy, until measured (e.g. with benchmark.py)
+DEFAULT_THROUGHPUT = {
+    INSERT: 10_000,
+    LOAD_DATA: 50_000,
+}
+
+# max_allowed_packet assumed when the server's cannot be read (the MySQL 8.0 default)
+DEFAULT_MAX_ALLOWED_PACKET = 64 * 1024 * 1024
+
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 50_000
+
+# Approximate stored size of the values of each type family, for tables without stats
+_TYPE_SIZES = {"int": 8, "float": 8, "decimal": 8}
+
+def _column_size(col_type: str) -> int:
+    size = _TYPE_SIZES.get(type_family(col_type))
+    if size is not None:
+        return size
+    length = re.search(r"\((\d+)\)", col_type)
+    if col_type.lower().startswith(("varchar", "char", "varbinary", "binary")) and length:
+        return max(1, int(length.group(1)) // 2)
+    if "text" in col_type.lower() or "blob" in col_type.lower() or col_type.lower().startswith("json"):
+        return 256
+    return 8
+
+def read_max_allowed_packet(connection) -> int:
+    """
+    Reads max_allowed_packet from a MySQL connection.
+
+    :return: The value in bytes, or DEFAULT_MAX_ALLOWED_PACKET if it cannot be read.
+    """
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT @@max_allowed_packet")
+            return int(cursor.fetchall()[0][0])
+        finally:
+            cursor.close()
+    except Exception:
+        return DEFAULT_MAX_ALLOWED_PACKET
+
+class TablePlan:
+    """
+    How one table is to be migrated.
+
+    Attributes:
+        table (str): Table name.
+        rows (int): Estimated number of rows.
+        data_length (int): Estimated size of the data, in bytes.
+        avg_row_length (int): Estimated size of a row, in bytes.
+        strategy (str): "insert", "load_data" or "range_parallel".
+        write_strategy (str): Write strategy of the batches ("insert" or "load_data").
+        batch_size (int): Number of rows per batch.
+        workers (int): Number of workers copying the table.
+        estimated_seconds (float): Estimated duration of the copy.
+    """
+    __slots__ = ("table", "rows", "data_length", "avg_row_length", "strategy", "write_strategy",
+                 "batch_size", "workers", "estimated_seconds")
+
+    def __init__(self, table: str, rows: int, data_length: int, avg_row_length: int, strategy: str,
+                 write_strategy: str, batch_size: int, workers: int, estimated_seconds: float) -> None:
+        self.table = table
+        self.rows = rows
+        self.data_length = data_length
+        self.avg_row_length = avg_row_length
+        self.strategy = strategy
+        self.write_strategy = write_strategy
+        self.batch_size = batch_size
+        self.workers = workers
+        self.estimated_seconds = estimated_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the JSON representation of the plan."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return (f"TablePlan(table={self.table!r}, strategy={self.strategy!r}, batch_size={self.batch_size!r}, "
+                f"workers={self.workers!r}, estimated_seconds={self.estimated_seconds!r})")
+
+class MigrationPlanner:
+    """
+    Chooses how to migrate each table from its size, as estimated by the stats of
+    information_schema.TABLES (TABLE_ROWS, DATA_LENGTH, AVG_ROW_LENGTH):
+
+    - small tables are written with batched INSERT ... ON DUPLICATE KEY UPDATE,
+    - larger ones with LOAD DATA LOCAL INFILE when the target allows it,
+    - the largest ones, when they have a single-column integer primary key, are copied
+      by key ranges on several workers.
+
+    Batches are sized to carry about batch_bytes of data while staying well under the
+    server's max_allowed_packet, since drivers send a batch of INSERT rows as a single
+    multi-row statement. The estimated durations come from per-worker throughputs, which
+    are rough defaults unless measured on the actual servers (e.g. with benchmark.py).
+    The stats of InnoDB are estimates too, so the plan is an order of magnitude.
+    """
+
+    def __init__(self, schema: Schema, max_allowed_packet: int = DEFAULT_MAX_ALLOWED_PACKET,
+                 workers: int = 4, local_infile: bool = True,
+                 throughput: Optional[Dict[str, float]] = None,
+                 bulk_min_rows: int = 100_000, parallel_min_bytes: int = 2 * 1024 ** 3,
+                 batch_bytes: int = 4 * 1024 * 1024):
+        """
+        :param schema: Schema of the source database, with the stats of its tables.
+        :param max_allowed_packet: max_allowed_packet of the target server, see read_max_allowed_packet.
+        :param workers: Number of workers available, both for concurrent tables and for range copies.
+        :param local_infile: Whether the target accepts LOAD DATA LOCAL INFILE.
+        :param throughput: Rows per second of one worker for "insert" and "load_data".
+        :param bulk_min_rows: Number of rows from which a table is bulk loaded.
+        :param parallel_min_bytes: Size of data from which a table is copied by parallel key ranges.
+        :param batch_bytes: Wanted size of the data of a batch.
+        """
+        if workers <= 0 or max_allowed_packet <= 0 or batch_bytes <= 0:
+            raise ValueError("Workers, max_allowed_packet and batch bytes must be positive integers.")
+        self.schema = schema
+        self.max_allowed_packet = max_allowed_packet
+        self.workers = workers
+        self.local_infile = local_infile
+        self.throughput = dict(DEFAULT_THROUGHPUT, **(throughput or {}))
+        self.bulk_min_rows = bulk_min_rows
+        self.parallel_min_bytes = parallel_min_bytes
+        self.batch_bytes = batch_bytes
+
+    def load_stats(self, connection, database: str):
+        """
+        Refreshes the stats of the schema's tables from information_schema.TABLES.
+
+        :param connection: A MySQL connection to the source server.
+        :param database: Name of the source database.
+        """
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                "SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH, AVG_ROW_LENGTH FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = %s", (database,))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        for name, table_rows, data_length, avg_row_length in rows:
+            table = self.schema.get_table(name.decode() if isinstance(name, bytes) else name)
+            if table is not None:
+                table.stats.update(rows=table_rows, data_length=data_length, avg_row_length=avg_row_length)
+
+    @staticmethod
+    def row_length(table: Table) -> int:
+        """Average row size of a table: its AVG_ROW_LENGTH, or an estimate from its column types."""
+        avg_row_length = table.stats.get("avg_row_length")
+        if avg_row_length:
+            return int(avg_row_length)
+        return sum(_column_size(column.col_type) for column in table.columns.values()) or 1
+
+    def batch_size(self, table: Table, write_strategy: str = INSERT) -> int:
+        """
+        Number of rows per batch: about batch_bytes of data, and for INSERT at most a
+        quarter of max_allowed_packet, leaving room for escaping and the statement itself.
+        """
+        budget = self.batch_bytes
+        if write_strategy == INSERT:
+            budget = min(budget, self.max_allowed_packet // 4)
+        return max(MIN_BATCH_SIZE, min(MAX_BATCH_SIZE, budget // self.row_length(table)))
+
+    def plan_table(self, name: str) -> TablePlan:
+        """
+        Plans the migration of one table.
+
+        :param name: Table name.
+        :return: The TablePlan of the table.
+        """
+        table = self.schema.tables[name]
+        rows = int(table.stats.get("rows") or 0)
+        row_length = self.row_length(table)
+        data_length = int(table.stats.get("data_length") or rows * row_length)
+
+        write_strategy = LOAD_DATA if self.local_infile and rows >= self.bulk_min_rows else INSERT
+        strategy, workers = write_strategy, 1
+        keys = table.primary_key
+        if (data_length >= self.parallel_min_bytes and self.workers > 1 and len(keys) == 1
+                and type_family(table.columns[keys[0]].col_type) == "int"):
+            strategy = RANGE_PARALLEL
+            workers = min(self.workers, max(2, math.ceil(data_length / self.parallel_min_bytes)))
+
+        # Parallel workers share the server: count them as 80% efficient
+        rate = self.throughput[write_strategy] * (workers * 0.8 if workers > 1 else 1)
+        return TablePlan(name, rows, data_length, row_length, strategy, write_strategy,
+                         self.batch_size(table, write_strategy), workers, rows / rate)
+
+    def plan(self, tables: Optional[List[str]] = None) -> List[TablePlan]:
+        """
+        Plans the migration of several tables.
+
+        :param tables: Names of the tables (defaults to all).
+        :return: The plans, largest tables first.
+        """
+        names = tables if tables is not None else list(self.schema.tables)
+        return sorted((self.plan_table(name) for name in names), key=lambda plan: -plan.data_length)
+
+    def estimated_duration(self, plans: List[TablePlan]) -> float:
+        """
+        Estimated duration of a migration running the plans on the workers, largest
+        first: the longest table, or the total work divided among the workers.
+        """
+        if not plans:
+            return 0.0
+        work = sum(plan.estimated_seconds * plan.workers for plan in plans)
+        return max(max(plan.estimated_seconds for plan in plans), work / self.workers)
+
+    @staticmethod
+    def _format_size(size: float) -> str:
+        for unit in ("B", "KiB", "MiB", "GiB"):
+            if size < 1024:
+                return f"{size:.0f} {unit}"
+            size /= 1024
+        return f"{size:.1f} TiB"
+
+    @staticmethod
+    def _format_duration(seconds: float) -> str:
+        minutes, seconds = divmod(int(math.ceil(seconds)), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+
+    def print_plan(self, plans: List[TablePlan]):
+        """Prints the plans as a table, with the estimated duration of the whole migration."""
+        print(f"{'Table':30} {'Rows':>12} {'Size':>10} {'Strategy':>15} {'Batch':>7} {'Workers':>7} {'Estimate':>10}")
+        for plan in plans:
+            print(f"{plan.table:30} {plan.rows:>12} {self._format_size(plan.data_length):>10} {plan.strategy:>15} "
+                  f"{plan.batch_size:>7} {plan.workers:>7} {self._format_duration(plan.estimated_seconds):>10}")
+        print(f"Estimated duration with {self.workers} workers (max_allowed_packet "
+              f"{self._format_size(self.max_allowed_packet)}): {self._format_duration(self.estimated_duration(plans))}.")
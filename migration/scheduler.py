@@ -0,0 +1,322 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Set
+from db.db_components import Schema, Table
+from db.extractor import SchemaExtractor
+from db.mappers import FieldMapper
+from migration.batching import AdaptiveBatchSizer
+from migration.checkpoint import CheckpointStore
+from migration.data import INSERT, LOAD_DATA, DataMigrator
+from migration.indexes import DISABLE_CHECKS, DeferredIndexes
+from migration.planner import RANGE_PARALLEL, TablePlan
+
+class _ChecksOffConnection:
+    """
+    Target connection of a range copy with FOREIGN_KEY_CHECKS, and optionally UNIQUE_CHECKS,
+    disabled for its session, turned back on when it is closed, since pooled connections
+    keep their session settings.
+    """
+
+    def __init__(self, connection, unique_checks: bool = False):
+        self._connection = connection
+        self._variables = ["FOREIGN_KEY_CHECKS"] + (["UNIQUE_CHECKS"] if unique_checks else [])
+        self._set_checks(0)
+
+    def _set_checks(self, value: int):
+        with self._connection.cursor() as cursor:
+            cursor.execute("SET SESSION " + ", ".join(f"{variable} = {int(value)}" for variable in self._variables))
+
+    def close(self):
+        try:
+            self._set_checks(1)
+        except Exception:
+            pass
+        self._connection.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+class MigrationScheduler:
+    """
+    Migrates every table of a schema on a pool of workers, in foreign key dependency order.
+
+    A table only starts once all the tables it references have been migrated, so that
+    foreign key checks on the target never fail. Tables that do not depend on each other
+    are migrated concurrently. Each worker thread opens its own source and target
+    connections and reuses them for all the tables it migrates.
+    """
+
+    def __init__(self, source_schema: Schema, target_schema: Schema,
+                 source_factory: Callable[[], Any], target_factory: Callable[[], Any],
+                 workers: int = 4, batch_size: int = 1000,
+                 checkpoint: Optional[CheckpointStore] = None,
+                 disable_fk_checks: bool = False,
+                 mapper_factory: Optional[Callable[[Table, Table], FieldMapper]] = None,
+                 tables: Optional[List[str]] = None,
+                 strategies: Optional[Dict[str, str]] = None,
+                 defer_indexes: Optional[str] = None,
+                 plans: Optional[List[TablePlan]] = None,
+                 adaptive_batches: bool = False):
+        """
+        :param source_schema: Schema of the source database; its foreign keys define the dependencies.
+        :param target_schema: Schema of the target database.
+        :param source_factory: Callable returning a new MySQLCRUD reader on the source, with its schema loaded,
+            typically over a connection checked out of a ConnectionPool.
+        :param target_factory: Callable returning a new MySQL connection to the target, typically
+            ConnectionPool.acquire so that closing it returns it to the pool.
+        :param workers: Number of tables migrated concurrently.
+        :param batch_size: Number of rows per committed batch.
+        :param checkpoint: Optional store used to resume interrupted migrations.
+        :param disable_fk_checks: Disable FOREIGN_KEY_CHECKS on the target sessions and ignore dependencies.
+        :param mapper_factory: Callable building the FieldMapper of a table pair
+            (defaults to mapping the columns both tables have in common).
+        :param tables: Names of the tables to migrate (defaults to all tables present in both schemas).
+        :param strategies: Write strategy per target table ("insert" or "load_data"), see DataMigrator.
+        :param defer_indexes: Defer the secondary indexes and foreign keys of each target table until
+            it is loaded, either "drop_indexes" or "disable_checks" (see DeferredIndexes). The target
+            schema must hold the index and foreign key definitions, as read by SchemaExtractor.
+        :param plans: Plans of a MigrationPlanner. Each planned table is migrated with the batch
+            size, write strategy and, for "range_parallel", the number of workers of its plan.
+        :param adaptive_batches: Adapt the number of rows per transaction of each table to the
+            observed latency, starting from its batch size (see AdaptiveBatchSizer).
+        """
+        if workers <= 0:
+            raise ValueError("The number of workers must be a positive integer.")
+
+        self.source_schema = source_schema
+        self.target_schema = target_schema
+        self.source_factory = source_factory
+        self.target_factory = target_factory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.disable_fk_checks = disable_fk_checks
+        self.mapper_factory = mapper_factory or self.default_mapper
+        self.strategies = strategies or {}
+        self.defer_indexes = defer_indexes
+        self.plans = {plan.table: plan for plan in plans or []}
+        self.adaptive_batches = adaptive_batches
+
+        if tables is None:
+            tables = [name for name in source_schema.tables if name in target_schema.tables]
+        for name in tables:
+            if name not in source_schema.tables or name not in target_schema.tables:
+                raise ValueError(f"Table '{name}' must exist in both the source and the target schema.")
+        self.tables = list(tables)
+
+        self._local = threading.local()
+        self._opened: List[Any] = []
+        self._opened_lock = threading.Lock()
+
+    @staticmethod
+    def default_mapper(source_table: Table, target_table: Table) -> FieldMapper:
+        """Maps every source column to the target column of the same name."""
+        mapping = {
+            col.field: col.field
+            for col in source_table.columns.values()
+            if target_table.get_column(col.field) is not None
+        }
+        return FieldMapper(source_table, target_table, mapping)
+
+    def load_foreign_keys(self, connection):
+        """
+        Reads the foreign keys of the source schema from information_schema and
+        attaches them to its tables, replacing those already known.
+
+        :param connection: A MySQL connection to the source server.
+        """
+        foreign_keys = SchemaExtractor(connection).foreign_keys([self.source_schema.name])
+        for name, table in self.source_schema.tables.items():
+            table.foreign_keys = foreign_keys.get((self.source_schema.name, name), [])
+
+    def dependencies(self) -> Dict[str, Set[str]]:
+        """
+        Builds the dependency graph of the tables to migrate.
+
+        :return: A dictionary mapping each table to the set of tables it references.
+            Self references and tables outside the migration are ignored.
+        """
+        selected = set(self.tables)
+        graph: Dict[str, Set[str]] = {}
+        for name in self.tables:
+            table = self.source_schema.tables[name]
+            graph[name] = {
+                fk.ref_table for fk in table.foreign_keys
+                if fk.ref_table in selected and fk.ref_table != name
+            }
+        return graph
+
+    def execution_order(self) -> List[List[str]]:
+        """
+        Groups the tables into waves that can run concurrently, parents first.
+
+        :return: A list of waves, each a sorted list of table names.
+        :raises ValueError: If the foreign keys form a cycle (and FK checks are not disabled).
+        """
+        if self.disable_fk_checks:
+            return [sorted(self.tables)]
+
+        pending = {name: set(parents) for name, parents in self.dependencies().items()}
+        waves = []
+        while pending:
+            ready = sorted(name for name, parents in pending.items() if not parents)
+            if not ready:
+                raise ValueError(f"Circular foreign key dependencies between tables: {sorted(pending)}. "
+                                 "Disable FK checks to migrate them.")
+            waves.append(ready)
+            for name in ready:
+                del pending[name]
+            for parents in pending.values():
+                parents.difference_update(ready)
+        return waves
+
+    def _connections(self):
+        """Returns the source reader and target connection of the current worker, opening them once."""
+        if not hasattr(self._local, "reader"):
+            reader = self.source_factory()
+            target = self.target_factory()
+            with self._opened_lock:
+                self._opened += [reader, target]
+            if self.disable_fk_checks:
+                self._set_fk_checks(target, 0)
+            self._local.reader = reader
+            self._local.target = target
+        return self._local.reader, self._local.target
+
+    @staticmethod
+    def _set_fk_checks(connection, value: int):
+        """Sets FOREIGN_KEY_CHECKS for the session of a target connection."""
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET SESSION FOREIGN_KEY_CHECKS = {int(value)}")
+
+    def _migrate_table(self, name: str) -> int:
+        """Migrates a single table on the current worker."""
+        reader, target = self._connections()
+        mapper = self.mapper_factory(self.source_schema.tables[name], self.target_schema.tables[name])
+        plan = self.plans.get(name)
+        batch_size = plan.batch_size if plan is not None else self.batch_size
+        strategies = dict(self.strategies)
+        if plan is not None:
+            strategies.setdefault(name, plan.write_strategy)
+        sizer = None
+        if self.adaptive_batches:
+            # Planned INSERT batches are as large as max_allowed_packet allows; only LOAD DATA batches may grow
+            capped = plan is not None and strategies.get(name, INSERT) != LOAD_DATA
+            sizer = AdaptiveBatchSizer(batch_size, maximum=batch_size if capped else None)
+        migrator = DataMigrator(target, batch_size=batch_size, checkpoint=self.checkpoint,
+                                strategies=strategies, sizer=sizer)
+
+        def migrate():
+            if plan is not None and plan.strategy == RANGE_PARALLEL:
+                return migrator.migrate_table_parallel(mapper, self.source_factory, self._range_connection,
+                                                       workers=plan.workers)
+            return migrator.migrate_table(mapper, reader, checkpoint_name=name)
+
+        if self.defer_indexes is None:
+            return migrate()
+        deferred = DeferredIndexes(target, self.target_schema.tables[name], self.defer_indexes)
+        if self.checkpoint is not None and self.checkpoint.is_complete(name):
+            # Completed tables keep their indexes, but a failed rebuild or verification is run again
+            migrated = migrate()
+            deferred.rebuild()
+            if deferred.verify_after:
+                deferred.verify()
+            return migrated
+        with deferred:
+            return migrate()
+
+    def _range_connection(self):
+        """
+        Opens a target connection for a range copy, with the session settings of the worker
+        loading the table: FK checks off with disable_fk_checks, and FK and unique checks
+        off when indexes are deferred by disabling the checks.
+        """
+        connection = self.target_factory()
+        disable_checks = self.defer_indexes == DISABLE_CHECKS
+        if self.disable_fk_checks or disable_checks:
+            return _ChecksOffConnection(connection, unique_checks=disable_checks)
+        return connection
+
+    def run(self) -> Dict[str, int]:
+        """
+        Migrates all the tables.
+
+        When a table fails, the tables depending on it are skipped while independent
+        tables keep going. With a checkpoint store, calling run again resumes the
+        failed and skipped tables.
+
+        :return: A dictionary mapping each table to the number of rows migrated.
+        :raises RuntimeError: If any table failed or was skipped.
+        """
+        self.execution_order()  # Fails early on dependency cycles
+
+        if self.disable_fk_checks:
+            pending = {name: set() for name in self.tables}
+        else:
+            pending = self.dependencies()
+        children: Dict[str, Set[str]] = {name: set() for name in self.tables}
+        for name, parents in pending.items():
+            for parent in parents:
+                children[parent].add(name)
+
+        results: Dict[str, int] = {}
+        failed: Dict[str, Exception] = {}
+        skipped: Set[str] = set()
+
+        def skip_descendants(name):
+            for child in children[name]:
+                if child in pending:
+                    del pending[child]
+                    skipped.add(child)
+                    skip_descendants(child)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                running = {}
+
+                def submit_ready():
+                    for name in sorted(name for name, parents in pending.items() if not parents):
+                        del pending[name]
+                        running[executor.submit(self._migrate_table, name)] = name
+
+                submit_ready()
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        try:
+                            results[name] = future.result()
+                        except Exception as e:
+                            print(f"Error migrating table '{name}': {e}")
+                            failed[name] = e
+                            skip_descendants(name)
+                        else:
+                            for child in children[name]:
+                                if child in pending:
+                                    pending[child].discard(name)
+                    submit_ready()
+        finally:
+            self.close()
+
+        print(f"Migrated {len(results)} of {len(self.tables)} tables, {sum(results.values())} records.")
+        if failed or skipped:
+            raise RuntimeError(f"Migration incomplete. Failed tables: {sorted(failed)}; "
+                               f"skipped dependent tables: {sorted(skipped)}.")
+        return results
+
+    def close(self):
+        """
+        Closes the connections opened by the workers. FK checks are turned back on
+        first, since pooled connections keep their session settings.
+        """
+        with self._opened_lock:
+            opened, self._opened = self._opened, []
+        for reader, target in zip(opened[::2], opened[1::2]):
+            reader.close()
+            if self.disable_fk_checks:
+                try:
+                    self._set_fk_checks(target, 1)
+                except Exception:
+                    pass
+            target.close()
+        self._local = threading.local()
@@ -0,0 +1,185 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from db.mappers import FieldMapper
+from migration.data import DataMigrator
+
+def row_hash_expression(columns: Sequence[str], hash_function: str = "CRC32") -> str:
+    """
+    SQL expression hashing the columns of a row. CONCAT_WS skips NULLs, so the
+    NULL flags of the columns are appended to tell NULL from empty values.
+
+    :param columns: Column names, in a fixed order.
+    :param hash_function: SQL hash function applied to the concatenation (e.g. CRC32, MD5).
+    """
+    values = ", ".join(columns)
+    null_flags = ", ".join(f"ISNULL({column})" for column in columns)
+    return f"{hash_function}(CONCAT_WS('#', {values}, {null_flags}))"
+
+class VerificationReport:
+    """
+    Result of a ChecksumVerifier run.
+
+    Attributes:
+        table (str): Name of the target table.
+        chunks (int): Number of key ranges compared.
+        mismatched_chunks (List[Tuple]): The (after, until] key ranges whose checksums differed.
+        missing (List): Keys present in the source but not in the target.
+        extra (List): Keys present in the target but not in the source.
+        different (List): Keys present on both sides with different contents.
+    """
+    def __init__(self, table: str, chunks: int) -> None:
+        self.table = table
+        self.chunks = chunks
+        self.mismatched_chunks: List[Tuple[Any, Any]] = []
+        self.missing: List[Any] = []
+        self.extra: List[Any] = []
+        self.different: List[Any] = []
+
+    @property
+    def ok(self) -> bool:
+        """True if source and target matched."""
+        return not self.mismatched_chunks
+
+    def __str__(self) -> str:
+        if self.ok:
+            return f"Table '{self.table}' matches ({self.chunks} chunks)."
+        return (f"Table '{self.table}' differs in {len(self.mismatched_chunks)} of {self.chunks} chunks: "
+                f"{len(self.missing)} missing, {len(self.extra)} extra, {len(self.different)} different rows.")
+
+class ChecksumVerifier:
+    """
+    Verifies that a target table matches its source without transferring the rows.
+
+    Both tables are split into ranges of their (single-column, integer) primary key.
+    For every range, each server computes a row count and BIT_XOR(CRC32(CONCAT_WS(...)))
+    over the mapped columns, and only the ranges whose aggregates differ are drilled
+    into, by comparing per-row checksums to find the differing keys. Ranges are checked
+    in parallel, each on connections of its own.
+    """
+
+    def __init__(self, mapper: FieldMapper, source_factory: Callable[[], Any], target_factory: Callable[[], Any],
+                 chunk_size: int = 10000, workers: int = 4):
+        """
+        :param mapper: FieldMapper of the migrated table; its mapped columns are compared.
+        :param source_factory: Callable returning a MySQL connection to the source, typically ConnectionPool.acquire.
+        :param target_factory: Callable returning a MySQL connection to the target, typically ConnectionPool.acquire.
+        :param chunk_size: Width of the key ranges compared at once.
+        :param workers: Number of ranges checked concurrently.
+        """
+        if chunk_size <= 0 or workers <= 0:
+            raise ValueError("Chunk size and number of workers must be positive integers.")
+
+        key_fields = mapper.source_table.primary_key
+        if len(key_fields) != 1:
+            raise ValueError(f"Table '{mapper.source_table.name}' must have a single-column primary key.")
+        if key_fields[0] not in mapper.mapping:
+            raise ValueError(f"The primary key of '{mapper.source_table.name}' must be mapped.")
+
+        self.mapper = mapper
+        self.source_factory = source_factory
+        self.target_factory = target_factory
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+        compiled = mapper.compile(convert_types=False)
+        self.source_key = key_fields[0]
+        self.target_key = mapper.mapping[self.source_key]
+        self.source_columns = list(compiled.source_fields)
+        self.target_columns = list(compiled.target_fields)
+
+    @staticmethod
+    def _range_condition(key: str, key_range: Tuple[Optional[int], int]) -> Tuple[str, List[Any]]:
+        after, until = key_range
+        if after is None:
+            return f"{key} <= %s", [until]
+        return f"{key} > %s AND {key} <= %s", [after, until]
+
+    @staticmethod
+    def _fetch(factory: Callable[[], Any], query: str, values: Sequence[Any]) -> List[Tuple]:
+        connection = factory()
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(query, values)
+                return list(cursor.fetchall())
+            finally:
+                cursor.close()
+        finally:
+            connection.close()
+
+    def _bounds(self) -> Tuple[Optional[int], Optional[int]]:
+        """Smallest and largest key over both tables."""
+        bounds = []
+        for factory, table, key in ((self.source_factory, self.mapper.source_table.name, self.source_key),
+                                    (self.target_factory, self.mapper.target_table.name, self.target_key)):
+            bounds += self._fetch(factory, f"SELECT MIN({key}), MAX({key}) FROM {table}", ())
+        mins = [row[0] for row in bounds if row[0] is not None]
+        maxs = [row[1] for row in bounds if row[1] is not None]
+        if not mins:
+            return None, None
+        return min(mins), max(maxs)
+
+    def _chunk_checksums(self, key_range) -> Tuple[Tuple, Tuple]:
+        """Row count and aggregate checksum of a key range, on both sides."""
+        checksums = []
+        for factory, table, key, columns in (
+                (self.source_factory, self.mapper.source_table.name, self.source_key, self.source_columns),
+                (self.target_factory, self.mapper.target_table.name, self.target_key, self.target_columns)):
+            condition, values = self._range_condition(key, key_range)
+            query = (f"SELECT COUNT(*), COALESCE(BIT_XOR({row_hash_expression(columns)}), 0) "
+                     f"FROM {table} WHERE {condition}")
+            checksums.append(tuple(self._fetch(factory, query, values)[0]))
+        return checksums[0], checksums[1]
+
+    def _row_checksums(self, factory, table, key, columns, key_range) -> Dict[Any, int]:
+        """Per-row checksums of a key range, by key."""
+        condition, values = self._range_condition(key, key_range)
+        query = f"SELECT {key}, {row_hash_expression(columns)} FROM {table} WHERE {condition}"
+        return dict(self._fetch(factory, query, values))
+
+    def _check_range(self, key_range) -> Optional[Tuple[List, List, List]]:
+        """Compares one key range, drilling down to the differing keys on mismatch."""
+        source_checksum, target_checksum = self._chunk_checksums(key_range)
+        if source_checksum == target_checksum:
+            return None
+
+        source_rows = self._row_checksums(self.source_factory, self.mapper.source_table.name,
+                                          self.source_key, self.source_columns, key_range)
+        target_rows = self._row_checksums(self.target_factory, self.mapper.target_table.name,
+                                          self.target_key, self.target_columns, key_range)
+        missing = sorted(key for key in source_rows if key not in target_rows)
+        extra = sorted(key for key in target_rows if key not in source_rows)
+        different = sorted(key for key, checksum in source_rows.items()
+                           if key in target_rows and target_rows[key] != checksum)
+        return missing, extra, different
+
+    def verify(self) -> VerificationReport:
+        """
+        Compares the source and target tables.
+
+        :return: A VerificationReport listing the differing keys.
+        """
+        name = self.mapper.target_table.name
+        min_key, max_key = self._bounds()
+        if min_key is None:
+            report = VerificationReport(name, 0)
+            print(report)
+            return report
+
+        parts = math.ceil((max_key - min_key + 1) / self.chunk_size)
+        ranges = DataMigrator.split_ranges(min_key, max_key, parts)
+        report = VerificationReport(name, len(ranges))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for key_range, result in zip(ranges, executor.map(self._check_range, ranges)):
+                if result is None:
+                    continue
+                missing, extra, different = result
+                report.mismatched_chunks.append(key_range)
+                report.missing += missing
+                report.extra += extra
+                report.different += different
+
+        print(report)
+        return report
@@ -0,0 +1,65 @@
+import argparse
+import json
+import mysql.connector
+from db.extractor import SchemaExtractor
+from migration.planner import MigrationPlanner, read_max_allowed_packet
+
+def connection_config(host, port, user, password, database):
+    """mysql.connector connection parameters."""
+    return {"host": host, "port": port, "user": user, "password": password, "database": database}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Plan the migration of a MySQL database: strategy, batch size and workers per table, "
+                    "with an estimated duration. Nothing is migrated.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", required=True, help="Source database")
+    parser.add_argument("--target-host", help="Target server, whose max_allowed_packet bounds the batches "
+                                               "(defaults to the source server)")
+    parser.add_argument("--target-port", type=int, default=3306)
+    parser.add_argument("--target-user")
+    parser.add_argument("--target-password", default="")
+    parser.add_argument("--tables", nargs="+", help="Tables to plan (default: all)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--no-local-infile", action="store_true", help="The target refuses LOAD DATA LOCAL INFILE")
+    parser.add_argument("--insert-rate", type=float, help="Measured INSERT rows/s of one worker")
+    parser.add_argument("--load-rate", type=float, help="Measured LOAD DATA rows/s of one worker")
+    parser.add_argument("--json", help="Also write the plan to this JSON file")
+    args = parser.parse_args()
+
+    source = mysql.connector.connect(**connection_config(args.host, args.port, args.user, args.password,
+                                                         args.database))
+    try:
+        schema = SchemaExtractor(source).extract(args.database).get_schema(args.database)
+        if args.target_host:
+            target = mysql.connector.connect(**connection_config(args.target_host, args.target_port,
+                                                                 args.target_user or args.user,
+                                                                 args.target_password, None))
+            try:
+                max_allowed_packet = read_max_allowed_packet(target)
+            finally:
+                target.close()
+        else:
+            max_allowed_packet = read_max_allowed_packet(source)
+    finally:
+        source.close()
+
+    throughput = {}
+    if args.insert_rate:
+        throughput["insert"] = args.insert_rate
+    if args.load_rate:
+        throughput["load_data"] = args.load_rate
+    planner = MigrationPlanner(schema, max_allowed_packet=max_allowed_packet, workers=args.workers,
+                               local_infile=not args.no_local_infile, throughput=throughput)
+    plans = planner.plan(args.tables)
+    planner.print_plan(plans)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"estimated_seconds": planner.estimated_duration(plans),
+                       "max_allowed_packet": max_allowed_packet,
+                       "tables": [plan.to_dict() for plan in plans]}, f, indent=4)
+        print(f"Plan written to {args.json}")
@@ -0,0 +1,60 @@
+import argparse
+import mysql.connector
+from MySQLCRUD import MySQLCRUD
+from db.extractor import SchemaExtractor
+from migration.dump import DEFAULT_MAX_STATEMENT, SQLDump
+
+def connection_config(args):
+    """mysql.connector connection parameters from the command line arguments."""
+    return {
+        "host": args.host,
+        "port": args.port,
+        "user": args.user,
+        "password": args.password,
+        "database": args.database,
+    }
+
+def dump(args):
+    config = connection_config(args)
+    conn = mysql.connector.connect(**config)
+    try:
+        schema = SchemaExtractor(conn).extract(args.database).get_schema(args.database)
+    finally:
+        conn.close()
+
+    def reader_factory():
+        reader = MySQLCRUD(config)
+        reader.schema = schema.to_dict()
+        return reader
+
+    dumper = SQLDump(args.directory, workers=args.workers, compress=args.gzip,
+                     max_statement=args.max_statement_bytes)
+    rows = dumper.dump(schema, reader_factory, tables=args.tables)
+    print(f"Dumped {sum(rows.values())} rows of {len(rows)} tables.")
+
+def restore(args):
+    config = connection_config(args)
+    restorer = SQLDump(args.directory, workers=args.workers, compress=args.gzip)
+    restorer.restore(lambda: mysql.connector.connect(**config), tables=args.tables)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dump MySQL tables to SQL files, or restore them.")
+    parser.add_argument("command", choices=["dump", "restore"])
+    parser.add_argument("directory", help="Directory of the dump files, one per table")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", required=True)
+    parser.add_argument("--tables", nargs="+", help="Tables to dump or restore (default: all)")
+    parser.add_argument("--workers", type=int, default=4, help="Tables processed in parallel")
+    parser.add_argument("--gzip", action="store_true", help="Compress the dump files")
+    parser.add_argument("--max-statement-bytes", type=int, default=DEFAULT_MAX_STATEMENT,
+                        help="Largest INSERT statement of the dump files; must fit the max_allowed_packet "
+                             "of the server they are restored on")
+    args = parser.parse_args()
+
+    if args.command == "dump":
+        dump(args)
+    else:
+        restore(args)
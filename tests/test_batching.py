@@ -0,0 +1,47 @@
+import pytest
+from migration.batching import AdaptiveBatchSizer
+
+def test_fast_full_batches_grow_the_size():
+    sizer = AdaptiveBatchSizer(1000, target_latency=1.0)
+    sizer.observe(1000, 0.1)
+    assert sizer.size == 1250
+
+def test_partial_batches_do_not_grow_the_size():
+    sizer = AdaptiveBatchSizer(1000, target_latency=1.0)
+    sizer.observe(10, 0.01)
+    assert sizer.size == 1000
+
+def test_batches_near_the_target_keep_the_size():
+    sizer = AdaptiveBatchSizer(1000, target_latency=1.0)
+    sizer.observe(1000, 1.2)
+    assert sizer.size == 1000
+
+def test_slow_batches_shrink_the_size_in_proportion():
+    sizer = AdaptiveBatchSizer(1000, target_latency=1.0)
+    sizer.observe(1000, 4.0)
+    assert sizer.size == 250
+
+def test_back_off_halves_the_size():
+    sizer = AdaptiveBatchSizer(1000)
+    sizer.back_off()
+    assert sizer.size == 500
+
+def test_size_stays_between_minimum_and_maximum():
+    sizer = AdaptiveBatchSizer(1000, minimum=400, maximum=1100)
+    sizer.observe(1000, 0.1)
+    assert sizer.size == 1100
+    sizer.observe(1100, 100.0)
+    assert sizer.size == 400
+    sizer.back_off()
+    assert sizer.size == 400
+
+def test_maximum_defaults_to_ten_times_the_initial_size():
+    sizer = AdaptiveBatchSizer(1000)
+    for _ in range(50):
+        sizer.observe(sizer.size, 0.0)
+    assert sizer.size == 10_000
+
+@pytest.mark.parametrize("initial, minimum, maximum", [(50, 100, None), (1000, 100, 500), (1000, 0, None)])
+def test_inconsistent_sizes_are_rejected(initial, minimum, maximum):
+    with pytest.raises(ValueError):
+        AdaptiveBatchSizer(initial, minimum=minimum, maximum=maximum)
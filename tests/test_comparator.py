@@ -0,0 +1,76 @@
+import pytest
+from db.db_components import Column, Index, Schema, Table
+from migration.comparator import COPY, INPLACE, INSTANT, SchemaComparator
+
+def _schema(columns, indexes=(), auto_increment=None):
+    table = Table("items", [Column("id", "int", False, "PRI", extra="auto_increment")] + list(columns),
+                  indexes=[Index("PRIMARY", ["id"], unique=True)] + list(indexes),
+                  stats={"auto_increment": auto_increment, "rows": 0})
+    schema = Schema("shop")
+    schema.add_table(table)
+    return schema
+
+def _algorithm(old_columns, new_columns, old_indexes=(), new_indexes=()):
+    comparator = SchemaComparator(_schema(new_columns, new_indexes), _schema(old_columns, old_indexes))
+    return comparator.algorithm(comparator.alter_clauses("items"))
+
+@pytest.mark.parametrize("old, new, expected", [
+    ("varchar(20)", "varchar(60)", INPLACE),
+    ("varchar(20)", "varchar(100)", COPY),  # The length prefix grows to two bytes
+    ("varchar(60)", "varchar(20)", COPY),
+    ("enum('a','b')", "enum('a','b','c')", INSTANT),
+    ("enum('a','b')", "enum('b','a')", COPY),
+    ("int", "bigint", COPY),
+], ids=["varchar-extend", "varchar-prefix", "varchar-shrink", "enum-append", "enum-reorder", "int-widen"])
+def test_type_changes(old, new, expected):
+    assert _algorithm([Column("value", old, True)], [Column("value", new, True)]) == expected
+
+def test_default_changes_are_instant():
+    assert _algorithm([Column("value", "int", True)], [Column("value", "int", True, default="1")]) == INSTANT
+
+def test_nullability_changes_rebuild_in_place():
+    assert _algorithm([Column("value", "int", True)], [Column("value", "int", False)]) == INPLACE
+
+def test_added_columns_are_instant_unless_stored_generated():
+    assert _algorithm([], [Column("value", "int", True)]) == INSTANT
+    assert _algorithm([], [Column("value", "int", True, extra="STORED GENERATED", expression="`id` * 2")]) == COPY
+
+def test_added_indexes():
+    column = [Column("value", "varchar(20)", True)]
+    assert _algorithm(column, column, new_indexes=[Index("idx_value", ["value"])]) == INPLACE
+    assert _algorithm(column, column, new_indexes=[Index("ft_value", ["value"], index_type="FULLTEXT")]) == COPY
+
+def test_unchanged_tables_have_no_alter_table():
+    columns = [Column("value", "int", True)]
+    assert SchemaComparator(_schema(columns), _schema(columns)).alter_table("items") is None
+
+def test_shadow_copy_ranges():
+    comparator = SchemaComparator(_schema([Column("value", "varchar(100)", True)], auto_increment=25),
+                                  _schema([Column("value", "varchar(20)", True)], auto_increment=25))
+    copies = [statement for statement in comparator.shadow_table("items", chunk_size=10)
+              if statement.startswith("INSERT")]
+    assert [copy.split(" WHERE ")[1] for copy in copies] == [
+        "`id` <= 10;", "`id` > 10 AND `id` <= 20;", "`id` > 20;"]
+    assert copies[0].startswith("INSERT INTO `_items_new` (`id`, `value`) SELECT `id`, `value` FROM `items`")
+
+def test_shadow_copy_without_auto_increment_is_one_statement():
+    comparator = SchemaComparator(_schema([Column("value", "varchar(100)", True)]),
+                                  _schema([Column("value", "varchar(20)", True)]))
+    statements = comparator.shadow_table("items")
+    assert statements[0] == "CREATE TABLE `_items_new` LIKE `items`;"
+    assert [statement for statement in statements if statement.startswith("INSERT")] == [
+        "INSERT INTO `_items_new` (`id`, `value`) SELECT `id`, `value` FROM `items`;"]
+    assert statements[-2:] == ["RENAME TABLE `items` TO `_items_old`, `_items_new` TO `items`;",
+                               "DROP TABLE `_items_old`;"]
+
+def test_shadow_copy_fills_added_not_null_columns():
+    comparator = SchemaComparator(_schema([Column("count", "int", False), Column("state", "enum('new','old')", False),
+                                           Column("total", "int", True, extra="VIRTUAL GENERATED",
+                                                  expression="`count` + 1")]),
+                                  _schema([]))
+    copy = next(statement for statement in comparator.shadow_table("items") if statement.startswith("INSERT"))
+    assert copy == "INSERT INTO `_items_new` (`id`, `count`, `state`) SELECT `id`, 0, 'new' FROM `items`;"
+
+def test_shadow_copy_falls_back_to_alter_table_without_implicit_default():
+    comparator = SchemaComparator(_schema([Column("created", "datetime", False)]), _schema([]))
+    assert comparator.shadow_table("items") == [comparator.alter_table("items")]
@@ -0,0 +1,25 @@
+import pytest
+from migration.data import DataMigrator
+
+def _keys(ranges, min_key, max_key):
+    """Keys selected by each (after, until) range of the interval [min_key, max_key]."""
+    return [[key for key in range(min_key, max_key + 1) if (after is None or key > after) and key <= until]
+            for after, until in ranges]
+
+def test_split_ranges_covers_the_interval_once():
+    ranges = DataMigrator.split_ranges(1, 100, 4)
+    assert ranges == [(None, 25), (25, 50), (50, 75), (75, 100)]
+    assert sum(_keys(ranges, 1, 100), []) == list(range(1, 101))
+
+def test_split_ranges_of_uneven_intervals_differ_by_one_key_at_most():
+    sizes = [len(keys) for keys in _keys(DataMigrator.split_ranges(-5, 11, 5), -5, 11)]
+    assert sum(sizes) == 17
+    assert max(sizes) - min(sizes) <= 1
+
+def test_split_ranges_never_returns_empty_ranges():
+    assert DataMigrator.split_ranges(7, 9, 8) == [(None, 7), (7, 8), (8, 9)]
+    assert DataMigrator.split_ranges(5, 5, 3) == [(None, 5)]
+
+def test_split_ranges_rejects_no_parts():
+    with pytest.raises(ValueError):
+        DataMigrator.split_ranges(1, 10, 0)
@@ -0,0 +1,174 @@
+import pytest
+from db.mappers import FieldMapper
+from migration.checkpoint import CheckpointStore
+from migration.data import DataMigrator
+from migration.mongo import MongoReader, infer_table
+
+class ObjectId:
+    """Stand-in for bson.ObjectId: a 24 hex digit key, rebuilt from its string."""
+
+    def __init__(self, oid):
+        if isinstance(oid, int):
+            oid = f"{oid:024x}"
+        if not isinstance(oid, str) or len(oid) != 24:
+            raise TypeError(f"'{oid}' is not a valid ObjectId.")
+        int(oid, 16)
+        self.oid = oid.lower()
+
+    def __str__(self):
+        return self.oid
+
+    def __repr__(self):
+        return f"ObjectId('{self.oid}')"
+
+    def __eq__(self, other):
+        return isinstance(other, ObjectId) and other.oid == self.oid
+
+    def __lt__(self, other):
+        return self.oid < other.oid
+
+    def __hash__(self):
+        return hash(self.oid)
+
+def _bson_rank(value):
+    """Rank of the BSON type of a value in MongoDB's comparison order."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, ObjectId):
+        return 7
+    raise TypeError(f"Unsupported value {value!r}.")
+
+def _sort_key(value):
+    return _bson_rank(value), value
+
+def _matches(document, query):
+    """Evaluates the subset of the query language used by MongoReader: equality, $gt and $and."""
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(_matches(document, clause) for clause in condition):
+                return False
+            continue
+        value = document.get(field)
+        if isinstance(condition, dict):
+            # Type bracketing: $gt only matches values of the same BSON type
+            bound = condition["$gt"]
+            if value is None or _bson_rank(value) != _bson_rank(bound) or not value > bound:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+def _project(document, projection):
+    if projection is None:
+        return dict(document)
+    included = {field.split(".")[0] for field, flag in projection.items() if flag and field != "_id"}
+    projected = {field: value for field, value in document.items() if field in included}
+    if projection.get("_id", 1):
+        projected["_id"] = document["_id"]
+    return projected
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+        self.closed = False
+
+    def sort(self, field, direction):
+        self.documents.sort(key=lambda document: _sort_key(document[field]), reverse=direction < 0)
+        return self
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def close(self):
+        self.closed = True
+
+class FakeCollection:
+    """In-process stand-in for a pymongo collection, holding its documents in a list."""
+
+    def __init__(self, documents):
+        self.documents = list(documents)
+
+    def find(self, query=None, projection=None, batch_size=0):
+        return FakeCursor([_project(document, projection) for document in self.documents
+                           if _matches(document, query or {})])
+
+    def find_one(self, query=None, projection=None, sort=None):
+        cursor = self.find(query, projection)
+        for field, direction in sort or []:
+            cursor.sort(field, direction)
+        return next(iter(cursor), None)
+
+class FakeDatabase(dict):
+    """In-process stand-in for a pymongo database: collections by name."""
+
+class RecordingConnection:
+    """Target connection recording the committed rows, failing the write number fail_at."""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.writes = 0
+        self.pending = []
+        self.committed = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def executemany(self, query, values):
+        self.writes += 1
+        if self.writes == self.fail_at:
+            raise RuntimeError("Connection lost")
+        self.pending += values
+
+    def commit(self):
+        self.committed += self.pending
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+def _migrate(documents, state, connection):
+    """Migrates the users collection to a users table over the given target connection."""
+    source = infer_table("users", documents)
+    target = infer_table("users", documents)
+    mapper = FieldMapper(source, target, {column: column for column in source.columns})
+    reader = MongoReader(FakeDatabase(users=FakeCollection(documents)), batch_size=4,
+                         projections={"users": list(source.columns)})
+    migrator = DataMigrator(connection, batch_size=10, checkpoint=CheckpointStore(str(state)))
+    return migrator.migrate_table(mapper, reader)
+
+def _documents(ids):
+    return [{"_id": key, "name": f"user {i}", "address": {"city": f"city {i % 3}"}} for i, key in enumerate(ids)]
+
+@pytest.mark.parametrize("ids", [
+    [ObjectId(i) for i in range(1, 26)],
+    [f"user-{i:03d}" for i in range(1, 26)],
+    list(range(1, 26)),
+], ids=["objectid", "string", "int"])
+def test_resume_reads_the_remaining_documents(tmp_path, ids):
+    documents = _documents(ids)
+    state = tmp_path / "migration_state.json"
+
+    first = RecordingConnection(fail_at=3)
+    with pytest.raises(RuntimeError):
+        _migrate(documents, state, first)
+    assert len(first.committed) == 20
+    assert not CheckpointStore(str(state)).is_complete("users")
+
+    resumed = RecordingConnection()
+    assert _migrate(documents, state, resumed) == 5
+    migrated = [row[0] for row in first.committed + resumed.committed]
+    assert migrated == [key if isinstance(key, (str, int)) else str(key) for key in ids]
+    assert CheckpointStore(str(state)).is_complete("users")
+
+def test_rows_flatten_nested_documents(tmp_path):
+    connection = RecordingConnection()
+    _migrate(_documents([ObjectId(1)]), tmp_path / "migration_state.json", connection)
+    assert connection.committed == [("000000000000000000000001", "user 0", "city 0")]
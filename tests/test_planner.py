@@ -0,0 +1,48 @@
+from db.db_components import Column, Index, Schema, Table
+from migration.data import INSERT, LOAD_DATA
+from migration.planner import MAX_BATCH_SIZE, MIN_BATCH_SIZE, RANGE_PARALLEL, MigrationPlanner
+
+def _schema(rows=1000, avg_row_length=100, data_length=None):
+    table = Table("orders", [Column("id", "int", False, "PRI"), Column("note", "varchar(200)", True)],
+                  indexes=[Index("PRIMARY", ["id"], unique=True)],
+                  stats={"rows": rows, "avg_row_length": avg_row_length,
+                         "data_length": data_length if data_length is not None else rows * avg_row_length})
+    schema = Schema("shop")
+    schema.add_table(table)
+    return schema
+
+def test_batch_size_carries_batch_bytes():
+    schema = _schema()
+    planner = MigrationPlanner(schema, batch_bytes=1024 * 1024)
+    assert planner.batch_size(schema.tables["orders"], LOAD_DATA) == 1024 * 1024 // 100
+
+def test_insert_batches_fit_a_quarter_of_max_allowed_packet():
+    schema = _schema()
+    planner = MigrationPlanner(schema, max_allowed_packet=1024 * 1024, batch_bytes=4 * 1024 * 1024)
+    table = schema.tables["orders"]
+    assert planner.batch_size(table, INSERT) == 1024 * 1024 // 4 // 100
+    assert planner.batch_size(table, LOAD_DATA) == 4 * 1024 * 1024 // 100
+
+def test_batch_size_stays_within_bounds():
+    tiny = _schema(avg_row_length=1)
+    assert MigrationPlanner(tiny).batch_size(tiny.tables["orders"]) == MAX_BATCH_SIZE
+    huge = _schema(avg_row_length=10 * 1024 * 1024)
+    assert MigrationPlanner(huge).batch_size(huge.tables["orders"]) == MIN_BATCH_SIZE
+
+def test_row_length_is_estimated_from_column_types_without_stats():
+    table = Table("orders", [Column("id", "int", False, "PRI"), Column("note", "varchar(200)", True)])
+    assert MigrationPlanner.row_length(table) == 8 + 100
+
+def test_plan_table_picks_the_write_strategy_by_size():
+    assert MigrationPlanner(_schema(rows=10)).plan_table("orders").write_strategy == INSERT
+    plan = MigrationPlanner(_schema(rows=200_000)).plan_table("orders")
+    assert plan.write_strategy == LOAD_DATA
+    assert plan.batch_size == 4 * 1024 * 1024 // 100
+    assert MigrationPlanner(_schema(rows=200_000), local_infile=False).plan_table("orders").write_strategy == INSERT
+
+def test_large_tables_are_copied_by_parallel_ranges():
+    plan = MigrationPlanner(_schema(rows=10_000_000, data_length=5 * 1024 ** 3), workers=8).plan_table("orders")
+    assert plan.strategy == RANGE_PARALLEL
+    assert plan.workers == 3
+    single = MigrationPlanner(_schema(rows=10_000_000, data_length=5 * 1024 ** 3), workers=1)
+    assert single.plan_table("orders").strategy == LOAD_DATA